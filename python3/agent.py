@@ -1,4 +1,4 @@
 from app.bot.agent import Agent
 
 if __name__ == "__main__":
-    Agent()
+    Agent().run()
@@ -0,0 +1,376 @@
+import json
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  # Only the batch simulator needs numpy
+    np = None
+
+from .simulator import (
+    BLAST_LIFETIME,
+    BOMB_LIFETIME,
+    INVULNERABILITY_TICKS,
+    SimAgent,
+    SimState,
+)
+from .state.bombs import get_blast_rays
+from .state.grid_map import ENTITY_CODES, ENTITY_TYPES
+from .utilities import Entity, FIRE_SPAWN_MAP
+
+EMPTY = 0
+AMMO = ENTITY_CODES[Entity.AMMO]
+BOMB = ENTITY_CODES[Entity.BOMB]
+POWERUP = ENTITY_CODES[Entity.POWERUP]
+METAL = ENTITY_CODES[Entity.METAL]
+ORE = ENTITY_CODES[Entity.ORE]
+WOOD = ENTITY_CODES[Entity.WOOD]
+BLAST = ENTITY_CODES[Entity.BLAST]
+
+NOOP, UP, DOWN, LEFT, RIGHT, PLANT, DETONATE = range(7)
+ACTION_CODES = {"up": UP, "down": DOWN, "left": LEFT, "right": RIGHT}
+AGENTS = ("0", "1")
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError(
+            "The batch simulator requires numpy, see requirements-batch.txt"
+        )
+
+
+class BatchState:
+    """Many game states on the same size map, stored as stacked arrays
+
+    Tile arrays have shape (states, width * height) and are indexed by
+    ``y * width + x``, agent arrays have shape (states, 2). Blasts from
+    end-game fire are marked in ``fire`` and have an expiry of 0. Blast
+    owners are not tracked.
+    """
+
+    def __init__(self, width, height, size):
+        _require_numpy()
+        self.width = width
+        self.height = height
+        tiles = width * height
+        self.tick = np.zeros(size, np.int32)
+        self.board = np.zeros((size, tiles), np.int8)
+        self.hp = np.zeros((size, tiles), np.int8)
+        self.expires = np.zeros((size, tiles), np.int32)
+        self.owner = np.zeros((size, tiles), np.int8)
+        self.blast_diameter = np.zeros((size, tiles), np.int8)
+        self.fire = np.zeros((size, tiles), bool)
+        self.position = np.zeros((size, 2), np.int32)
+        self.agent_hp = np.zeros((size, 2), np.int8)
+        self.ammo = np.zeros((size, 2), np.int16)
+        self.agent_blast_diameter = np.zeros((size, 2), np.int8)
+        self.invulnerability = np.zeros((size, 2), np.int32)
+
+    def __len__(self):
+        return len(self.tick)
+
+    @classmethod
+    def from_states(cls, states):
+        """Stacks SimStates, which must all have the same map size"""
+        width, height = states[0].width, states[0].height
+        batch = cls(width, height, len(states))
+        for i, state in enumerate(states):
+            batch.tick[i] = state.tick
+            for k, number in enumerate(AGENTS):
+                agent = state.agents[number]
+                x, y = agent.coords
+                batch.position[i, k] = y * width + x
+                batch.agent_hp[i, k] = agent.hp
+                batch.ammo[i, k] = agent.ammo
+                batch.agent_blast_diameter[i, k] = agent.blast_diameter
+                batch.invulnerability[i, k] = agent.invulnerability
+            for (x, y), entity in state.entities.items():
+                index = y * width + x
+                code = ENTITY_CODES[entity["type"]]
+                batch.board[i, index] = code
+                batch.hp[i, index] = entity.get("hp", 1)
+                if code == BLAST and "expires" not in entity:
+                    batch.fire[i, index] = True
+                batch.expires[i, index] = entity.get("expires", 0)
+                if code == BOMB:
+                    batch.owner[i, index] = entity["owner"]
+                    batch.blast_diameter[i, index] = entity["blast_diameter"]
+        return batch
+
+    def to_state(self, i):
+        """Returns the i-th state as a SimState"""
+        width = self.width
+        agents = {}
+        for k, number in enumerate(AGENTS):
+            position = int(self.position[i, k])
+            agents[number] = SimAgent(
+                number,
+                (position % width, position // width),
+                int(self.agent_hp[i, k]),
+                int(self.ammo[i, k]),
+                int(self.agent_blast_diameter[i, k]),
+                int(self.invulnerability[i, k]),
+            )
+        entities = {}
+        for index in np.nonzero(self.board[i])[0].tolist():
+            code = self.board[i, index]
+            x, y = index % width, index // width
+            entity = {"x": x, "y": y, "type": ENTITY_TYPES[code]}
+            if code == BOMB:
+                entity["owner"] = int(self.owner[i, index])
+            if code != BLAST or not self.fire[i, index]:
+                if code not in (METAL, ORE, WOOD):
+                    entity["expires"] = int(self.expires[i, index])
+            if code in (AMMO, BOMB, POWERUP, ORE, WOOD):
+                entity["hp"] = int(self.hp[i, index])
+            if code == BOMB:
+                entity["blast_diameter"] = int(self.blast_diameter[i, index])
+            entities[(x, y)] = entity
+        return SimState(int(self.tick[i]), width, self.height, agents, entities)
+
+    def copy(self):
+        batch = BatchState.__new__(BatchState)
+        for name, value in vars(self).items():
+            setattr(batch, name, value.copy() if hasattr(value, "copy") else value)
+        return batch
+
+
+class BatchSimulator:
+    """Steps every state in a BatchState at once with vectorised numpy
+
+    Follows the tick order of ForwardModel, and matches it on fire, pickup
+    collection and single explosions. It differs in that:
+
+    - agent 0 always acts before agent 1, rather than in the order given
+    - chained explosions are resolved the way BombLibrary predicts them:
+      every ray stops at the first blocker on the board before the
+      explosion, and bombs hit by a ray join it. ForwardModel sets bombs off
+      one at a time, so a later ray can pass a block or pickup destroyed
+      earlier in the tick, where here a block hit by several rays takes a
+      point of damage from each
+    - pickups never spawn, as there is no ``spawns`` argument
+    - blast owners are not tracked
+    - a detonation without a target sets off the agent's bomb that is
+      closest to expiring
+    """
+
+    def __init__(self, width, height):
+        _require_numpy()
+        self.width = width
+        self.height = height
+        tiles = width * height
+        length = max(width, height) - 1
+        self._neighbours = np.full((tiles, 4), -1, np.int32)
+        self._rays = np.full((tiles, 4, length), -1, np.int32)
+        for index in range(tiles):
+            x, y = index % width, index // width
+            for d, (dx, dy) in enumerate(((0, 1), (0, -1), (-1, 0), (1, 0))):
+                if 0 <= x + dx < width and 0 <= y + dy < height:
+                    self._neighbours[index, d] = (y + dy) * width + x + dx
+            rays = get_blast_rays(width, height, (x, y), length)
+            for d, ray in enumerate(rays):
+                for r, (rx, ry) in enumerate(ray):
+                    if 0 <= rx < width and 0 <= ry < height:
+                        self._rays[index, d, r] = ry * width + rx
+        self._fire_at = np.full(max(FIRE_SPAWN_MAP) + 2, -1, np.int32)
+        for tick, (x, y) in FIRE_SPAWN_MAP.items():
+            if 0 <= x < width and 0 <= y < height:
+                self._fire_at[tick] = y * width + x
+        self._passable = np.zeros(len(ENTITY_TYPES), bool)
+        self._passable[[EMPTY, AMMO, POWERUP, BLAST]] = True
+
+    def step(self, batch, actions, targets=None):
+        """Advances every state by one tick in place
+
+        ``actions`` is an (states, 2) array of action codes. Detonations set
+        off the tile in ``targets`` if given, otherwise the agent's bomb that
+        is closest to expiring.
+        """
+        actions = np.asarray(actions)
+        batch.tick += 1
+        self._spawn_fire(batch)
+        self._expire_entities(batch)
+        for k in range(2):
+            self._collect_pickups(batch, k)
+        self._damage_agents(batch, batch.board == BLAST)
+        for k in range(2):
+            self._apply_actions(batch, k, actions[:, k], targets)
+        return batch
+
+    def _spawn_fire(self, batch):
+        tiles = self._fire_at[np.minimum(batch.tick, len(self._fire_at) - 1)]
+        rows = np.nonzero(tiles >= 0)[0]
+        if not len(rows):
+            return
+        tiles = tiles[rows]
+        spawned = np.zeros(batch.board.shape, bool)
+        spawned[rows, tiles] = True
+        bombs = spawned & (batch.board == BOMB)
+        if bombs.any():
+            self._explode(batch, bombs)
+        batch.board[rows, tiles] = BLAST
+        batch.expires[rows, tiles] = 0
+        batch.fire[rows, tiles] = True
+        self._damage_agents(batch, spawned)
+
+    def _expire_entities(self, batch):
+        board = batch.board
+        expiring = (batch.expires == batch.tick[:, None]) & (board != EMPTY)
+        if not expiring.any():
+            return
+        bombs = expiring & (board == BOMB)
+        cleared = expiring & ~bombs
+        board[cleared] = EMPTY
+        batch.expires[cleared] = 0
+        if bombs.any():
+            self._explode(batch, bombs)
+
+    def _collect_pickups(self, batch, k):
+        rows = np.arange(len(batch))
+        position = batch.position[:, k]
+        here = batch.board[rows, position]
+        ammo = here == AMMO
+        powerup = here == POWERUP
+        batch.ammo[ammo, k] += 1
+        batch.agent_blast_diameter[powerup, k] += 2
+        taken = ammo | powerup
+        batch.board[rows[taken], position[taken]] = EMPTY
+
+    def _damage_agents(self, batch, mask):
+        rows = np.arange(len(batch))
+        for k in range(2):
+            hit = mask[rows, batch.position[:, k]]
+            hit &= batch.invulnerability[:, k] < batch.tick
+            batch.agent_hp[hit, k] -= 1
+            batch.invulnerability[hit, k] = batch.tick[hit] + INVULNERABILITY_TICKS
+
+    def _apply_actions(self, batch, k, codes, targets):
+        rows = np.arange(len(batch))
+        board = batch.board
+        position = batch.position[:, k]
+
+        moving = (codes >= UP) & (codes <= RIGHT)
+        if moving.any():
+            rows_moving = rows[moving]
+            destinations = self._neighbours[position[moving], codes[moving] - UP]
+            valid = destinations >= 0
+            valid[valid] = self._passable[
+                board[rows_moving[valid], destinations[valid]]
+            ]
+            batch.position[rows_moving[valid], k] = destinations[valid]
+
+        planting = codes == PLANT
+        if planting.any():
+            here = board[rows, position]
+            planting &= (batch.ammo[:, k] > 0) & ((here == EMPTY) | (here == BLAST))
+            planted, tiles = rows[planting], position[planting]
+            into_blast = here[planting] == BLAST
+            board[planted, tiles] = BOMB
+            batch.hp[planted, tiles] = 1
+            batch.expires[planted, tiles] = batch.tick[planted] + BOMB_LIFETIME
+            batch.owner[planted, tiles] = k
+            batch.blast_diameter[planted, tiles] = batch.agent_blast_diameter[
+                planted, k
+            ]
+            batch.ammo[planted, k] -= 1
+            if into_blast.any():
+                # Planting into a blast sets the bomb off straight away
+                bombs = np.zeros(board.shape, bool)
+                bombs[planted[into_blast], tiles[into_blast]] = True
+                self._explode(batch, bombs)
+
+        detonating = codes == DETONATE
+        if detonating.any():
+            detonators = rows[detonating]
+            if targets is None:
+                tiles = self._get_earliest_bombs(batch, detonators, k)
+            else:
+                tiles = np.asarray(targets)[detonators, k]
+            valid = tiles >= 0
+            detonators, tiles = detonators[valid], tiles[valid]
+            valid = (board[detonators, tiles] == BOMB) & (
+                batch.owner[detonators, tiles] == k
+            )
+            if valid.any():
+                bombs = np.zeros(board.shape, bool)
+                bombs[detonators[valid], tiles[valid]] = True
+                self._explode(batch, bombs)
+
+    def _get_earliest_bombs(self, batch, rows, k):
+        owned = (batch.board[rows] == BOMB) & (batch.owner[rows] == k)
+        expires = np.where(owned, batch.expires[rows], np.iinfo(np.int32).max)
+        tiles = np.argmin(expires, axis=1).astype(np.int32)
+        tiles[~owned.any(axis=1)] = -1
+        return tiles
+
+    def _explode(self, batch, bombs):
+        """Sets off the bombs in the mask and every bomb they chain into"""
+        board = batch.board
+        blockers = (board != EMPTY) & (board != BLAST)
+        covered = np.zeros(board.shape, bool)
+        hits = np.zeros(board.shape, np.int8)
+        done = np.zeros(board.shape, bool)
+        frontier = bombs & (board == BOMB)
+        while frontier.any():
+            done |= frontier
+            rows, tiles = np.nonzero(frontier)
+            covered[rows, tiles] = True
+            radii = batch.blast_diameter[rows, tiles] // 2
+            steps = min(int(radii.max()), self._rays.shape[2])
+            rays = self._rays[tiles, :, :steps]
+            valid = (rays >= 0) & (
+                np.arange(1, steps + 1) <= radii[:, None, None]
+            )
+            rays = np.where(valid, rays, 0)
+            ray_rows = np.broadcast_to(rows[:, None, None], rays.shape)
+            blocked = blockers[ray_rows, rays] & valid
+            # A ray reaches a tile when nothing before it on the ray blocks it
+            reached = valid & (np.cumsum(blocked, axis=2) - blocked == 0)
+            covered[ray_rows[reached], rays[reached]] = True
+            stopped = reached & blocked
+            np.add.at(hits, (ray_rows[stopped], rays[stopped]), 1)
+            frontier = np.zeros(board.shape, bool)
+            frontier[ray_rows[stopped], rays[stopped]] = True
+            frontier &= (board == BOMB) & ~done
+
+        blocks = (board == WOOD) | (board == ORE)
+        damaged = blocks & (hits > 0)
+        batch.hp[damaged] -= np.minimum(hits[damaged], batch.hp[damaged])
+        cleared = damaged & (batch.hp <= 0)
+        cleared |= covered & ((board == AMMO) | (board == POWERUP))
+        blasted = covered & ((board == EMPTY) | (board == BLAST) | (board == BOMB))
+        board[cleared] = EMPTY
+        batch.expires[cleared] = 0
+        board[blasted] = BLAST
+        batch.hp[blasted] = 0
+        lifetimes = np.where(batch.fire, 0, batch.tick[:, None] + BLAST_LIFETIME)
+        batch.expires[blasted] = lifetimes[blasted]
+        self._damage_agents(batch, blasted)
+
+
+def benchmark(state, size=1000, ticks=100, seed=0):
+    """Returns how many state steps per second the batch simulator manages
+
+    Steps ``size`` copies of the state for ``ticks`` ticks with random
+    actions.
+    """
+    _require_numpy()
+    batch = BatchState.from_states([state] * size)
+    simulator = BatchSimulator(state.width, state.height)
+    actions = np.random.default_rng(seed).integers(0, 7, (ticks, size, 2))
+    start = time.perf_counter()
+    for tick_actions in actions:
+        simulator.step(batch, tick_actions)
+    return size * ticks / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    # python -m app.batch_simulator <game_state or replay json> [states] [ticks]
+    with open(sys.argv[1]) as f:
+        payload = json.load(f)
+    payload = payload.get("payload", payload)
+    payload = payload.get("initial_state", payload)
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    ticks = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    rate = benchmark(SimState.from_json(payload), size, ticks)
+    print(f"{rate:,.0f} states per second ({size} states, {ticks} ticks)")
@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from .replay_runner import find_replays, get_agent_number, load_replay, run_replay
+
+BASELINE = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..", "benchmarks", "baseline.json")
+)
+THRESHOLD = 0.2
+MIN_DELTA_MS = 0.05
+# A single slow tick moves the max by several times between identical runs, so
+# it only fails on a much larger slowdown
+MAX_THRESHOLD = 1.0
+MAX_MIN_DELTA_MS = 5.0
+STATISTICS = ("p50", "p95", "p99", "max")
+STAGES = (
+    "receive events",
+    "bomb library update",
+    "danger nodes",
+    "weights",
+    "dijkstra",
+    "trap checks",
+    "prison break",
+    "decision",
+    "tick",
+)
+
+
+class StageTimer:
+    """Adds up the time spent in each stage over a tick
+
+    Stages can nest, and a stage's time includes any stage run inside it.
+    Each tick a stage runs on gives one sample of its total time that tick.
+    """
+
+    def __init__(self):
+        self.samples = {}
+        self._tick = {}
+
+    def wrap(self, stage, obj, name):
+        """Times every call of the object's method as part of the stage"""
+        method = getattr(obj, name)
+        tick = self._tick
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                tick[stage] = tick.get(stage, 0.0) + time.perf_counter() - start
+
+        setattr(obj, name, timed)
+        return timed
+
+    def end_tick(self):
+        for stage, seconds in self._tick.items():
+            self.samples.setdefault(stage, []).append(seconds)
+        self._tick.clear()
+
+    def instrument(self, agent, server):
+        """Wraps the stages of the agent and its game state, for run_replay"""
+        state = server._state
+        self.wrap("receive events", state, "receive_ticks")
+        self.wrap("bomb library update", state.map.bomb_library, "update")
+        self.wrap("danger nodes", state.map.tunnels, "_refresh")
+        self.wrap("weights", agent, "_get_weight_field")
+        self.wrap("dijkstra", agent, "_get_shortest_path_tree")
+        self.wrap("trap checks", agent, "_get_trap_analysis")
+        self.wrap("trap checks", agent, "_is_trapped")
+        self.wrap("prison break", agent, "prison_break")
+        decide = self.wrap("decision", agent, "_decide")
+
+        def decide_and_end_tick(*args):
+            try:
+                return decide(*args)
+            finally:
+                self.end_tick()
+
+        server.set_decision_callback(decide_and_end_tick, agent._get_fallback_action)
+
+
+def percentile(samples, q):
+    """Returns the nearest-rank percentile of the sorted samples"""
+    rank = max(1, -(-len(samples) * q // 100))
+    return samples[int(rank) - 1]
+
+
+def summarise(samples):
+    """Returns the count, percentiles and max of each stage in milliseconds"""
+    summary = {}
+    for stage in STAGES:
+        seconds = sorted(samples.get(stage, ()))
+        if not seconds:
+            continue
+        summary[stage] = {
+            "count": len(seconds),
+            "p50": 1000 * percentile(seconds, 50),
+            "p95": 1000 * percentile(seconds, 95),
+            "p99": 1000 * percentile(seconds, 99),
+            "max": 1000 * seconds[-1],
+        }
+    return summary
+
+
+def find_regressions(
+    summary,
+    baseline,
+    threshold=THRESHOLD,
+    min_delta=MIN_DELTA_MS,
+    statistics=STATISTICS,
+    max_threshold=MAX_THRESHOLD,
+    max_min_delta=MAX_MIN_DELTA_MS,
+):
+    """Returns (stage, statistic, baseline ms, current ms) for each regression
+
+    A statistic regresses when it is more than ``threshold`` times slower than
+    the baseline and more than ``min_delta`` ms slower, which keeps stages
+    that take microseconds from failing on noise. The max is held to
+    ``max_threshold`` and ``max_min_delta`` instead.
+    """
+    regressions = []
+    for stage, values in summary.items():
+        for statistic in statistics:
+            before = baseline.get(stage, {}).get(statistic)
+            after = values[statistic]
+            limit, delta = threshold, min_delta
+            if statistic == "max":
+                limit, delta = max_threshold, max_min_delta
+            if (
+                before is not None
+                and after > before * (1 + limit)
+                and after - before > delta
+            ):
+                regressions.append((stage, statistic, before, after))
+    return regressions
+
+
+def format_summary(summary, baseline=None):
+    lines = [
+        "{:<20} {:>7}".format("stage (ms)", "count")
+        + "".join(" {:>15}".format(s) for s in STATISTICS)
+    ]
+    for stage, statistics in summary.items():
+        line = "{:<20} {:>7}".format(stage, statistics["count"])
+        for statistic in STATISTICS:
+            value = "{:.3f}".format(statistics[statistic])
+            before = (baseline or {}).get(stage, {}).get(statistic)
+            if before:
+                value += " {:+4.0f}%".format(100 * (statistics[statistic] / before - 1))
+            line += " {:>15}".format(value)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def run_benchmark(paths=(), map_backend=None, engine=None, limit=None):
+    """Replays the stored games and returns the summary of every stage
+
+    Speculation is off so that each stage is timed from cold.
+    """
+    timer = StageTimer()
+    for path in find_replays(paths)[:limit]:
+        records = run_replay(
+            load_replay(path),
+            get_agent_number(path),
+            map_backend,
+            engine,
+            speculate=False,
+            instrument=timer.instrument,
+        )
+        timer.samples.setdefault("tick", []).extend(r.seconds for r in records)
+    return summarise(timer.samples)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.benchmark",
+        description="Times each stage of the agent over the stored replays",
+    )
+    parser.add_argument("paths", nargs="*", help="replay.json files or folders")
+    parser.add_argument("--limit", type=int, help="number of replays to run")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline to compare")
+    parser.add_argument("--save", action="store_true", help="overwrite the baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--min-delta", type=float, default=MIN_DELTA_MS)
+    parser.add_argument("--max-threshold", type=float, default=MAX_THRESHOLD)
+    parser.add_argument("--max-min-delta", type=float, default=MAX_MIN_DELTA_MS)
+    parser.add_argument(
+        "--gate",
+        nargs="+",
+        choices=STATISTICS,
+        default=STATISTICS,
+        help="statistics that fail on a regression",
+    )
+    args = parser.parse_args(args)
+
+    summary = run_benchmark(args.paths, limit=args.limit)
+    baseline = None
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print(format_summary(summary, baseline))
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(summary, f, indent=2)
+        print("Saved baseline to {}".format(args.baseline))
+        return 0
+    if baseline is None:
+        return 0
+    regressions = find_regressions(
+        summary,
+        baseline,
+        args.threshold,
+        args.min_delta,
+        args.gate,
+        args.max_threshold,
+        args.max_min_delta,
+    )
+    for stage, statistic, before, after in regressions:
+        print(
+            "REGRESSION: {} {} {:.3f} ms -> {:.3f} ms".format(
+                stage, statistic, before, after
+            )
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,37 @@
 import asyncio
 import os
-
-import networkx as nx
-
-from ..server_connection import ServerConnection
-from ..state.bombs import Bomb
-from ..utilities import Entity, PriorityQueue, WEIGHT_MAP
+import time
+
+from .mcts import MCTS
+from ..pathfinding import ShortestPathTree, grid_bfs
+from ..safety import SafetySearch
+from ..server_connection import CancelToken, ServerConnection, TickBudget
+from ..simulator import MOVES, SimState
+from ..state.grid_map import GridMap
+from ..state.map import Map
+from ..trap_analysis import TrapAnalysis
+from ..utilities import Entity, LRUCache, PriorityQueue, WEIGHT_MAP
 
 uri = (
         os.environ.get("GAME_CONNECTION_STRING")
         or "ws://127.0.0.1:3000/?role=agent&agentId=agentId&name=defaultName"
 )
 INDEX_MAP = {0: "ATTACKING  ", 1: "IMPROVING  ", 2: "CENTERING  "}
+MAP_BACKENDS = {"graph": Map, "grid": GridMap}
+DECISION_CACHE_SIZE = 4096
+ANALYSIS_CACHE_SIZE = 64
+ANALYSIS_FIELDS = (
+    "danger_nodes",
+    "next_to_enemy",
+    "us_hops",
+    "them_hops",
+    "weights",
+    "trees",
+)
+DECISION_ENGINES = ("rules", "mcts")
+MCTS_TIME_LIMIT = 0.05
+# Seconds of the tick budget that must be left to run each optional stage
+STAGE_RESERVES = {"trap checks": 0.03, "prison break": 0.02, "their tree": 0.02}
 
 
 def _get_direction_from_coords(start, end):
@@ -36,11 +56,30 @@ def _manhattan_to_centre(start_node):
 
 
 class Agent:
-    def __init__(self):
-        self._server = ServerConnection(uri)
-        self._server.set_game_tick_callback(self._on_game_tick)
+    def __init__(self, map_backend=None, engine=None, server=None):
+        map_backend = map_backend or os.environ.get("MAP_BACKEND") or "graph"
+        self.engine = engine or os.environ.get("DECISION_ENGINE") or "rules"
+        if self.engine not in DECISION_ENGINES:
+            raise ValueError("Unknown decision engine: {}".format(self.engine))
+        self.mcts = MCTS()
+        self._server = server or ServerConnection(
+            uri, map_class=MAP_BACKENDS[map_backend]
+        )
+        self._server.set_decision_callback(
+            self._decide, self._get_fallback_action, self._speculate
+        )
+        self._server.set_game_start_callback(self._on_game_start)
+        self._server.set_game_over_callback(self._on_game_over)
         self.state = None
-
+        self.label = None
+        self.token = CancelToken()
+        self._set_budget(TickBudget.unlimited())
+        self.skipped_stages = 0
+        self.decision_cache = LRUCache(DECISION_CACHE_SIZE)
+        self.analysis_cache = LRUCache(ANALYSIS_CACHE_SIZE)
+
+    def run(self):
+        """Connects to the game server and plays until the connection closes"""
         loop = asyncio.get_event_loop()
         connection = loop.run_until_complete(self._server.connect())
         tasks = [
@@ -49,67 +88,101 @@ class Agent:
         loop.run_until_complete(asyncio.wait(tasks))
 
     def _get_node_weight(self, node):
-        cached_weight = self.node_weights.get(node)
-        if cached_weight is not None:
-            return cached_weight
-        if node not in self.map.graph:
+        if not self.map.in_bounds(node):
             return 0
-        weight = self.map.graph.nodes[node]["weight"]
-        bomb_owners = self.map.bomb_library.get_bomb_impact_owners(node)
-        if self.them.id in bomb_owners or None in bomb_owners:
-            weight += WEIGHT_MAP["Them Future Blast"]
-        elif self.us.id in bomb_owners:
-            weight += WEIGHT_MAP["Us Future Blast"]
-        if self.us.is_invulnerable:
-            weight = min(WEIGHT_MAP["Invincibility Cutoff"], weight)
-        entrance = self.danger_nodes.get(node)
-        if node == self.them.coords:
+        return self.weights[self.map.index(node)]
+
+    def _get_hop_field(self, player):
+        if player not in self.map:
+            return [None] * (self.map.width * self.map.height)
+        return grid_bfs(self.map.adjacency(), [self.map.index(player)])
+
+    def _is_trap_entrance(self, entrance):
+        index = self.map.index(entrance)
+        us_to_entrance = self.us_hops[index]
+        them_to_entrance = self.them_hops[index]
+        if us_to_entrance is None or them_to_entrance is None:
+            return False
+        return them_to_entrance <= 2 or us_to_entrance >= them_to_entrance
+
+    def _get_weight_field(self):
+        """Builds the weight of every tile for this tick, 0 where impassable"""
+        library = self.map.bomb_library
+        them_blasts = library.get_impact_mask(self.them.id) | library.get_impact_mask(
+            None
+        )
+        us_blasts = library.get_impact_mask(self.us.id)
+        weights = [0] * (self.map.width * self.map.height)
+        for node in self.map:
+            index = self.map.index(node)
+            bit = 1 << index
+            weight = self.map.get_weight(node)
+            if them_blasts & bit:
+                weight += WEIGHT_MAP["Them Future Blast"]
+            elif us_blasts & bit:
+                weight += WEIGHT_MAP["Us Future Blast"]
+            if self.us.is_invulnerable:
+                weight = min(WEIGHT_MAP["Invincibility Cutoff"], weight)
+            weights[index] = weight
+
+        traps = {}
+        for node, entrance in self.danger_nodes.items():
+            if entrance is None:
+                continue
+            if entrance not in traps:
+                traps[entrance] = self._is_trap_entrance(entrance)
+            if traps[entrance]:
+                weights[self.map.index(node)] += WEIGHT_MAP["Trap"]
+
+        if self.them.coords in self.map:
+            index = self.map.index(self.them.coords)
             if self.next_to_enemy:
-                weight = WEIGHT_MAP["Enemy - next_to"]
+                trap = traps.get(self.danger_nodes.get(self.them.coords), False)
+                weights[index] = WEIGHT_MAP["Enemy - next_to"] + (
+                    WEIGHT_MAP["Trap"] if trap else 0
+                )
             else:
-                us_weight = self._get_node_weight(self.us.coords)
+                us_weight = weights[self.map.index(self.us.coords)]
                 if us_weight > WEIGHT_MAP["Default"] or self.us.hp == 1:
-                    weight += WEIGHT_MAP["Enemy - in_bad_spot"]
+                    weights[index] += WEIGHT_MAP["Enemy - in_bad_spot"]
                 elif self.state.tick < 1800 and self.us.hp > 1:
-                    weight += WEIGHT_MAP["Enemy"]
-        if entrance is not None:
-            valid = True
-            try:
-                us_to_entrance = nx.shortest_path_length(
-                    self.map.graph, self.us.coords, entrance
-                )
-                them_to_entrance = nx.shortest_path_length(
-                    self.map.graph, self.them.coords, entrance
-                )
-            except (nx.NetworkXNoPath, nx.NodeNotFound):
-                valid = False
-            if valid and (them_to_entrance <= 2 or us_to_entrance >= them_to_entrance):
-                weight += WEIGHT_MAP["Trap"]
-        self.node_weights[node] = weight
-        return weight
-
-    def _get_edge_weight(self, start, end, properties):
-        return self._get_node_weight(start) + self._get_node_weight(end)
-
-    def _get_path_to_best(self):
+                    weights[index] += WEIGHT_MAP["Enemy"]
+        return weights
+
+    def _get_shortest_path_tree(self, player):
+        if player in self.map:
+            return ShortestPathTree.search(self.map, player, self.weights)
+        return ShortestPathTree.from_neighbours(
+            self.map, player, self._generate_neighbouring_tiles(player)
+        )
+
+    def _get_their_length(self, node):
+        """Returns the enemy's path length to the node, in hops if short on time"""
+        their_tree = self.trees.get(self.them.coords)
+        if their_tree is None:
+            hops = self.them_hops[self.map.index(node)]
+            return None if hops is None else hops + 1
+        return their_tree.length(node)
+
+    def _get_step_to_best(self):
+        our_tree = self.trees[self.us.coords]
         best_nodes = PriorityQueue()
-        for node, data in self.map.graph.nodes(data=True):
+        for node in self.map:
             entrance = self.danger_nodes.get(node)
             if entrance is not None:
-                our_path = self.paths[self.us.coords].get(entrance)
-                their_path = self.paths[self.them.coords].get(entrance)
+                our_length = our_tree.length(entrance)
+                their_length = self._get_their_length(entrance)
                 if (
-                        our_path is not None
-                        and their_path is not None
-                        and len(our_path) > len(their_path)
+                        our_length is not None
+                        and their_length is not None
+                        and our_length > their_length
                 ):
                     continue
-            if node in self.paths[self.us.coords]:
-                worst_node = max(
-                    (
-                        self._get_node_weight(n)
-                        for n in self.paths[self.us.coords][node][1:]
-                    ),
+            if node in our_tree:
+                worst_node = our_tree.max_weight(
+                    node,
+                    self.weights,
+                    include_source=False,
                     default=self._get_node_weight(self.us.coords),
                 )
 
@@ -120,46 +193,30 @@ class Agent:
                         worst_node > WEIGHT_MAP["Danger"],
                         self._get_node_weight(node),
                         _manhattan_to_centre(node),
-                        self.distances[self.us.coords][node],
+                        our_tree.distance(node),
                         node,
                     )
                 )
 
         if not best_nodes.is_empty():
-            return self.paths[self.us.coords][best_nodes.pop()[-1]]
+            return our_tree.first_step(best_nodes.pop()[-1])
         return None
 
-    def _find_danger_nodes(self):
-        danger_nodes = {}
-        for node in self.map.graph.nodes:
-            if node not in danger_nodes and len(self.map.graph[node]) == 1:
-                visited = [node]
-                to_visit = list(self.map.graph[node])
-                exit = None
-                while to_visit:
-                    current = to_visit.pop()
-                    neighbours = self.map.graph[current]
-                    if len(neighbours) > 2:
-                        exit = current
-                        break
-                    visited.append(current)
-                    if len(neighbours) <= 2:
-                        to_visit.extend([n for n in neighbours if n not in visited])
-                for n in visited:
-                    danger_nodes[n] = exit
-        return danger_nodes
-
-    def _get_path_to_trap(self):
+    def _get_step_to_trap(self):
         entrance = self.danger_nodes.get(self.them.coords)
         if self.us.ammo > 0 and entrance is not None:
-            us_to_entrance = self.paths[self.us.coords].get(entrance)
-            them_to_entrance = self.paths[self.them.coords].get(entrance)
+            our_tree = self.trees[self.us.coords]
+            us_to_entrance = our_tree.length(entrance)
+            them_to_entrance = self._get_their_length(entrance)
             if (
                 us_to_entrance is not None
                 and them_to_entrance is not None
-                and len(us_to_entrance) < len(them_to_entrance)
+                and us_to_entrance < them_to_entrance
+                and self.them.coords in our_tree
+                and our_tree.max_weight(self.them.coords, self.weights)
+                < WEIGHT_MAP["Danger"]
             ):
-                return self.paths[self.us.coords].get(self.them.coords)
+                return our_tree.first_step(self.them.coords)
         return None
 
     def _generate_neighbouring_tiles(self, coords):
@@ -167,7 +224,7 @@ class Agent:
             new = list(coords)
             new[i] += m
             new = tuple(new)
-            if new in self.map.graph:
+            if new in self.map:
                 yield new
 
     def _dismount_bomb(self):
@@ -177,14 +234,9 @@ class Agent:
         for neighbour in self._generate_neighbouring_tiles(self.us.coords):
             if neighbour == self.them.coords:
                 continue
-            connected_nodes = nx.node_connected_component(self.map.graph, neighbour)
-            if self.them.coords in connected_nodes:
-                graph = self.map.graph.copy()
-                graph.remove_nodes_from(
-                    n for n in self.map.graph if n not in connected_nodes
-                )
-                graph.remove_node(self.them.coords)
-                connected_nodes = nx.node_connected_component(graph, neighbour)
+            connected_nodes = self.trap_analysis.component_without(
+                self.them.coords, neighbour
+            )
             valid_nodes = len(connected_nodes)
             for node in connected_nodes:
                 if (
@@ -209,39 +261,257 @@ class Agent:
             return best.pop()[-1]
         return None
 
-    def _is_coords_trapped(self, coords, enemy, graph=None):
-        if graph is None:
-            graph = self.map.graph
-        connected = nx.node_connected_component(graph, coords)
-        for node in connected:
-            if self._get_node_weight(node) < WEIGHT_MAP[
-                Entity.BLAST
-            ] and enemy.id not in self.map.bomb_library.get_bomb_impact_owners(node):
+    def _get_trap_analysis(self):
+        """Returns the articulation points of the map for this tick's trap checks"""
+        return TrapAnalysis(self.map)
+
+    def _is_coords_trapped(self, coords, enemy, extra_blasts=0):
+        bitboard = self.map.bitboard
+        enemy_blasts = self.map.bomb_library.get_impact_mask(enemy.id) | extra_blasts
+        for node in self.trap_analysis.component_without(enemy.coords, coords):
+            if (
+                not enemy_blasts & bitboard.bit(node)
+                and self._get_node_weight(node) < WEIGHT_MAP[Entity.BLAST]
+            ):
                 return False
         return True
 
-    def _is_trapped(self, player):
+    def _is_trapped(self, player, extra_blasts=0):
+        if not self._can_afford("trap checks"):
+            return False
         enemy = self.them if player == self.us else self.us
-        if enemy.coords in self.map.graph:
-            graph = self.map.graph.copy()
-            graph.remove_node(enemy.coords)
-        else:
-            graph = self.map.graph
-        if player.coords in graph:
-            return self._is_coords_trapped(player.coords, enemy, graph)
+        if player.coords in self.map and player.coords != enemy.coords:
+            return self._is_coords_trapped(player.coords, enemy, extra_blasts)
         else:
             for node in self._generate_neighbouring_tiles(player.coords):
-                if node in graph and not self._is_coords_trapped(node, enemy, graph):
+                if node != enemy.coords and not self._is_coords_trapped(
+                    node, enemy, extra_blasts
+                ):
                     return False
             return True
 
-    async def _on_game_tick(self, tick_number, game_state):
+    def _get_plant_entity(self, coords):
+        x, y = coords
+        return {
+            "x": x,
+            "y": y,
+            "blast_diameter": self.us.blast_diameter,
+            "owner": self.us.id,
+            "expires": self.state.tick + 40,
+        }
+
+    def _evaluate_plants(self, candidates):
+        """Returns (can_hit, guaranteed, enemy_trapped) for planting on each tile"""
+        library = self.map.bomb_library
+        outcomes = library.evaluate_bombs(
+            [self._get_plant_entity(c) for c in candidates], self.map
+        )
+        results = []
+        for outcome in outcomes:
+            hits = [
+                coords in outcome.reach
+                or self.us.id in library.get_bomb_impact_owners(coords)
+                for coords in self._generate_neighbouring_tiles(self.them.coords)
+            ]
+            can_hit = (
+                self.them.coords in outcome.reach
+                or self.us.id in library.get_bomb_impact_owners(self.them.coords)
+            )
+            enemy_trapped = self._is_trapped(self.them, outcome.reach_mask)
+            results.append((can_hit, all(hits), enemy_trapped))
+        return results
+
+    def _set_state(self, game_state):
         if game_state is not self.state:
             self.state = game_state
             self.map = game_state.map
             self.us = game_state.us
             self.them = game_state.them
 
+    def _decide(self, tick_number, game_state, token, budget):
+        """Returns the action for the tick, run off the event loop
+
+        Raises DecisionCancelled from ``token.check()`` once the tick is stale.
+        """
+        deadline = min(time.perf_counter() + MCTS_TIME_LIMIT, budget.deadline)
+        self._set_state(game_state)
+        self.token = token
+        self._set_budget(budget)
+
+        if self.engine == "mcts":
+            # Searches depend on bomb timers, which the state hash leaves out
+            decision = self._get_mcts_decision(deadline)
+        else:
+            key = game_state.zobrist
+            decision = self.decision_cache.get(key)
+            if decision is None:
+                skipped_stages = self.skipped_stages
+                decision = self._get_decision()
+                # Only cache decisions made with every stage run
+                if self.skipped_stages == skipped_stages:
+                    self.decision_cache.put(key, decision)
+            # Cached decisions ignore bomb timers, so check them every tick
+            decision = self._avoid_blasts(decision)
+        self.label, action = decision
+        print(self.label, end=" | ")
+        return action
+
+    def _set_budget(self, budget):
+        self.budget = budget
+        self._affordable = {}
+
+    def _can_afford(self, stage):
+        """Returns whether enough of the tick budget is left to run the stage
+
+        The answer is fixed the first time a stage is asked about under a
+        budget, so every call in a decision is either exact or degraded.
+        """
+        affordable = self._affordable.get(stage)
+        if affordable is None:
+            affordable = self.budget.remaining() >= STAGE_RESERVES[stage]
+            self._affordable[stage] = affordable
+            if not affordable:
+                self.skipped_stages += 1
+        return affordable
+
+    def _get_fallback_action(self, tick_number, game_state):
+        """Returns a cheap action for a tick whose decision was cancelled"""
+        self._set_state(game_state)
+        decision = self.decision_cache.get(game_state.zobrist)
+        if decision is None:
+            decision = "FALLBACK   ", None
+        self.label, action = self._avoid_blasts(decision)
+        print(self.label, end=" | ")
+        return action
+
+    def _on_game_start(self, game_state):
+        """Drops cached work, which refers to the previous game's map"""
+        self.decision_cache.clear()
+        self.analysis_cache.clear()
+
+    async def _on_game_over(self, payload):
+        print("CACHE: {}".format(self.decision_cache))
+        print("SKIPPED STAGES: {}".format(self.skipped_stages))
+        self.decision_cache.reset_stats()
+        self.skipped_stages = 0
+
+    def _analyse_state(self):
+        analysis = self.analysis_cache.get(self.state.zobrist)
+        if analysis is not None:
+            for name, value in zip(ANALYSIS_FIELDS, analysis):
+                setattr(self, name, value)
+            return
+        self.danger_nodes = self.map.tunnels
+        self.next_to_enemy = _manhattan_distance(self.us.coords, self.them.coords) == 1
+        self.us_hops = self._get_hop_field(self.us.coords)
+        self.them_hops = self._get_hop_field(self.them.coords)
+        self.weights = self._get_weight_field()
+        self.trees = None
+
+    def _get_trees(self):
+        """Returns the dijkstra shortest path trees from both players"""
+        trees = {self.us.coords: self._get_shortest_path_tree(self.us.coords)}
+        if self._can_afford("their tree"):
+            trees[self.them.coords] = self._get_shortest_path_tree(self.them.coords)
+        return trees
+
+    def _speculate(self, tick_number, game_state, action, token):
+        """Prepares the analysis of the likely next states while waiting
+
+        Each branch is applied to the game state as the next tick's events
+        and rolled back. When the real tick matches a branch, its analysis is
+        found in the cache by the state's hash.
+        """
+        self._set_state(game_state)
+        self._set_budget(TickBudget.unlimited())
+        for events in self._get_likely_events(action):
+            token.check()
+            game_state.checkpoint()
+            try:
+                game_state.receive_ticks([{"tick": tick_number + 1, "events": events}])
+                key = game_state.zobrist
+                if key not in self.decision_cache and key not in self.analysis_cache:
+                    self._analyse_state()
+                    self.trees = self._get_trees()
+                    analysis = tuple(getattr(self, name) for name in ANALYSIS_FIELDS)
+                    self.analysis_cache.put(key, analysis)
+            finally:
+                game_state.rollback()
+
+    def _get_likely_events(self, action):
+        """Yields the events of the next tick for our action and each enemy move
+
+        Plants and detonations are rare and their events hard to predict
+        exactly, so only moves and waiting are speculated on.
+        """
+        if action is not None and action[0] != "move":
+            return
+        ours = self._get_move_events(self.us, action)
+        yield ours
+        for node in self._generate_neighbouring_tiles(self.them.coords):
+            move = ("move", _get_direction_from_coords(self.them.coords, node))
+            yield ours + self._get_move_events(self.them, move)
+
+    @staticmethod
+    def _get_move_events(player, action):
+        if action is None:
+            return []
+        data = {"type": "move", "move": action[1]}
+        return [{"type": "agent", "agent_number": int(player.id), "data": data}]
+
+    def _avoid_blasts(self, decision):
+        """Replaces a move or wait that leads into a blast with an escape step"""
+        label, action = decision
+        if action is None:
+            target = self.us.coords
+        elif action[0] == "move":
+            dx, dy = MOVES[action[1]]
+            target = (self.us.coords[0] + dx, self.us.coords[1] + dy)
+        else:
+            return decision
+        # The enemy can detonate its bombs whenever it likes
+        safety = SafetySearch(
+            self.map,
+            self.state.tick,
+            self.us.coords,
+            self.us.invulnerable_until,
+            remote_owners=(self.them.id,),
+        )
+        if target in safety.safe_moves or not safety.safe_moves:
+            return decision
+        if len(safety.escape_path) == 1:
+            return "EVADING    ", None
+        move = _get_direction_from_coords(self.us.coords, safety.escape_path[1])
+        return "EVADING    ", ("move", move)
+
+    def _evaluate_leaf(self, state):
+        """Scores a simulated state in [0, 1] from hp and our tile's weight"""
+        us = state.agents[self.us.id]
+        them = state.agents[self.them.id]
+        if us.hp <= 0 or them.hp <= 0:
+            return 0.5 if us.hp <= 0 and them.hp <= 0 else float(us.hp > 0)
+        weight = self._get_node_weight(us.coords) or WEIGHT_MAP["Default"]
+        entity = state.entities.get(us.coords)
+        if entity is not None and entity["type"] == Entity.BLAST:
+            weight = max(weight, WEIGHT_MAP[Entity.BLAST])
+        danger = min(weight, WEIGHT_MAP[Entity.BLAST]) / WEIGHT_MAP[Entity.BLAST]
+        value = 0.5 + 0.15 * (us.hp - them.hp) - 0.2 * danger
+        return min(1.0, max(0.0, value))
+
+    def _get_mcts_decision(self, deadline):
+        """Returns the label and action found by searching until the deadline"""
+        self._analyse_state()
+        action = self.mcts.search(
+            SimState.from_game_state(self.state),
+            self.us.id,
+            self.them.id,
+            self._evaluate_leaf,
+            deadline,
+        )
+        return "MCTS {:>6}".format(self.mcts.iterations), action
+
+    def _get_decision(self):
+        """Returns the label and action to take this tick, or None for no action"""
         # TODO: Improve blast avoidance - prioritise getting out quickly over losing more hp
         # TODO: Improve Bomb Placement:
             # TODO: Double plant strat
@@ -249,10 +519,9 @@ class Agent:
         # TODO: Avoid tunnels with len >= enemy bomb radius if enemy close to entrance
         # TODO: ML Map weights
 
-        self.node_weights = {}
-
-        self.danger_nodes = self._find_danger_nodes()
-        self.next_to_enemy = _manhattan_distance(self.us.coords, self.them.coords) == 1
+        self._analyse_state()
+        self.trap_analysis = self._get_trap_analysis()
+        self.token.check()
 
         detonatable_bombs = [
             b
@@ -269,173 +538,113 @@ class Agent:
                     or (trapped and (self.us.hp > 1 or self.us.hp == self.them.hp))
                     or self.us.hp > self.them.hp
             ) and not self.them.is_invulnerable:
-                await self._server.send_detonate(*bomb.position)
-                print("DETONATING ", end=" | ")
-                return
+                return "DETONATING ", ("detonate", *bomb.position)
 
         # Dismount bomb if just planted
-        if self.us.coords not in self.map.graph:
+        if self.us.coords not in self.map:
             target = self._dismount_bomb()
             if target is not None:
-                print("DISMOUNTING", end=" | ")
                 move = _get_direction_from_coords(self.us.coords, target)
-                await self._server.send_move(move)
+                return "DISMOUNTING", ("move", move)
             else:
-                print("STUCK      ", end=" | ")
-            return
+                return "STUCK      ", None
 
         # Block enemy if trapped
         if (
                 self._is_trapped(self.them)
                 and self._get_node_weight(self.us.coords) < WEIGHT_MAP["Danger"]
         ):
-            best_node = min(self._get_node_weight(node) for node in self.map.graph)
-            if self.us.ammo and best_node <= WEIGHT_MAP[Entity.AMMO] and self.map.graph.nodes[self.us.coords].get(
-                    "entity") != Entity.BLAST:
-                print("TRAPPING   ", end=" | ")
-                await self._server.send_bomb()
-                return
+            best_node = min(self._get_node_weight(node) for node in self.map)
+            if (
+                self.us.ammo
+                and best_node <= WEIGHT_MAP[Entity.AMMO]
+                and self.map.get_entity(self.us.coords) != Entity.BLAST
+            ):
+                return "TRAPPING   ", ("bomb",)
             else:
-                print("BLOCKING   ", end=" | ")
-                return
+                return "BLOCKING   ", None
 
         # Suicide Bombing
         if (
-                self.them.coords not in self.map.graph
+                self.them.coords not in self.map
                 and trapped
-                and self.us.coords in self.map.graph
+                and self.us.coords in self.map
                 and self.us.ammo
                 and self.next_to_enemy
         ):
-            print("SUICIDING  ", end=" | ")
-            await self._server.send_bomb()
-            return
+            return "SUICIDING  ", ("bomb",)
 
         # Plant bomb if abundance of ammo and space and next to enemy
         if (
                 self.us.ammo
-                and self.us.coords in self.map.graph
+                and self.us.coords in self.map
                 and self.us.id
                 not in self.map.bomb_library.get_bomb_impact_owners(self.them.coords)
         ):
-            x, y = self.us.coords
-            self.map.bomb_library.add_bomb(
-                {
-                    "x": x,
-                    "y": y,
-                    "blast_diameter": self.us.blast_diameter,
-                    "owner": self.us.id,
-                    "expires": self.state.tick + 40,
-                },
-                self.map,
-            )
-            self.map.bomb_library.update(self.map)
-            can_hit = self.us.id in self.map.bomb_library.get_bomb_impact_owners(
-                self.them.coords
-            )
-            guaranteed = True
-            for coords in self._generate_neighbouring_tiles(self.them.coords):
-                if not self.us.id in self.map.bomb_library.get_bomb_impact_owners(
-                    coords
-                ):
-                    guaranteed = False
-                    break
-            enemy_trapped = self._is_trapped(self.them)
-            self.map.bomb_library.remove_bomb(self.us.coords, self.map)
-            self.map.bomb_library.update(self.map)
-            danger_plant = self.map.graph.nodes[self.us.coords].get("entity") != Entity.BLAST
+            can_hit, guaranteed, enemy_trapped = self._evaluate_plants(
+                [self.us.coords]
+            )[0]
+            danger_plant = self.map.get_entity(self.us.coords) != Entity.BLAST
             if enemy_trapped:
-                print("TRAP PLANT ", end=" | ")
-                await self._server.send_bomb()
-                return
+                return "TRAP PLANT ", ("bomb",)
             if can_hit:
                 if guaranteed:
                     if self.us.hp > self.them.hp and not self.them.is_invulnerable:
-                        print("CHAD PLANT ", end=" | ")
-                        await self._server.send_bomb()
-                        return
+                        return "CHAD PLANT ", ("bomb",)
                     elif trapped:
-                        print("SUICIDING  ", end=" | ")
-                        await self._server.send_bomb()
-                        return
+                        return "SUICIDING  ", ("bomb",)
                     elif (
                         self.them.id
                         not in self.map.bomb_library.get_bomb_impact_owners(
                             self.us.coords
                         ) and not self.them.is_invulnerable
                     ):
-                        print("PLANTING   ", end=" | ")
-                        await self._server.send_bomb()
-                        return
+                        return "PLANTING   ", ("bomb",)
                 elif self.us.ammo >= self.them.hp * (
                     2 if self.state.tick < 1800 else 1
                 ) and not danger_plant:
-                    print("AREA DENIAL", end=" | ")
-                    await self._server.send_bomb()
-                    return
-
-        # Generate dijkstra paths from all players to all other nodes
-        self.paths = {}
-        self.distances = {}
-        for player in [self.us.coords, self.them.coords]:
-            if player in self.map.graph:
-                self.distances[player], self.paths[player] = nx.single_source_dijkstra(
-                    self.map.graph, player, weight=self._get_edge_weight
-                )
-            else:
-                self.distances[player] = {
-                    n: 1 for n in self._generate_neighbouring_tiles(player)
-                }
-                self.paths[player] = {
-                    n: [player, n] for n in self._generate_neighbouring_tiles(player)
-                }
-        if self.us.ammo:
+                    return "AREA DENIAL", ("bomb",)
+
+        # Generate dijkstra shortest path trees from both players
+        self.token.check()
+        if self.trees is None:
+            self.trees = self._get_trees()
+        if self.us.ammo and self._can_afford("prison break"):
             escape = self.prison_break()
             bomb = self.map.bomb_library.get_bomb_at(escape)
             if bomb is not None:
-                print("ESCAPING   ", end=" | ")
-                await self._server.send_detonate(*bomb.position)
-                return
+                return "ESCAPING   ", ("detonate", *bomb.position)
             if escape is not None:
                 if (
                     escape == self.us.coords
                     and self._get_node_weight(escape) <= WEIGHT_MAP["Danger"]
                 ):
-                    print("DEMOLISHING", end=" | ")
-                    await self._server.send_bomb()
-                    return
+                    return "DEMOLISHING", ("bomb",)
                 else:
-                    path = self.paths[self.us.coords][escape]
-                    worst_node = max(self._get_node_weight(n) for n in path)
+                    our_tree = self.trees[self.us.coords]
+                    worst_node = our_tree.max_weight(escape, self.weights)
                     if worst_node <= WEIGHT_MAP["Default"]:
-                        move = _get_direction_from_coords(self.us.coords, path[1])
-                        print("PLANNING   ", end=" | ")
-                        await self._server.send_move(move)
-                        return
-
-        attack_path = self._get_path_to_trap()
-        if (
-            attack_path is not None
-            and max(self._get_node_weight(node) for node in attack_path)
-            < WEIGHT_MAP["Danger"]
-        ):
-            print("ATTACKING  ", end=" | ")
-            move = _get_direction_from_coords(self.us.coords, attack_path[1])
-            await self._server.send_move(move)
-            return
-
-        optimal_path = self._get_path_to_best()
-        if optimal_path is not None and len(optimal_path) > 1:
-            print("IMPROVING  ", end=" | ")
-            move = _get_direction_from_coords(self.us.coords, optimal_path[1])
-            await self._server.send_move(move)
-            return
-        print("WAITING    ", end=" | ")
+                        move = _get_direction_from_coords(
+                            self.us.coords, our_tree.first_step(escape)
+                        )
+                        return "PLANNING   ", ("move", move)
+
+        self.token.check()
+        attack_step = self._get_step_to_trap()
+        if attack_step is not None:
+            move = _get_direction_from_coords(self.us.coords, attack_step)
+            return "ATTACKING  ", ("move", move)
+
+        optimal_step = self._get_step_to_best()
+        if optimal_step is not None:
+            move = _get_direction_from_coords(self.us.coords, optimal_step)
+            return "IMPROVING  ", ("move", move)
+        return "WAITING    ", None
 
     def prison_break(self):
         if (
-            self.them.coords not in self.map.graph
-            or self.them.coords in self.paths[self.us.coords]
+            self.them.coords not in self.map
+            or self.them.coords in self.trees[self.us.coords]
         ):
             return None
         bombs = self.map.bomb_library.get_bombs_owned_by(self.us.id)
@@ -445,16 +654,14 @@ class Agent:
                 if bomb not in bad_bombs:
                     return bomb.position
             return None
-        connected_nodes = nx.node_connected_component(
-            self.map.graph, self.us.coords
+        connected_nodes = self.map.components.members(
+            self.us.coords
         )  # Get nodes connected to us
-        if len(connected_nodes) > len(
-            nx.node_connected_component(self.map.graph, self.them.coords)
-        ):
+        if len(connected_nodes) > self.map.components.size_of(self.them.coords):
             return None
         best_nodes = PriorityQueue()
         for node in connected_nodes:
-            if len(self.map.graph[node]) < 4:  # If node has block neighbour
+            if len(self.map.neighbours(node)) < 4:  # If node has block neighbour
                 destruction_value = 0
                 actual_neighbours = self.get_actual_neighbours(
                     node
@@ -470,32 +677,27 @@ class Agent:
                             neighbour
                         )  # Get neighbours of block
                         for i in block_neighbours:
-                            if (
-                                i not in connected_nodes and i in self.map.graph
+                            if i in self.map and not self.map.components.same_component(
+                                i, self.us.coords
                             ):  # If node in new area
                                 destruction_value += (
-                                    len(nx.node_connected_component(self.map.graph, i))
-                                    / hp
-                                )  # Run the connected nodes
+                                    self.map.components.size_of(i) / hp
+                                )  # Size of the connected nodes
                 if destruction_value > 0:
                     best_nodes.push((-destruction_value, node))
+        candidates = []
         while not best_nodes.is_empty():
-            x, y = best_nodes.pop()[1]
-            bomb = Bomb(
-                {
-                    "x": x,
-                    "y": y,
-                    "blast_diameter": self.us.blast_diameter,
-                    "owner": self.us.id,
-                    "expires": self.state.tick + 40,
-                }
-            )
-            bomb.calculate_impacts(self.map)
+            candidates.append(best_nodes.pop()[1])
+        outcomes = self.map.bomb_library.evaluate_bombs(
+            [self._get_plant_entity(c) for c in candidates], self.map
+        )
+        for outcome in outcomes:
+            x, y = outcome.bomb.position
             for node in connected_nodes:
                 node_weight = self._get_node_weight(node)
                 if (
                     node != (x, y)
-                    and node not in bomb.impacts
+                    and node not in outcome.impacts
                     and node_weight < WEIGHT_MAP["Danger"]
                     and not self.map.bomb_library.get_bombs_impacting(node)
                 ):
@@ -0,0 +1,125 @@
+import math
+import random
+import time
+
+from ..simulator import ForwardModel, to_packet
+
+EXPLORATION = 1.4
+HORIZON = 12
+ROLLOUT_DEPTH = 4
+
+
+class _Node:
+    """Search node holding separate action statistics for each agent"""
+
+    __slots__ = ("actions", "visits", "totals", "children")
+
+    def __init__(self, actions):
+        self.actions = actions
+        self.visits = [[0] * len(a) for a in actions]
+        self.totals = [[0.0] * len(a) for a in actions]
+        self.children = {}
+
+
+class MCTS:
+    """Monte Carlo tree search over both agents' simultaneous actions
+
+    Each node keeps separate statistics for the two agents and each picks its
+    action with UCB1 (decoupled UCT), us maximising the value and them
+    minimising it. Leaves are played out with random actions for a few ticks
+    and scored by ``evaluate(state)``, which returns a value in [0, 1] from
+    our point of view.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        horizon=HORIZON,
+        rollout_depth=ROLLOUT_DEPTH,
+        exploration=EXPLORATION,
+        seed=None,
+    ):
+        self.model = model or ForwardModel()
+        self.horizon = horizon
+        self.rollout_depth = rollout_depth
+        self.exploration = exploration
+        self.random = random.Random(seed)
+        self.iterations = 0
+
+    def search(self, state, us, them, evaluate, deadline, max_iterations=None):
+        """Returns our most visited action once the deadline passes
+
+        ``deadline`` is a time.perf_counter() value. The number of iterations
+        run is kept in ``iterations``.
+        """
+        self._players = (us, them)
+        self._evaluate = evaluate
+        root = self._new_node(state)
+        self.iterations = 0
+        while time.perf_counter() < deadline and (
+            max_iterations is None or self.iterations < max_iterations
+        ):
+            self._iterate(root, state.copy())
+            self.iterations += 1
+        visits = root.visits[0]
+        best = max(range(len(visits)), key=lambda i: (visits[i], root.totals[0][i]))
+        return root.actions[0][best]
+
+    def _new_node(self, state):
+        return _Node([self.model.get_actions(state, p) for p in self._players])
+
+    def _select(self, node, player):
+        visits = node.visits[player]
+        totals = node.totals[player]
+        log_total = math.log(sum(visits) or 1)
+        best, best_score = 0, -math.inf
+        for i, count in enumerate(visits):
+            if count == 0:
+                return i
+            mean = totals[i] / count
+            score = mean + self.exploration * math.sqrt(log_total / count)
+            if score > best_score:
+                best, best_score = i, score
+        return best
+
+    def _step(self, state, actions):
+        packets = [
+            (player, to_packet(action))
+            for player, action in zip(self._players, actions)
+            if action is not None
+        ]
+        self.model.step(state, packets)
+
+    def _iterate(self, root, state):
+        node = root
+        path = []
+        depth = 0
+        while depth < self.horizon and not state.is_over():
+            choice = (self._select(node, 0), self._select(node, 1))
+            path.append((node, choice))
+            self._step(state, [node.actions[p][i] for p, i in enumerate(choice)])
+            depth += 1
+            child = node.children.get(choice)
+            if child is None:
+                node.children[choice] = self._new_node(state)
+                break
+            node = child
+        value = self._rollout(state, depth)
+        for node, (ours, theirs) in path:
+            node.visits[0][ours] += 1
+            node.totals[0][ours] += value
+            node.visits[1][theirs] += 1
+            node.totals[1][theirs] += 1 - value
+
+    def _rollout(self, state, depth):
+        for _ in range(min(self.rollout_depth, self.horizon - depth)):
+            if state.is_over():
+                break
+            self._step(
+                state,
+                [
+                    self.random.choice(self.model.get_actions(state, player))
+                    for player in self._players
+                ],
+            )
+        return self._evaluate(state)
@@ -0,0 +1,160 @@
+import heapq
+from collections import deque
+
+
+def grid_dijkstra(weights, adjacency, source):
+    """Single source shortest paths over a flat grid
+
+    Moving between two adjacent tiles costs the sum of both tile weights.
+    Tiles are indexed as in the map (``y * width + x``) and ``adjacency``
+    lists the passable neighbours of each tile. Weights are integers apart
+    from ``math.inf``, so tentative distances are kept in FIFO buckets keyed
+    by distance and only the distinct keys go through a heap. Ties therefore
+    settle in the same order as networkx's single_source_dijkstra.
+
+    Returns lists of distances and predecessors indexed by tile, with None
+    and -1 respectively for tiles that cannot be reached.
+    """
+    size = len(adjacency)
+    dist = [None] * size
+    seen = [None] * size
+    pred = [-1] * size
+    seen[source] = 0
+    buckets = {0: deque((source,))}
+    keys = [0]
+    while keys:
+        d = keys[0]
+        bucket = buckets[d]
+        v = bucket.popleft()
+        if not bucket:
+            heapq.heappop(keys)
+            del buckets[d]
+        if dist[v] is not None:
+            continue
+        dist[v] = d
+        weight = weights[v]
+        for u in adjacency[v]:
+            if dist[u] is not None:
+                continue
+            vu_dist = d + weight + weights[u]
+            if seen[u] is None or vu_dist < seen[u]:
+                seen[u] = vu_dist
+                pred[u] = v
+                bucket = buckets.get(vu_dist)
+                if bucket is None:
+                    buckets[vu_dist] = deque((u,))
+                    heapq.heappush(keys, vu_dist)
+                else:
+                    bucket.append(u)
+    return dist, pred
+
+
+def grid_bfs(adjacency, sources):
+    """Unweighted distance from the nearest of the source tiles
+
+    Returns a list indexed by tile holding the number of moves needed, or
+    None for tiles that cannot be reached.
+    """
+    dist = [None] * len(adjacency)
+    frontier = []
+    for source in sources:
+        if dist[source] is None:
+            dist[source] = 0
+            frontier.append(source)
+    d = 0
+    while frontier:
+        d += 1
+        next_frontier = []
+        for v in frontier:
+            for u in adjacency[v]:
+                if dist[u] is None:
+                    dist[u] = d
+                    next_frontier.append(u)
+        frontier = next_frontier
+    return dist
+
+
+class ShortestPathTree:
+    """Shortest paths from a single source, reconstructed on demand
+
+    Only the predecessor of each tile is stored. Paths, their first step,
+    their length and the heaviest tile along them are derived when asked for
+    rather than materialising a path list for every reachable tile.
+    """
+
+    def __init__(self, map, source, dist, pred):
+        self._map = map
+        self.source = source
+        self._dist = dist
+        self._pred = pred
+        self._hops = [None] * len(pred)
+
+    @classmethod
+    def search(cls, map, source, weights):
+        """Runs grid_dijkstra from the source over the given tile weights"""
+        dist, pred = grid_dijkstra(weights, map.adjacency(), map.index(source))
+        return cls(map, source, dist, pred)
+
+    @classmethod
+    def from_neighbours(cls, map, source, neighbours):
+        """Builds a one step tree for a source that is not itself passable"""
+        size = map.width * map.height
+        dist = [None] * size
+        pred = [-1] * size
+        for node in neighbours:
+            dist[map.index(node)] = 1
+            pred[map.index(node)] = map.index(source)
+        return cls(map, source, dist, pred)
+
+    def __contains__(self, coords):
+        return self._map.in_bounds(coords) and (
+            self._dist[self._map.index(coords)] is not None
+        )
+
+    def distance(self, coords):
+        return self._dist[self._map.index(coords)]
+
+    def _indices(self, coords):
+        index = self._map.index(coords)
+        indices = [index]
+        while self._pred[index] != -1:
+            index = self._pred[index]
+            indices.append(index)
+        return indices[::-1]
+
+    def path(self, coords):
+        """Returns the tiles from the source to the coords, or None"""
+        if coords not in self:
+            return None
+        return [self._map.coords(index) for index in self._indices(coords)]
+
+    def length(self, coords):
+        """Returns the number of tiles on the path, including both ends"""
+        if coords not in self:
+            return None
+        index = self._map.index(coords)
+        chain = []
+        while self._hops[index] is None and self._pred[index] != -1:
+            chain.append(index)
+            index = self._pred[index]
+        if self._hops[index] is None:
+            self._hops[index] = 1
+        hops = self._hops[index]
+        for index in reversed(chain):
+            hops += 1
+            self._hops[index] = hops
+        return self._hops[self._map.index(coords)]
+
+    def first_step(self, coords):
+        """Returns the tile to move to from the source, or None if already there"""
+        if coords not in self:
+            return None
+        indices = self._indices(coords)
+        return self._map.coords(indices[1]) if len(indices) > 1 else None
+
+    def max_weight(self, coords, weights, include_source=True, default=None):
+        """Returns the heaviest tile weight along the path to the coords"""
+        indices = self._indices(coords)
+        if not include_source:
+            indices = indices[1:]
+        return max((weights[index] for index in indices), default=default)
@@ -0,0 +1,201 @@
+import asyncio
+import contextlib
+import functools
+import glob
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+
+from .bot.agent import MAP_BACKENDS, Agent
+from .server_connection import ServerConnection
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "Results")
+
+
+class InlineExecutor(Executor):
+    """Executor that runs each call straight away in the calling thread"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+class ReplayConnection(ServerConnection):
+    """Server connection that records the packets it would send
+
+    Decisions and speculation run inline, so each speculation finishes before
+    the next tick as if the agent had been idle until it arrived. Time spent
+    speculating is added up in ``speculation_seconds``.
+    """
+
+    def __init__(self, map_class=None):
+        super().__init__("", map_class)
+        self._executor = InlineExecutor()
+        self.sent = []
+        self.speculation_seconds = 0.0
+
+    def set_decision_callback(
+        self, decision_callback, fallback_callback=None, speculation_callback=None
+    ):
+        if speculation_callback is not None:
+            speculation_callback = self._timed(speculation_callback)
+        super().set_decision_callback(
+            decision_callback, fallback_callback, speculation_callback
+        )
+
+    def _timed(self, callback):
+        def timed(*args):
+            start = time.perf_counter()
+            try:
+                return callback(*args)
+            finally:
+                self.speculation_seconds += time.perf_counter() - start
+
+        return timed
+
+    async def _send(self, packet):
+        self.sent.append(packet)
+
+
+class TickRecord:
+    """The label and packets the agent sent on a tick, and the time it took"""
+
+    __slots__ = ("tick", "label", "packets", "seconds")
+
+    def __init__(self, tick, label, packets, seconds):
+        self.tick = tick
+        self.label = label
+        self.packets = packets
+        self.seconds = seconds
+
+
+def load_replay(path):
+    with open(path) as f:
+        return json.load(f)["payload"]
+
+
+def get_agent_number(path):
+    """Returns the agent a replay was recorded for, from its agent_a/b folder"""
+    folder = os.path.basename(os.path.dirname(path))
+    return 1 if folder == "agent_b" else 0
+
+
+def find_replays(paths=()):
+    """Returns the replay.json files in the given files or folders, sorted"""
+    replays = []
+    for path in paths or [RESULTS_DIR]:
+        if os.path.isdir(path):
+            pattern = os.path.join(path, "**", "replay.json")
+            replays.extend(glob.glob(pattern, recursive=True))
+        else:
+            replays.append(path)
+    return sorted(replays)
+
+
+def get_ticks(replay):
+    """Yields every tick's payload in order, with no events for unrecorded ticks
+
+    Replays only record ticks on which something happened, but the server
+    sends every tick.
+    """
+    history = {tick["tick"]: tick["events"] for tick in replay["history"]}
+    start = replay["initial_state"]["tick"] + 1
+    for tick in range(start, max(history, default=start - 1) + 1):
+        yield {"tick": tick, "events": history.get(tick, [])}
+
+
+async def _play(agent, server, replay, agent_number, instrument):
+    game_state = dict(replay["initial_state"])
+    game_state["connection"] = {"agent_number": agent_number}
+    await server._on_data({"type": "game_state", "payload": game_state})
+    if instrument is not None:
+        instrument(agent, server)
+    records = []
+    for game_tick in get_ticks(replay):
+        sent = len(server.sent)
+        speculation_seconds = server.speculation_seconds
+        start = time.perf_counter()
+        await server._on_data({"type": "tick", "payload": game_tick})
+        seconds = time.perf_counter() - start
+        seconds -= server.speculation_seconds - speculation_seconds
+        records.append(
+            TickRecord(game_tick["tick"], agent.label, server.sent[sent:], seconds)
+        )
+    await server._on_data({"type": "endgame_state", "payload": {}})
+    return records
+
+
+def run_replay(
+    replay,
+    agent_number,
+    map_backend=None,
+    engine=None,
+    speculate=True,
+    instrument=None,
+):
+    """Plays the agent through a replay, returning a TickRecord for every tick
+
+    Ticks are fed through the same code as live packets, as fast as they are
+    processed. A tick's time leaves out the speculation that follows it.
+    ``instrument(agent, server)`` is called once the game state has been set.
+    """
+    map_backend = map_backend or os.environ.get("MAP_BACKEND") or "graph"
+    server = ReplayConnection(MAP_BACKENDS[map_backend])
+    agent = Agent(engine=engine, server=server)
+    if not speculate:
+        server.set_decision_callback(agent._decide, agent._get_fallback_action)
+    loop = asyncio.new_event_loop()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return loop.run_until_complete(
+                _play(agent, server, replay, agent_number, instrument)
+            )
+    finally:
+        loop.close()
+
+
+def _run_path(path, map_backend, engine, speculate):
+    replay = load_replay(path)
+    return run_replay(replay, get_agent_number(path), map_backend, engine, speculate)
+
+
+def run_replays(paths=(), map_backend=None, engine=None, speculate=True, jobs=1):
+    """Returns the tick records of every replay found, keyed by path
+
+    With more than one job the replays are shared between worker processes.
+    """
+    paths = find_replays(paths)
+    run = functools.partial(
+        _run_path, map_backend=map_backend, engine=engine, speculate=speculate
+    )
+    if jobs == 1:
+        results = [run(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(jobs) as executor:
+            results = list(executor.map(run, paths))
+    return dict(zip(paths, results))
+
+
+if __name__ == "__main__":
+    # python -m app.replay_runner [replay json or folder ...]
+    start = time.perf_counter()
+    results = run_replays(sys.argv[1:], jobs=os.cpu_count())
+    elapsed = time.perf_counter() - start
+    seconds = [record.seconds for records in results.values() for record in records]
+    if seconds:
+        print(
+            "{} replays, {} ticks in {:.1f}s: mean {:.2f} ms, max {:.2f} ms".format(
+                len(results),
+                len(seconds),
+                elapsed,
+                1000 * sum(seconds) / len(seconds),
+                1000 * max(seconds),
+            )
+        )
@@ -0,0 +1,151 @@
+from .simulator import BLAST_LIFETIME
+from .utilities import Entity, FIRE_SPAWN_MAP
+
+HORIZON = 15
+
+
+class SafetySearch:
+    """Moves that avoid every blast over the next few ticks
+
+    Searches (tile, tick) space a tick at a time with bitboards. Layer i
+    holds the tiles the agent can stand on after acting on tick + 1 + i. As
+    on the server, a tile is checked for blasts at the start of each tick,
+    before the agent moves off it. Blasts are timed from the bomb library's
+    detonation ticks, which account for chain reactions, from the expiry of
+    blasts already on the map and from end-game fire spawns.
+
+    Bombs planted by any of ``remote_owners`` are assumed to be detonated at
+    any moment. Blocks destroyed by blasts are still treated as walls, and
+    bombs planted straight into a blast, which explode at once, are missed.
+    """
+
+    def __init__(
+        self,
+        map,
+        tick,
+        coords,
+        invulnerable_until=0,
+        horizon=HORIZON,
+        remote_owners=(),
+    ):
+        self._map = map
+        self._bitboard = map.bitboard
+        self.tick = tick
+        self.coords = coords
+        self.horizon = horizon
+        self._origin = self._bitboard.bit(coords)
+        self._unsafe = self._get_unsafe_masks(invulnerable_until, remote_owners)
+        self._passable = self._get_passable_masks()
+        self.safe_moves = self._find_safe_moves()
+        self.escape_path = self._find_escape_path()
+
+    def _get_unsafe_masks(self, invulnerable_until, remote_owners):
+        """Returns the tiles that hurt at the start of ticks tick+1..tick+horizon+1"""
+        first = self.tick + 1
+        unsafe = [0] * (self.horizon + 1)
+
+        def mark(mask, start, end):
+            for t in range(max(start, first), min(end, first + len(unsafe))):
+                unsafe[t - first] |= mask
+
+        bitboard = self._bitboard
+        library = self._map.bomb_library
+        for bomb in library.get_bombs():
+            detonates_at = max(library.get_detonation_tick(bomb), first)
+            start = first if bomb.planted_by in remote_owners else detonates_at
+            mask = bitboard.from_coords(bomb.impacts) | bitboard.bit(bomb.position)
+            mark(mask, start, detonates_at + BLAST_LIFETIME)
+        end = first + len(unsafe)
+        for coords, entity in self._map.entities.items():
+            if entity["type"] == Entity.BLAST:
+                mark(bitboard.bit(coords), first, entity.get("expires", end))
+        for t in range(first, end):
+            fire = FIRE_SPAWN_MAP.get(t)
+            if fire is not None:
+                mark(bitboard.bit(fire), t, end)
+        for t in range(first, min(invulnerable_until, first + self.horizon) + 1):
+            unsafe[t - first] = 0
+        return unsafe
+
+    def _get_passable_masks(self):
+        """Returns the tiles that can be entered on ticks tick+1..tick+horizon"""
+        first = self.tick + 1
+        passable = [self._map.masks.passable] * self.horizon
+        library = self._map.bomb_library
+        for bomb in library.get_bombs():
+            bit = self._bitboard.bit(bomb.position)
+            detonates_at = max(library.get_detonation_tick(bomb), first)
+            for t in range(detonates_at, first + self.horizon):
+                passable[t - first] |= bit
+        return passable
+
+    def _expand(self, survivors, layer):
+        """Returns the tiles reachable from the survivors in one tick"""
+        neighbours = self._bitboard.neighbours(survivors) & self._passable[layer]
+        return survivors | neighbours
+
+    def _search(self, start):
+        """Returns the reachable tiles of every layer, starting from layer 0"""
+        layers = [start]
+        for layer in range(1, self.horizon):
+            survivors = layers[-1] & ~self._unsafe[layer]
+            layers.append(self._expand(survivors, layer))
+        return layers
+
+    def _survives(self, layers):
+        return bool(layers[-1] & ~self._unsafe[self.horizon])
+
+    def _find_safe_moves(self):
+        """Returns the tiles to be on after this tick that survive the horizon"""
+        if self._origin & self._unsafe[0]:
+            return set()
+        safe_moves = set()
+        for bit in self._bits(self._expand(self._origin, 0)):
+            if self._survives(self._search(bit)):
+                safe_moves.add(self._to_coords(bit))
+        return safe_moves
+
+    def _find_escape_path(self):
+        """Returns the quickest path to a tile that stays safe, one tile per tick
+
+        The path starts on the current tile, and is None if nothing is safe.
+        """
+        unsafe = self._unsafe
+        if self._origin & unsafe[0]:
+            return None
+        safe_after = [0] * self.horizon
+        safe = self._bitboard.full
+        for layer in range(self.horizon - 1, -1, -1):
+            safe &= ~unsafe[layer + 1]
+            safe_after[layer] = safe
+        if self._origin & safe_after[0] & ~unsafe[0]:
+            return [self.coords]
+        layers = self._search(self._expand(self._origin, 0))
+        for last, reachable in enumerate(layers):
+            if reachable & safe_after[last]:
+                break
+        else:
+            return None
+        current = self._lowest(layers[last] & safe_after[last])
+        path = [current]
+        for layer in range(last - 1, -1, -1):
+            previous = current
+            if current & self._passable[layer + 1]:
+                previous |= self._bitboard.neighbours(current)
+            current = self._lowest(previous & layers[layer] & ~unsafe[layer + 1])
+            path.append(current)
+        path.append(self._origin)
+        return [self._to_coords(bit) for bit in reversed(path)]
+
+    @staticmethod
+    def _lowest(mask):
+        return mask & -mask
+
+    def _bits(self, mask):
+        while mask:
+            bit = mask & -mask
+            yield bit
+            mask ^= bit
+
+    def _to_coords(self, bit):
+        return next(self._bitboard.to_coords(bit))
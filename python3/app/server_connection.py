@@ -1,21 +1,154 @@
+import asyncio
 import json
+import math
+import os
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import websockets
 
 from .state.game_state import GameState
 
+TICK_RATE_HZ = float(os.environ.get("TICK_RATE_HZ") or 10)
+SEND_MARGIN = 0.01
+
+
+class DecisionCancelled(Exception):
+    """Raised inside a decision callback once a newer tick has arrived"""
+
+
+class CancelToken:
+    """Lets the receive loop stop a decision running in the worker thread
+
+    Decisions call ``check`` between stages, which raises DecisionCancelled
+    once the tick being decided is stale.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise DecisionCancelled
+
+
+class TickBudget:
+    """Time left to respond to a tick, counted from when its packet arrived
+
+    The deadline is one tick period after arrival, less a margin for sending
+    the action. Times are time.perf_counter() values.
+    """
+
+    def __init__(self, arrived, tick_rate=TICK_RATE_HZ, margin=SEND_MARGIN):
+        self.arrived = arrived
+        self.period = 1 / tick_rate
+        self.deadline = arrived + self.period - margin
+
+    @classmethod
+    def unlimited(cls):
+        budget = cls(time.perf_counter())
+        budget.deadline = math.inf
+        return budget
+
+    def remaining(self):
+        return self.deadline - time.perf_counter()
+
+    def used(self):
+        """Returns the fraction of the tick period that has passed"""
+        return (time.perf_counter() - self.arrived) / self.period
+
+
+class TickStats:
+    """Counts the ticks of a game that were skipped or decided too slowly"""
+
+    def __init__(self):
+        self.ticks = 0
+        self.skipped = 0
+        self.catch_ups = 0
+        self.max_backlog = 0
+        self.cancelled = 0
+
+    def record(self, backlog):
+        """Records a response to the latest tick, with backlog ticks behind it"""
+        self.ticks += backlog + 1
+        if backlog:
+            self.skipped += backlog
+            self.catch_ups += 1
+            self.max_backlog = max(self.max_backlog, backlog)
+
+    def __str__(self):
+        return (
+            "{} skipped / {} ticks, {} catch-ups, max backlog {}, {} cancelled"
+        ).format(
+            self.skipped, self.ticks, self.catch_ups, self.max_backlog, self.cancelled
+        )
+
 
 class ServerConnection:
     VALID_MOVES = ("up", "down", "left", "right")
 
-    def __init__(self, connection_string: str):
+    def __init__(self, connection_string: str, map_class=None):
         self._connection_string = connection_string
-        self._state = GameState()
+        self._state = GameState(map_class)
         self._tick_callback = None
+        self._decision_callback = None
+        self._fallback_callback = None
+        self._speculation_callback = None
+        self._speculation = None
+        self._speculation_token = None
+        self._game_start_callback = None
+        self._game_over_callback = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._frames = deque()
+        self._frame_arrived = None
+        self._pending_ticks = 0
+        self._tick_arrived = None
+        self.tick_stats = TickStats()
 
     def set_game_tick_callback(self, generate_agent_action_callback):
+        """Sets a coroutine that is awaited on every tick and sends its own action
+
+        Ticks are handled one at a time, so a slow callback delays the next.
+        """
         self._tick_callback = generate_agent_action_callback
 
+    def set_decision_callback(
+        self, decision_callback, fallback_callback=None, speculation_callback=None
+    ):
+        """Sets a function that returns the action to send for each tick
+
+        ``decision_callback(tick_number, game_state, token, budget)`` runs in a
+        worker thread and returns an action tuple such as ("move", "up"), or
+        None. ``budget`` is the tick's TickBudget. If the next tick arrives
+        first the token is cancelled, and once the decision has stopped the
+        action from the cheap ``fallback_callback(tick_number, game_state)`` is
+        sent instead.
+
+        Once the action is sent, ``speculation_callback(tick_number,
+        game_state, action, token)`` runs in the worker thread until the next
+        packet arrives, when its token is cancelled. It may change the game
+        state but must restore it before returning.
+        """
+        self._decision_callback = decision_callback
+        self._fallback_callback = fallback_callback
+        self._speculation_callback = speculation_callback
+
+    def set_game_start_callback(self, game_start_callback):
+        """Sets a function called with the game state whenever a new one is set"""
+        self._game_start_callback = game_start_callback
+
+    def set_game_over_callback(self, game_over_callback):
+        self._game_over_callback = game_over_callback
+
     async def connect(self):
         self.connection = await websockets.client.connect(self._connection_string)
         if self.connection.open:
@@ -37,36 +170,174 @@ class ServerConnection:
         packet = {"type": "detonate", "coordinates": [x, y]}
         await self._send(packet)
 
+    async def send_action(self, action):
+        """Sends an action tuple, e.g. ("move", "up"), doing nothing for None"""
+        if action is None:
+            return
+        if action[0] == "move":
+            await self.send_move(action[1])
+        elif action[0] == "bomb":
+            await self.send_bomb()
+        elif action[0] == "detonate":
+            await self.send_detonate(*action[1:])
+
     async def handle_messages(self, connection):
-        while True:
-            try:
+        self._frames = deque()
+        self._frame_arrived = asyncio.Event()
+        self._pending_ticks = 0
+        self._tick_arrived = asyncio.Event()
+        reader = asyncio.ensure_future(self._read_frames(connection))
+        try:
+            while True:
+                data = await self._next_frame()
+                if data is None:
+                    # Raises whatever stopped the reader, if not a closed connection
+                    await reader
+                    break
+                arrived, data = data
+                if data.get("type") == "tick":
+                    game_ticks, arrived = self._take_ticks(data, arrived)
+                    await self._on_game_ticks(game_ticks, arrived)
+                else:
+                    await self._on_data(data)
+        except websockets.exceptions.ConnectionClosed:
+            print("Connection with server closed")
+        finally:
+            reader.cancel()
+            await self._stop_speculation()
+
+    async def _read_frames(self, connection):
+        """Reads frames as they arrive so that a slow tick cannot hold them up
+
+        However the reader stops, None is queued to end handle_messages.
+        """
+        try:
+            while True:
                 raw_data = await connection.recv()
+                arrived = time.perf_counter()
                 data = json.loads(raw_data)
-                await self._on_data(data)
-            except websockets.exceptions.ConnectionClosed:
-                print("Connection with server closed")
+                if data.get("type") == "tick":
+                    self._pending_ticks += 1
+                    self._tick_arrived.set()
+                self._frames.append((arrived, data))
+                self._frame_arrived.set()
+        except websockets.exceptions.ConnectionClosed:
+            print("Connection with server closed")
+        finally:
+            self._frames.append(None)
+            self._frame_arrived.set()
+
+    async def _next_frame(self):
+        while not self._frames:
+            self._frame_arrived.clear()
+            await self._frame_arrived.wait()
+        return self._frames.popleft()
+
+    def _take_ticks(self, data, arrived):
+        """Returns the tick's payload along with any queued straight behind it
+
+        Only the latest tick needs a response, so when processing has fallen
+        behind the backlog is caught up on in one go. The arrival time of the
+        latest tick is returned with the payloads.
+        """
+        game_ticks = [data.get("payload")]
+        self._pending_ticks -= 1
+        while self._frames and self._frames[0] is not None:
+            data_type = self._frames[0][1].get("type")
+            if data_type == "tick":
+                arrived, data = self._frames.popleft()
+                game_ticks.append(data.get("payload"))
+                self._pending_ticks -= 1
+            elif data_type == "info":
+                self._frames.popleft()
+            else:
                 break
+        return game_ticks, arrived
 
     async def _on_data(self, data):
+        await self._stop_speculation()
         data_type = data.get("type")
         if data_type == "game_state":
             payload = data.get("payload")
             self._on_game_state(payload)
         elif data_type == "tick":
-            payload = data.get("payload")
-            self._state.update_tick(payload.get("tick"))
-            await self._on_game_tick(payload)
-        elif data_type != "info" and data_type != "endgame_state":
+            await self._on_game_ticks([data.get("payload")], time.perf_counter())
+        elif data_type == "endgame_state":
+            print("TICKS: {}".format(self.tick_stats))
+            if self._game_over_callback is not None:
+                await self._game_over_callback(data.get("payload"))
+        elif data_type != "info":
             print(f'unknown packet "{data_type}": {data}')
 
     def _on_game_state(self, game_state):
         self._state.set_state(game_state)
+        self.tick_stats = TickStats()
+        if self._game_start_callback is not None:
+            self._game_start_callback(self._state)
 
-    async def _on_game_tick(self, game_tick):
-        start = time.time()
-        self._state.receive_events(game_tick.get("events"))
-        if self._tick_callback is not None:
-            tick_number = game_tick.get("tick")
+    async def _on_game_ticks(self, game_ticks, arrived):
+        """Applies every tick's events and responds to the latest tick only"""
+        budget = TickBudget(arrived)
+        await self._stop_speculation()
+        self._state.receive_ticks(game_ticks)
+        self.tick_stats.record(len(game_ticks) - 1)
+        tick_number = game_ticks[-1].get("tick")
+        if self._decision_callback is not None:
+            await self._decide(tick_number, budget)
+        elif self._tick_callback is not None:
             await self._tick_callback(tick_number, self._state)
-        end = time.time()
-        print("TIME: {:.2f}%".format(100 * (end - start) / 0.1))
+        print("TIME: {:.2f}%".format(100 * budget.used()))
+
+    async def _decide(self, tick_number, budget):
+        """Sends the decision for the tick, or the fallback if a newer tick arrives"""
+        token = CancelToken()
+        loop = asyncio.get_event_loop()
+        decision = loop.run_in_executor(
+            self._executor,
+            self._decision_callback,
+            tick_number,
+            self._state,
+            token,
+            budget,
+        )
+        if self._tick_arrived is not None:
+            self._tick_arrived.clear()
+            if self._pending_ticks:
+                self._tick_arrived.set()
+            newer_tick = asyncio.ensure_future(self._tick_arrived.wait())
+            await asyncio.wait(
+                [decision, newer_tick], return_when=asyncio.FIRST_COMPLETED
+            )
+            newer_tick.cancel()
+        if not decision.done():
+            token.cancel()
+            self.tick_stats.cancelled += 1
+        try:
+            # The state can't change under a decision, so wait for it to stop
+            action = await decision
+        except DecisionCancelled:
+            action = None
+            if self._fallback_callback is not None:
+                action = self._fallback_callback(tick_number, self._state)
+        await self.send_action(action)
+        if self._speculation_callback is not None:
+            self._speculation_token = CancelToken()
+            self._speculation = loop.run_in_executor(
+                self._executor,
+                self._speculation_callback,
+                tick_number,
+                self._state,
+                action,
+                self._speculation_token,
+            )
+
+    async def _stop_speculation(self):
+        """Cancels the speculation and waits for it to restore the game state"""
+        if self._speculation is None:
+            return
+        self._speculation_token.cancel()
+        try:
+            await self._speculation
+        except DecisionCancelled:
+            pass
+        self._speculation = None
@@ -0,0 +1,420 @@
+from .utilities import Entity, FIRE_SPAWN_MAP
+
+BOMB_LIFETIME = 40
+BLAST_LIFETIME = 10
+INVULNERABILITY_TICKS = 5
+PICKUPS = (Entity.AMMO, Entity.POWERUP)
+PASSABLE = PICKUPS + (Entity.BLAST,)
+MOVES = {"up": (0, 1), "down": (0, -1), "left": (-1, 0), "right": (1, 0)}
+
+
+def to_packet(action):
+    """Converts an agent action tuple, e.g. ("move", "up"), to a server packet"""
+    if action[0] == "move":
+        return {"type": "move", "move": action[1]}
+    elif action[0] == "bomb":
+        return {"type": "bomb"}
+    return {"type": "detonate", "coordinates": [action[1], action[2]]}
+
+
+class SimAgent:
+    """Mutable copy of one agent's state inside the simulator"""
+
+    __slots__ = (
+        "number",
+        "coords",
+        "hp",
+        "ammo",
+        "blast_diameter",
+        "invulnerability",
+    )
+
+    def __init__(self, number, coords, hp, ammo, blast_diameter, invulnerability):
+        self.number = number
+        self.coords = coords
+        self.hp = hp
+        self.ammo = ammo
+        self.blast_diameter = blast_diameter
+        self.invulnerability = invulnerability
+
+    @classmethod
+    def from_json(cls, state):
+        return cls(
+            str(state["number"]),
+            tuple(state["coordinates"]),
+            state["hp"],
+            state["inventory"]["bombs"],
+            state["blast_diameter"],
+            state["invulnerability"],
+        )
+
+    def copy(self):
+        return SimAgent(
+            self.number,
+            self.coords,
+            self.hp,
+            self.ammo,
+            self.blast_diameter,
+            self.invulnerability,
+        )
+
+    def to_json(self):
+        return {
+            "coordinates": list(self.coords),
+            "hp": self.hp,
+            "inventory": {"bombs": self.ammo},
+            "blast_diameter": self.blast_diameter,
+            "number": int(self.number),
+            "invulnerability": self.invulnerability,
+        }
+
+
+class SimState:
+    """Snapshot of the game that the forward model can step
+
+    Entities are kept as the server's entity dicts keyed by coordinates.
+    Entity dicts are never mutated, only replaced, so copies can share them.
+    """
+
+    __slots__ = ("tick", "width", "height", "agents", "entities")
+
+    def __init__(self, tick, width, height, agents, entities):
+        self.tick = tick
+        self.width = width
+        self.height = height
+        self.agents = agents
+        self.entities = entities
+
+    @classmethod
+    def from_json(cls, state):
+        """Builds a state from a game_state payload"""
+        world = state["world"]
+        agents = {
+            str(agent["number"]): SimAgent.from_json(agent)
+            for agent in state["agent_state"].values()
+        }
+        entities = {(e["x"], e["y"]): e for e in state["entities"]}
+        return cls(state["tick"], world["width"], world["height"], agents, entities)
+
+    @classmethod
+    def from_game_state(cls, game_state):
+        """Builds a state from the agent's live GameState
+
+        GameState does not track damage to ore, so ore is taken at the hp it
+        spawned with.
+        """
+        agents = {
+            number: SimAgent(
+                player.id,
+                player.coords,
+                player.hp,
+                player.ammo,
+                player.blast_diameter,
+                player.invulnerable_until,
+            )
+            for number, player in game_state.agents.items()
+        }
+        game_map = game_state.map
+        return cls(
+            game_state.tick,
+            game_map.width,
+            game_map.height,
+            agents,
+            dict(game_map.entities),
+        )
+
+    def copy(self):
+        return SimState(
+            self.tick,
+            self.width,
+            self.height,
+            {number: agent.copy() for number, agent in self.agents.items()},
+            dict(self.entities),
+        )
+
+    def in_bounds(self, coords):
+        x, y = coords
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_over(self):
+        return any(agent.hp <= 0 for agent in self.agents.values())
+
+
+class ForwardModel:
+    """Applies the game rules to a SimState one tick at a time
+
+    Each tick, in order: end-game fire spawns, entities due this tick expire
+    (bombs explode), agents standing on pickups collect them, agents standing
+    in blasts are hurt and the agents' actions are applied in the order
+    given. Pickups spawn at random so are not modelled, but can be passed in
+    with ``spawns``: those on free tiles appear alongside the fire and those
+    dropped by destroyed blocks appear at the end of the tick.
+    """
+
+    def step(self, state, actions=(), spawns=()):
+        """Advances the state by one tick in place
+
+        ``actions`` is a sequence of (agent number, action packet) pairs,
+        with packets as sent to the server, e.g. ``{"type": "move",
+        "move": "up"}``.
+        """
+        state.tick += 1
+        tick = state.tick
+        self._spawn_fire(state, tick)
+        dropped = []
+        for entity in spawns:
+            coords = (entity["x"], entity["y"])
+            if coords in state.entities:
+                dropped.append(entity)
+            else:
+                state.entities[coords] = entity
+        self._expire_entities(state, tick)
+        for agent in state.agents.values():
+            self._collect_pickup(state, agent)
+        for agent in state.agents.values():
+            entity = state.entities.get(agent.coords)
+            if entity is not None and entity["type"] == Entity.BLAST:
+                self._damage_agents(state, agent.coords, tick)
+        for number, action in actions:
+            agent = state.agents.get(str(number))
+            if agent is not None:
+                self._apply_action(state, agent, action, tick)
+        for entity in dropped:
+            state.entities[(entity["x"], entity["y"])] = entity
+        return state
+
+    def get_actions(self, state, number):
+        """Returns the agent's useful actions as action tuples, None to wait"""
+        agent = state.agents[number]
+        actions = [None]
+        x, y = agent.coords
+        for move, (dx, dy) in MOVES.items():
+            if self._can_enter(state, (x + dx, y + dy)):
+                actions.append(("move", move))
+        here = state.entities.get(agent.coords)
+        if agent.ammo > 0 and (here is None or here["type"] == Entity.BLAST):
+            actions.append(("bomb",))
+        for coords, entity in state.entities.items():
+            if entity["type"] == Entity.BOMB and str(entity["owner"]) == number:
+                actions.append(("detonate", *coords))
+        return actions
+
+    def _collect_pickup(self, state, agent):
+        entity = state.entities.get(agent.coords)
+        if entity is None:
+            return
+        if entity["type"] == Entity.AMMO:
+            agent.ammo += 1
+        elif entity["type"] == Entity.POWERUP:
+            agent.blast_diameter += 2
+        else:
+            return
+        del state.entities[agent.coords]
+
+    def _expire_entities(self, state, tick):
+        expiring = [
+            coords
+            for coords, entity in state.entities.items()
+            if entity.get("expires") == tick
+        ]
+        for coords in expiring:
+            entity = state.entities.get(coords)
+            if entity is None or entity.get("expires") != tick:
+                continue
+            if entity["type"] == Entity.BOMB:
+                self._explode(state, coords, tick)
+            else:
+                del state.entities[coords]
+
+    def _apply_action(self, state, agent, action, tick):
+        action_type = action.get("type")
+        if action_type == "move":
+            delta = MOVES.get(action.get("move"))
+            if delta is None:
+                return
+            target = (agent.coords[0] + delta[0], agent.coords[1] + delta[1])
+            if self._can_enter(state, target):
+                agent.coords = target
+        elif action_type == "bomb":
+            blast = state.entities.get(agent.coords)
+            if agent.ammo > 0 and (blast is None or blast["type"] == Entity.BLAST):
+                x, y = agent.coords
+                state.entities[agent.coords] = {
+                    "x": x,
+                    "y": y,
+                    "type": Entity.BOMB,
+                    "owner": int(agent.number),
+                    "expires": tick + BOMB_LIFETIME,
+                    "hp": 1,
+                    "blast_diameter": agent.blast_diameter,
+                }
+                agent.ammo -= 1
+                if blast is not None:
+                    # Planting into a blast sets the bomb off, then the blast
+                    # that was there is spawned again
+                    self._explode(state, agent.coords, tick)
+                    blast = dict(blast)
+                    if "expires" in blast:
+                        blast["expires"] = tick + BLAST_LIFETIME
+                    state.entities[agent.coords] = blast
+        elif action_type == "detonate":
+            coords = tuple(action.get("coordinates", ()))
+            entity = state.entities.get(coords)
+            if (
+                entity is not None
+                and entity["type"] == Entity.BOMB
+                and str(entity["owner"]) == agent.number
+            ):
+                self._explode(state, coords, tick)
+
+    def _can_enter(self, state, coords):
+        if not state.in_bounds(coords):
+            return False
+        entity = state.entities.get(coords)
+        return entity is None or entity["type"] in PASSABLE
+
+    def _explode(self, state, coords, tick):
+        bomb = state.entities.pop(coords)
+        owner = bomb["owner"]
+        self._spawn_blast(state, coords, owner, tick)
+        radius = bomb["blast_diameter"] // 2
+        x, y = coords
+        for dx, dy in (0, 1), (0, -1), (-1, 0), (1, 0):
+            for r in range(1, radius + 1):
+                target = (x + dx * r, y + dy * r)
+                if not state.in_bounds(target):
+                    break
+                entity = state.entities.get(target)
+                if entity is None:
+                    self._spawn_blast(state, target, owner, tick)
+                    continue
+                entity_type = entity["type"]
+                if entity_type == Entity.BLAST:
+                    self._spawn_blast(state, target, owner, tick)
+                elif entity_type == Entity.BOMB:
+                    self._explode(state, target, tick)
+                    break
+                elif entity_type == Entity.METAL:
+                    break
+                else:
+                    hp = entity.get("hp", 1) - 1
+                    if hp <= 0:
+                        del state.entities[target]
+                    else:
+                        entity = dict(entity)
+                        entity["hp"] = hp
+                        state.entities[target] = entity
+                    break
+
+    def _spawn_blast(self, state, coords, owner, tick):
+        x, y = coords
+        blast = {"x": x, "y": y, "type": Entity.BLAST}
+        if owner is not None:
+            blast["owner"] = owner
+        existing = state.entities.get(coords)
+        if existing is None or "expires" in existing:
+            # Fire never expires, even once a blast has passed over it
+            blast["expires"] = tick + BLAST_LIFETIME
+        state.entities[coords] = blast
+        self._damage_agents(state, coords, tick)
+
+    def _damage_agents(self, state, coords, tick):
+        for agent in state.agents.values():
+            if agent.coords == coords and agent.invulnerability < tick:
+                agent.hp -= 1
+                agent.invulnerability = tick + INVULNERABILITY_TICKS
+
+    def _spawn_fire(self, state, tick):
+        coords = FIRE_SPAWN_MAP.get(tick)
+        if coords is None:
+            return
+        entity = state.entities.get(coords)
+        if entity is not None and entity["type"] == Entity.BOMB:
+            self._explode(state, coords, tick)
+        x, y = coords
+        state.entities[coords] = {"x": x, "y": y, "type": Entity.BLAST}
+        self._damage_agents(state, coords, tick)
+
+
+def apply_events(state, tick, events):
+    """Applies a tick of server events to the state, as the server reported them"""
+    state.tick = tick
+    for event in events:
+        event_type = event["type"]
+        if event_type == "agent":
+            agent = state.agents[str(event["agent_number"])]
+            action = event["data"]
+            if action["type"] == "move":
+                dx, dy = MOVES[action["move"]]
+                agent.coords = (agent.coords[0] + dx, agent.coords[1] + dy)
+        elif event_type == "agent_state":
+            agent = SimAgent.from_json(event["data"])
+            state.agents[agent.number] = agent
+        elif event_type == "entity_spawned":
+            entity = event["data"]
+            state.entities[(entity["x"], entity["y"])] = entity
+        elif event_type == "entity_state":
+            entity = event["updated_entity"]
+            state.entities[(entity["x"], entity["y"])] = entity
+        elif event_type == "entity_expired":
+            state.entities.pop(tuple(event["data"]), None)
+    return state
+
+
+def compare_states(expected, actual):
+    """Returns a list of differences between two states"""
+    differences = []
+    for number, agent in expected.agents.items():
+        other = actual.agents[number]
+        for field in SimAgent.__slots__:
+            if getattr(agent, field) != getattr(other, field):
+                differences.append(
+                    f"agent {number} {field}: "
+                    f"{getattr(agent, field)} != {getattr(other, field)}"
+                )
+    for coords in expected.entities.keys() | actual.entities.keys():
+        a = expected.entities.get(coords)
+        b = actual.entities.get(coords)
+        if a is None or b is None:
+            differences.append(f"entity {coords}: {a} != {b}")
+            continue
+        for field in ("type", "hp", "owner", "expires", "blast_diameter"):
+            if a.get(field) != b.get(field):
+                differences.append(f"entity {coords} {field}: {a} != {b}")
+                break
+    return differences
+
+
+def validate_replay(replay, model=None):
+    """Steps the forward model through a replay, returning its mismatches
+
+    Each tick starts from the state reported by the server, so a mismatch
+    does not carry over. Randomly spawned pickups are taken from the replay.
+    Returns a list of (tick, differences) pairs and the number of ticks.
+    """
+    model = model or ForwardModel()
+    payload = replay.get("payload", replay)
+    expected = SimState.from_json(payload["initial_state"])
+    mismatches = []
+    for entry in payload["history"]:
+        events = entry["events"]
+        actions = [
+            (event["agent_number"], event["data"])
+            for event in events
+            if event["type"] == "agent"
+        ]
+        spawns = [
+            event["data"]
+            for event in events
+            if event["type"] == "entity_spawned"
+            and event["data"]["type"] in PICKUPS
+        ]
+        actual = expected.copy()
+        while actual.tick < entry["tick"]:
+            last = actual.tick + 1 == entry["tick"]
+            model.step(actual, actions if last else (), spawns if last else ())
+        apply_events(expected, entry["tick"], events)
+        differences = compare_states(expected, actual)
+        if differences:
+            mismatches.append((entry["tick"], differences))
+    return mismatches, len(payload["history"])
@@ -0,0 +1,117 @@
+from .bitboard import Bitboard, BoardMasks
+from .bombs import BombLibrary
+from .components import ComponentIndex
+from .tunnels import TunnelIndex
+from .zobrist import tile_key
+from ..utilities import Entity, FIRE_SPAWN_MAP
+
+
+class BaseMap:
+    """The parts of the game map that do not depend on how tiles are stored
+
+    Backends set up their storage and ``block_library`` in ``_init_tiles``,
+    and keep it up to date through ``_block_tile``, ``_unblock_tile`` and
+    ``_set_tile_entity``. They also provide the tile queries: ``__contains__``,
+    ``__iter__``, ``__len__``, ``neighbours``, ``adjacency``, ``get_entity`` and
+    ``get_weight``.
+    """
+
+    IMPASSABLE_ENTITIES = [Entity.BOMB, Entity.METAL, Entity.ORE, Entity.WOOD]
+
+    def __init__(self, world, entities):
+        self._width = world["width"]
+        self._height = world["height"]
+        self._adjacency = None
+        self._init_tiles()
+        self.bitboard = Bitboard(self._width, self._height)
+        self.masks = BoardMasks(self.bitboard)
+        self.bomb_library = BombLibrary(self.bitboard)
+        self.blast_blockers = set()
+        self.tunnels = TunnelIndex(self)
+        self.components = ComponentIndex(self)
+        self.entities = {}
+        self.journal = None
+        self.zobrist = 0
+        for entity in entities:
+            self.add_entity(entity)
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    def index(self, coords):
+        return coords[1] * self._width + coords[0]
+
+    def coords(self, index):
+        return index % self._width, index // self._width
+
+    def in_bounds(self, coords):
+        x, y = coords
+        return 0 <= x < self._width and 0 <= y < self._height
+
+    def update_tick(self, tick):
+        self.bomb_library.update_tick(tick)
+        fire_coord = FIRE_SPAWN_MAP.get(tick + 2)
+        if fire_coord is not None and fire_coord in self:
+            x, y = fire_coord
+            self.add_entity({"x": x, "y": y, "type": Entity.BLAST})
+
+    def _record(self, coords):
+        if self.journal is not None:
+            self.journal.append((self.restore_tile, coords, self.entities.get(coords)))
+
+    def restore_tile(self, coords, entity):
+        """Returns the tile to holding the given entity, or to empty if None"""
+        if coords in self.entities:
+            self.remove_entity(coords)
+        if entity is not None:
+            self.add_entity(entity)
+
+    def add_entity(self, entity):
+        """Adds the given entity to the map"""
+        coords = (entity["x"], entity["y"])
+        entity_type = entity["type"]
+        self._record(coords)
+        if entity_type in self.IMPASSABLE_ENTITIES:
+            if entity_type == Entity.BOMB:
+                self.bomb_library.add_bomb(entity, self)
+            elif entity_type == Entity.ORE:
+                self.block_library[coords] = 3
+            elif entity_type == Entity.WOOD:
+                self.block_library[coords] = 1
+            self._block_tile(coords)
+            self._adjacency = None
+            self.tunnels.mark_changed(coords)
+            self.components.mark_changed(coords)
+        self._set_tile_entity(coords, entity_type)
+        if entity_type == Entity.BLAST:
+            self.blast_blockers.discard(coords)
+        else:
+            self.blast_blockers.add(coords)
+        self.masks.set_entity(coords, entity_type)
+        self.bomb_library.mark_changed(coords)
+        self.zobrist ^= tile_key(coords, self.entities.get(coords))
+        self.zobrist ^= tile_key(coords, entity)
+        self.entities[coords] = entity
+
+    def remove_entity(self, coords):
+        """Removes an entity from the map at the given coordinates"""
+        self._record(coords)
+        if coords not in self:
+            if self.bomb_library.get_bomb_at(coords) is not None:
+                self.bomb_library.remove_bomb(coords, self)
+            elif self.block_library.get(coords) is not None:
+                del self.block_library[coords]
+            self._unblock_tile(coords)
+            self._adjacency = None
+            self.tunnels.mark_changed(coords)
+            self.components.mark_changed(coords)
+        self._set_tile_entity(coords, None)
+        self.blast_blockers.discard(coords)
+        self.masks.set_entity(coords, None)
+        self.bomb_library.mark_changed(coords)
+        self.zobrist ^= tile_key(coords, self.entities.pop(coords, None))
@@ -0,0 +1,103 @@
+from ..utilities import Entity
+
+IMPASSABLE_ENTITIES = (Entity.BOMB, Entity.METAL, Entity.ORE, Entity.WOOD)
+
+
+class Bitboard:
+    """Bit-parallel operations on a small board stored as a Python int
+
+    Bit ``y * width + x`` represents the tile at (x, y).
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.full = (1 << (width * height)) - 1
+        left_column = 0
+        for y in range(height):
+            left_column |= 1 << (y * width)
+        self.not_left = self.full & ~left_column
+        self.not_right = self.full & ~(left_column << (width - 1))
+
+    def bit(self, coords):
+        x, y = coords
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return 1 << (y * self.width + x)
+        return 0
+
+    def from_coords(self, coords):
+        mask = 0
+        for c in coords:
+            mask |= self.bit(c)
+        return mask
+
+    def to_coords(self, mask):
+        while mask:
+            low = mask & -mask
+            index = low.bit_length() - 1
+            yield index % self.width, index // self.width
+            mask ^= low
+
+    @staticmethod
+    def count(mask):
+        return bin(mask).count("1")
+
+    def neighbours(self, mask):
+        """Returns the tiles orthogonally adjacent to any tile in the mask"""
+        return (
+            ((mask << 1) & self.not_left)
+            | ((mask >> 1) & self.not_right)
+            | ((mask << self.width) & self.full)
+            | (mask >> self.width)
+        )
+
+    def flood_fill(self, seed, passable):
+        """Returns every tile in passable reachable from the seed tiles"""
+        filled = seed & passable
+        while True:
+            grown = (filled | self.neighbours(filled)) & passable
+            if grown == filled:
+                return filled
+            filled = grown
+
+
+class BoardMasks:
+    """Per-entity bitboards for a map, kept in step with add/remove"""
+
+    def __init__(self, bitboard):
+        self.bitboard = bitboard
+        self.passable = bitboard.full
+        self.entities = {entity: 0 for entity in Entity}
+
+    def set_entity(self, coords, entity_type):
+        """Records the entity now occupying the tile, or None if empty"""
+        bit = self.bitboard.bit(coords)
+        for entity, mask in self.entities.items():
+            if mask & bit:
+                self.entities[entity] = mask & ~bit
+        if entity_type is not None:
+            self.entities[entity_type] |= bit
+        if entity_type in IMPASSABLE_ENTITIES:
+            self.passable &= ~bit
+        else:
+            self.passable |= bit
+
+    @property
+    def walls(self):
+        return self.entities[Entity.METAL]
+
+    @property
+    def blocks(self):
+        return self.entities[Entity.WOOD] | self.entities[Entity.ORE]
+
+    @property
+    def bombs(self):
+        return self.entities[Entity.BOMB]
+
+    @property
+    def blasts(self):
+        return self.entities[Entity.BLAST]
+
+    @property
+    def pickups(self):
+        return self.entities[Entity.AMMO] | self.entities[Entity.POWERUP]
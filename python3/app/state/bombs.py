@@ -1,4 +1,32 @@
-from ..utilities import Entity
+from .zobrist import bomb_key
+
+_RAY_TABLES = {}
+ANY_OWNER = object()
+
+
+def get_blast_rays(width, height, position, radius):
+    """Returns the tiles on each of a blast's four rays, ignoring obstacles
+
+    Each ray ends early with the first tile outside the map. Tables are built
+    once per map size and shared between all bombs.
+    """
+    table = _RAY_TABLES.get((width, height))
+    if table is None:
+        table = _RAY_TABLES[(width, height)] = {}
+    rays = table.get((position, radius))
+    if rays is None:
+        rays = []
+        x, y = position
+        for dx, dy in (1, 0), (0, 1), (-1, 0), (0, -1):
+            ray = []
+            for r in range(1, radius + 1):
+                new = (x + dx * r, y + dy * r)
+                ray.append(new)
+                if not (0 <= new[0] < width and 0 <= new[1] < height):
+                    break
+            rays.append(tuple(ray))
+        rays = table[(position, radius)] = tuple(rays)
+    return rays
 
 
 class Bomb:
@@ -15,22 +43,25 @@ class Bomb:
     def update_tick(self, tick):
         if self.detonates_at - (self.radius + 2) <= tick:
             self.owner = None
+        else:
+            self.owner = self.planted_by
 
     def calculate_impacts(self, map):
         impacts = []
-        for i, m in [(1, 1), (0, 1), (1, -1), (0, -1)]:
-            for r in range(1, self.radius + 1):
-                new = list(self.position)
-                new[i] += r * m
-                new = tuple(new)
-                impacts.append(tuple(new))
-                if new not in map.graph or not map.graph.nodes[new].get("entity") in (
-                    None,
-                    Entity.BLAST,
-                ):
+        blockers = map.blast_blockers
+        for ray in get_blast_rays(map.width, map.height, self.position, self.radius):
+            for coords in ray:
+                impacts.append(coords)
+                if coords in blockers:
                     break
         self.impacts = impacts
 
+    def in_blast_range(self, coords):
+        """Returns whether the coords lie on one of the bomb's rays, ignoring walls"""
+        dx = abs(coords[0] - self.position[0])
+        dy = abs(coords[1] - self.position[1])
+        return (dx == 0 or dy == 0) and dx + dy <= self.radius
+
     def __hash__(self):
         return hash(self.position)
 
@@ -38,15 +69,106 @@ class Bomb:
         return self.position == other.position
 
 
+class BombOutcome:
+    """What a bomb would set off if planted, without it being added"""
+
+    def __init__(self, bomb, detonated_by, detonates, reach, owners, detonation_tick):
+        self.bomb = bomb
+        self.detonated_by = detonated_by
+        self.detonates = detonates
+        self.reach = reach
+        self.owners = owners
+        self.detonation_tick = detonation_tick
+        self.reach_mask = 0
+
+    @property
+    def impacts(self):
+        return self.bomb.impacts
+
+
+def _find_chain_groups(bombs):
+    """Returns the strongly connected components of the detonation graph
+
+    Components are yielded in reverse topological order (Tarjan), so a group
+    only detonates groups that were returned before it.
+    """
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    groups = []
+    for root in bombs:
+        if root in index:
+            continue
+        work = [(root, iter(root.detonates))]
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            bomb, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(child.detonates)))
+                    break
+                elif child in on_stack:
+                    low[bomb] = min(low[bomb], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[bomb])
+                if low[bomb] == index[bomb]:
+                    group = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.remove(member)
+                        group.append(member)
+                        if member is bomb:
+                            break
+                    groups.append(group)
+    return groups
+
+
 class BombLibrary:
-    def __init__(self):
+    """Tracks live bombs, their blast impacts and chain reactions
+
+    In incremental mode update only recomputes bombs that were added or whose
+    rays cross a tile reported through mark_changed, and only refreshes the
+    impact index for tiles those bombs (and their chain reactions) touch.
+
+    Chain reactions are indexed by condensing the detonation graph into
+    strongly connected groups, so every tile knows which bombs can reach it
+    and their owners, and every bomb the tick its chain first explodes.
+    """
+
+    def __init__(self, bitboard=None, incremental=True):
+        self.incremental = incremental
+        self._bitboard = bitboard
+        self._impact_masks = {}
         self._bombs = {}
         self._coords = {}
+        self._owners = {}
+        self._impacted_by = {}
+        self._can_detonate = {}
+        self._detonation_tick = {}
+        self._new_bombs = set()
+        self._changed_coords = set()
+        self._orphaned = set()
+        self._stale_coords = set()
+        self.zobrist = 0
 
     def add_bomb(self, entity, map):
         bomb = Bomb(entity)
         bomb.calculate_impacts(map)
+        replaced = self._bombs.get(bomb.position)
+        if replaced is not None:
+            self.zobrist ^= bomb_key(replaced, replaced.owner)
+        self.zobrist ^= bomb_key(bomb, bomb.owner)
         self._bombs[bomb.position] = bomb
+        self._new_bombs.add(bomb)
 
     def remove_bomb(self, coords, map):
         bomb = self._bombs.get(coords)
@@ -55,49 +177,219 @@ class BombLibrary:
                 b.detonated_by.remove(bomb)
             for b in bomb.detonated_by:
                 b.detonates.remove(bomb)
+            if bomb in self._new_bombs:
+                self._new_bombs.remove(bomb)
+            else:
+                self._orphaned.update(bomb.detonates)
+                self._stale_coords.update(bomb.impacts)
+                self._unindex_impacts(bomb)
+            self._can_detonate.pop(bomb.position, None)
+            self._detonation_tick.pop(bomb.position, None)
+            self.zobrist ^= bomb_key(bomb, bomb.owner)
             del self._bombs[bomb.position]
 
-    def update(self, map):
-        self._coords = {}
+    def mark_changed(self, coords):
+        """Flags a tile whose contents changed since the last update"""
+        self._changed_coords.add(coords)
+
+    @property
+    def needs_update(self):
+        """Returns whether a bomb or tile has changed since the last update"""
+        return bool(
+            self._new_bombs
+            or self._changed_coords
+            or self._orphaned
+            or self._stale_coords
+        )
+
+    def _index_impacts(self, bomb):
+        for coords in bomb.impacts:
+            if coords in self._impacted_by:
+                self._impacted_by[coords].add(bomb)
+            else:
+                self._impacted_by[coords] = {bomb}
+
+    def _unindex_impacts(self, bomb):
+        for coords in bomb.impacts:
+            impacted_by = self._impacted_by.get(coords)
+            if impacted_by is not None:
+                impacted_by.discard(bomb)
+                if not impacted_by:
+                    del self._impacted_by[coords]
+
+    def _find_dirty_bombs(self):
+        dirty = set(self._new_bombs)
         for bomb in self._bombs.values():
+            if bomb not in dirty and any(
+                bomb.in_blast_range(coords) for coords in self._changed_coords
+            ):
+                dirty.add(bomb)
+        return dirty
+
+    def update(self, map):
+        if not self.incremental:
+            self._coords = {}
+            self._owners = {}
+            self._impact_masks = {}
+            self._impacted_by = {}
+            self._orphaned = set()
+            self._stale_coords = set()
+            self._new_bombs = set(self._bombs.values())
+            for bomb in self._bombs.values():
+                bomb.detonates = []
+                bomb.detonated_by = []
+        dirty = self._find_dirty_bombs()
+        old_targets = self._orphaned
+        stale_coords = self._stale_coords
+        for bomb in dirty:
+            for b in bomb.detonates:
+                b.detonated_by.remove(bomb)
+            old_targets.update(bomb.detonates)
+            bomb.detonates = []
+            if bomb not in self._new_bombs:
+                stale_coords.update(bomb.impacts)
+                self._unindex_impacts(bomb)
             bomb.calculate_impacts(map)
+            self._index_impacts(bomb)
+        for bomb in dirty:
             for coords in bomb.impacts:
                 detonatee = self._bombs.get(coords)
                 if detonatee is not None:
                     bomb.detonates.append(detonatee)
                     detonatee.detonated_by.append(bomb)
-        for bomb in self._bombs.values():
-            can_detonate = {
-                bomb,
-            }
-            to_visit = bomb.detonated_by[:]
-            while to_visit:
-                current = to_visit.pop()
-                can_detonate.add(current)
-                to_visit.extend(
-                    [b for b in current.detonated_by if b not in can_detonate]
-                )
-            for coords in bomb.impacts:
-                if coords in self._coords:
-                    self._coords[coords].update(can_detonate)
-                else:
-                    self._coords[coords] = set(can_detonate)
+        for bomb in self._new_bombs:
+            for detonator in self._impacted_by.get(bomb.position, ()):
+                if detonator not in dirty:
+                    detonator.detonates.append(bomb)
+                    bomb.detonated_by.append(detonator)
+
+        affected = set()
+        to_visit = [b for b in old_targets if self._bombs.get(b.position) is b]
+        to_visit.extend(dirty)
+        while to_visit:
+            current = to_visit.pop()
+            if current not in affected:
+                affected.add(current)
+                to_visit.extend(current.detonates)
+        if affected:
+            self._index_chains()
+        for bomb in affected:
+            stale_coords.update(bomb.impacts)
+        for coords in stale_coords:
+            self._index_coords(coords)
+        if stale_coords:
+            self._impact_masks = {}
+
+        self._new_bombs = set()
+        self._changed_coords = set()
+        self._orphaned = set()
+        self._stale_coords = set()
+
+    def _index_chains(self):
+        group_of = {}
+        detonators = {}
+        for group in reversed(_find_chain_groups(self._bombs.values())):
+            can_detonate = set(group)
+            for bomb in group:
+                group_of[bomb] = id(group)
+            for bomb in group:
+                for detonator in bomb.detonated_by:
+                    if group_of[detonator] != id(group):
+                        can_detonate.update(detonators[group_of[detonator]])
+            can_detonate = frozenset(can_detonate)
+            detonators[id(group)] = can_detonate
+            detonates_at = min(b.detonates_at for b in can_detonate)
+            for bomb in group:
+                self._can_detonate[bomb.position] = can_detonate
+                self._detonation_tick[bomb.position] = detonates_at
+
+    def _index_coords(self, coords):
+        can_detonate = set()
+        for bomb in self._impacted_by.get(coords, ()):
+            can_detonate.update(self._can_detonate[bomb.position])
+        if can_detonate:
+            self._coords[coords] = frozenset(can_detonate)
+            self._owners[coords] = frozenset(bomb.owner for bomb in can_detonate)
+        else:
+            self._coords.pop(coords, None)
+            self._owners.pop(coords, None)
 
     def update_tick(self, tick):
+        owners_changed = False
         for bomb in self._bombs.values():
+            owner = bomb.owner
             bomb.update_tick(tick)
+            if owner != bomb.owner:
+                owners_changed = True
+                self.zobrist ^= bomb_key(bomb, owner) ^ bomb_key(bomb, bomb.owner)
+        if owners_changed:
+            self._impact_masks = {}
+            for coords, can_detonate in self._coords.items():
+                self._owners[coords] = frozenset(bomb.owner for bomb in can_detonate)
 
     def get_bomb_at(self, coords):
         return self._bombs.get(coords)
 
+    def get_bombs(self):
+        return list(self._bombs.values())
+
     def get_bombs_impacting(self, coords):
-        return self._coords.get(coords, set())
+        return self._coords.get(coords, frozenset())
 
     def get_bomb_impact_owners(self, coords):
-        owners = set()
-        for bomb in self.get_bombs_impacting(coords):
-            owners.add(bomb.owner)
-        return owners
+        return self._owners.get(coords, frozenset())
+
+    def get_impact_mask(self, owner=ANY_OWNER):
+        """Returns a bitboard of the tiles a blast from the owner can reach"""
+        mask = self._impact_masks.get(owner)
+        if mask is None:
+            mask = 0
+            for coords, owners in self._owners.items():
+                if owner is ANY_OWNER or owner in owners:
+                    mask |= self._bitboard.bit(coords)
+            self._impact_masks[owner] = mask
+        return mask
+
+    def get_detonation_tick(self, bomb):
+        """Returns the tick the bomb explodes, accounting for chain reactions"""
+        return self._detonation_tick.get(bomb.position, bomb.detonates_at)
+
+    def evaluate_bombs(self, entities, map):
+        """Returns a BombOutcome for each hypothetical bomb entity
+
+        Each candidate is evaluated on its own against the bombs already in
+        the library, which must be up to date. Nothing in the library is
+        changed. Candidates are expected on tiles without a bomb.
+        """
+        outcomes = []
+        for entity in entities:
+            bomb = Bomb(entity)
+            bomb.calculate_impacts(map)
+            detonated_by = set(self._impacted_by.get(bomb.position, ()))
+            can_detonate = {bomb}
+            for detonator in detonated_by:
+                can_detonate.update(self._can_detonate[detonator.position])
+            detonates = set()
+            reach = set(bomb.impacts)
+            to_visit = [self._bombs[c] for c in bomb.impacts if c in self._bombs]
+            while to_visit:
+                current = to_visit.pop()
+                if current not in detonates:
+                    detonates.add(current)
+                    reach.update(current.impacts)
+                    to_visit.extend(current.detonates)
+            outcome = BombOutcome(
+                bomb,
+                detonated_by,
+                detonates,
+                reach,
+                {b.owner for b in can_detonate},
+                min(b.detonates_at for b in can_detonate),
+            )
+            if self._bitboard is not None:
+                outcome.reach_mask = self._bitboard.from_coords(reach)
+            outcomes.append(outcome)
+        return outcomes
 
     def get_bombs_owned_by(self, owner):
         bombs = []
@@ -0,0 +1,103 @@
+class ComponentIndex:
+    """Connected component labels for the passable tiles of a map
+
+    Changes are recorded with mark_changed and applied on the next read.
+    Tiles that became passable merge the components around them into the
+    largest one, and components that lost a tile are flood filled again on the
+    map's bitboard to detect whether they split.
+    """
+
+    def __init__(self, map):
+        self._map = map
+        self._labels = {}
+        self._members = {}
+        self._next_label = 0
+        self._changed = set()
+        self._stale = True
+
+    def mark_changed(self, coords):
+        """Records that the passability of the tile changed"""
+        if not self._stale:
+            self._changed.add(coords)
+
+    def _new_label(self, members):
+        label = self._next_label
+        self._next_label += 1
+        self._members[label] = members
+        for coords in members:
+            self._labels[coords] = label
+        return label
+
+    def _label_components(self, mask):
+        """Labels each connected group of tiles in the bitboard mask"""
+        bitboard = self._map.bitboard
+        while mask:
+            members = bitboard.flood_fill(mask & -mask, mask)
+            mask &= ~members
+            self._new_label(set(bitboard.to_coords(members)))
+
+    def _split(self, label):
+        members = self._members.pop(label)
+        self._label_components(self._map.bitboard.from_coords(members))
+
+    def _merge(self, coords):
+        labels = {self._labels[n] for n in self._map.neighbours(coords)} - {None}
+        if not labels:
+            self._new_label({coords})
+            return
+        largest = max(labels, key=lambda label: len(self._members[label]))
+        members = self._members[largest]
+        for label in labels - {largest}:
+            for member in self._members.pop(label):
+                self._labels[member] = largest
+                members.add(member)
+        members.add(coords)
+        self._labels[coords] = largest
+
+    def _refresh(self):
+        if self._stale:
+            self._labels = {}
+            self._members = {}
+            self._label_components(self._map.masks.passable)
+            self._stale = False
+            self._changed = set()
+            return
+        if not self._changed:
+            return
+        split = set()
+        inserted = []
+        for coords in self._changed:
+            label = self._labels.get(coords)
+            if coords in self._map:
+                if label is None:
+                    inserted.append(coords)
+            elif label is not None:
+                del self._labels[coords]
+                self._members[label].discard(coords)
+                split.add(label)
+        for label in split:
+            self._split(label)
+        for coords in inserted:
+            self._labels[coords] = None
+        for coords in inserted:
+            self._merge(coords)
+        self._changed = set()
+
+    def component_of(self, coords):
+        """Returns the label of the tile's component, or None if impassable"""
+        self._refresh()
+        return self._labels.get(coords)
+
+    def size_of(self, coords):
+        """Returns the number of tiles connected to the tile, including itself"""
+        label = self.component_of(coords)
+        return len(self._members[label]) if label is not None else 0
+
+    def same_component(self, a, b):
+        label = self.component_of(a)
+        return label is not None and label == self.component_of(b)
+
+    def members(self, coords):
+        """Returns the set of tiles connected to the tile, which must not be modified"""
+        label = self.component_of(coords)
+        return self._members[label] if label is not None else set()
@@ -1,10 +1,16 @@
 from .map import Map
 from .player import Player
+from .zobrist import player_key, tick_key, us_key
 
 
 class GameState:
     """An interface class between Agent/Server and the Players/Map"""
 
+    def __init__(self, map_class=None):
+        self._map_class = map_class
+        self._journal = None
+        self._checkpoints = []
+
     def set_state(self, state):
         """Sets the games state from JSON"""
         self.tick = state["tick"]
@@ -13,11 +19,80 @@ class GameState:
         self.us = Player(state["agent_state"][us_agent])
         self.them = Player(state["agent_state"][them_agent])
         self.agents = {us_agent: self.us, them_agent: self.them}
-        self.map = Map(state["world"], state["entities"])
+        map_class = self._map_class or Map
+        self.map = map_class(state["world"], state["entities"])
         self.desynced = False
+        self._journal = None
+        self._checkpoints = []
+
+    @property
+    def zobrist(self):
+        """Returns a hash of everything the agent's decisions depend on
+
+        Tiles and bombs are hashed incrementally by the map and bomb library.
+        The two players, which of them is us and the game phase are folded in
+        on each call.
+        """
+        return (
+            self.map.zobrist
+            ^ self.map.bomb_library.zobrist
+            ^ player_key(self.us)
+            ^ player_key(self.them)
+            ^ us_key(self.us)
+            ^ tick_key(self.tick)
+        )
+
+    def checkpoint(self):
+        """Marks a point the state can be returned to with rollback
+
+        Checkpoints nest. While any is open every change to the tick, the
+        players and the map tiles is journalled so it can be undone.
+        """
+        if self._journal is None:
+            self._journal = []
+            self.map.journal = self._journal
+        self._checkpoints.append(len(self._journal))
+
+    def rollback(self):
+        """Undoes every change since the latest checkpoint and discards it"""
+        mark = self._checkpoints.pop()
+        self.map.journal = None
+        while len(self._journal) > mark:
+            undo, *args = self._journal.pop()
+            undo(*args)
+        self._close_checkpoint()
+        self.map.bomb_library.update_tick(self.tick)
+        self.map.bomb_library.update(self.map)
+
+    def commit(self):
+        """Keeps the changes since the latest checkpoint and discards it"""
+        self._checkpoints.pop()
+        self._close_checkpoint()
+
+    def _close_checkpoint(self):
+        if self._checkpoints:
+            self.map.journal = self._journal
+        else:
+            self._journal = None
+            self.map.journal = None
+
+    def _record_player(self, player):
+        if self._journal is not None:
+            self._journal.append((self._restore_player, player, dict(vars(player))))
+
+    @staticmethod
+    def _restore_player(player, attributes):
+        vars(player).clear()
+        vars(player).update(attributes)
+
+    def _restore_tick(self, tick, desynced):
+        self.tick = tick
+        self.desynced = desynced
 
     def update_tick(self, tick):
         """Updates the games current tick"""
+        if self._journal is not None:
+            self._journal.append((self._restore_tick, self.tick, self.desynced))
         if self.tick == tick - 1:
             self.desynced = False
         else:
@@ -27,24 +102,42 @@ class GameState:
             )
             self.desynced = True
         self.tick = tick
+        self._record_player(self.us)
+        self._record_player(self.them)
         self.us.update_tick(tick)
         self.them.update_tick(tick)
         self.map.update_tick(tick)
 
     def receive_events(self, events):
-        entities_changed = False
+        self._apply_events(events)
+        if self.map.bomb_library.needs_update:
+            self.map.bomb_library.update(self.map)
+
+    def receive_ticks(self, ticks):
+        """Applies the events of several tick payloads in order
+
+        Bomb impacts are only recalculated once, after the last tick.
+        """
+        for tick in ticks:
+            self.update_tick(tick["tick"])
+            self._apply_events(tick["events"])
+        if self.map.bomb_library.needs_update:
+            self.map.bomb_library.update(self.map)
+
+    def _apply_events(self, events):
+        """Applies a tick's events"""
         for event in events:
             event_type = event["type"]
             if event_type == "agent":
-                self.agents[str(event["agent_number"])].handle_action(event["data"])
+                player = self.agents[str(event["agent_number"])]
+                self._record_player(player)
+                player.handle_action(event["data"])
             elif event_type == "agent_state":
                 data = event["data"]
-                self.agents[str(data["number"])].update_state(data, self.tick)
+                player = self.agents[str(data["number"])]
+                self._record_player(player)
+                player.update_state(data, self.tick)
             elif event_type == "entity_spawned":
-                entities_changed = True
                 self.map.add_entity(event["data"])
             elif event_type == "entity_expired":
-                entities_changed = True
                 self.map.remove_entity(tuple(event["data"]))
-        if entities_changed:
-            self.map.bomb_library.update(self.map)
@@ -0,0 +1,136 @@
+from array import array
+from collections.abc import MutableMapping
+
+import networkx as nx
+
+from .base_map import BaseMap
+from ..utilities import Entity, WEIGHT_MAP
+
+ENTITY_CODES = {entity: code for code, entity in enumerate(Entity, 1)}
+ENTITY_TYPES = (None,) + tuple(Entity)
+
+
+class _BlockLibrary(MutableMapping):
+    """Dict-like view of block hp stored in a flat grid"""
+
+    def __init__(self, grid_map):
+        self._map = grid_map
+        self._hp = array("b", bytes(grid_map.width * grid_map.height))
+
+    def __getitem__(self, coords):
+        hp = self._hp[self._map.index(coords)] if self._map.in_bounds(coords) else 0
+        if not hp:
+            raise KeyError(coords)
+        return hp
+
+    def __setitem__(self, coords, hp):
+        self._hp[self._map.index(coords)] = hp
+
+    def __delitem__(self, coords):
+        if coords not in self:
+            raise KeyError(coords)
+        self._hp[self._map.index(coords)] = 0
+
+    def __iter__(self):
+        for index, hp in enumerate(self._hp):
+            if hp:
+                yield self._map.coords(index)
+
+    def __len__(self):
+        return sum(1 for hp in self._hp if hp)
+
+
+class GridMap(BaseMap):
+    """Flat array representation of the game map
+
+    Tiles are stored in arrays indexed by ``y * width + x``. Exposes the same
+    interface as Map so either can back the GameState.
+    """
+
+    def _init_tiles(self):
+        size = self._width * self._height
+        self._passable = bytearray(b"\x01" * size)
+        self._entity = bytearray(size)
+        self._weight = array("l", [WEIGHT_MAP["Default"]] * size)
+        self._neighbours = [self._generate_neighbours(i) for i in range(size)]
+        self._graph = None
+        self.block_library = _BlockLibrary(self)
+
+    @property
+    def graph(self):
+        """Networkx view of the passable tiles, rebuilt only after changes"""
+        if self._graph is None:
+            graph = nx.Graph()
+            for index in range(len(self._passable)):
+                if self._passable[index]:
+                    graph.add_node(self.coords(index), weight=self._weight[index])
+                    entity = ENTITY_TYPES[self._entity[index]]
+                    if entity is not None:
+                        graph.nodes[self.coords(index)]["entity"] = entity
+            for index in range(len(self._passable)):
+                if self._passable[index]:
+                    graph.add_edges_from(
+                        (self.coords(index), self.coords(n))
+                        for n in self._neighbours[index]
+                        if self._passable[n]
+                    )
+            self._graph = graph
+        return self._graph
+
+    def _generate_neighbours(self, index):
+        x, y = self.coords(index)
+        return tuple(
+            self.index(to)
+            for to in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))
+            if self.in_bounds(to)
+        )
+
+    def __contains__(self, coords):
+        return self.in_bounds(coords) and bool(self._passable[self.index(coords)])
+
+    def __iter__(self):
+        for index, passable in enumerate(self._passable):
+            if passable:
+                yield self.coords(index)
+
+    def __len__(self):
+        return sum(self._passable)
+
+    def neighbours(self, coords):
+        """Returns the passable tiles adjacent to the given coordinates"""
+        return [
+            self.coords(n)
+            for n in self._neighbours[self.index(coords)]
+            if self._passable[n]
+        ]
+
+    def adjacency(self):
+        """Returns the passable neighbours of every tile, by tile index"""
+        if self._adjacency is None:
+            self._adjacency = [
+                tuple(n for n in neighbours if self._passable[n])
+                if self._passable[index]
+                else ()
+                for index, neighbours in enumerate(self._neighbours)
+            ]
+        return self._adjacency
+
+    def get_entity(self, coords):
+        """Returns the entity type on a passable tile, or None"""
+        return ENTITY_TYPES[self._entity[self.index(coords)]]
+
+    def get_weight(self, coords):
+        """Returns the base weight of a passable tile"""
+        return self._weight[self.index(coords)]
+
+    def _block_tile(self, coords):
+        self._passable[self.index(coords)] = 0
+
+    def _unblock_tile(self, coords):
+        self._passable[self.index(coords)] = 1
+
+    def _set_tile_entity(self, coords, entity_type):
+        index = self.index(coords)
+        self._entity[index] = ENTITY_CODES.get(entity_type, 0)
+        self._weight[index] = WEIGHT_MAP.get(entity_type, WEIGHT_MAP["Default"])
+        self._graph = None
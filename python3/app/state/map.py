@@ -1,24 +1,47 @@
 import networkx as nx
 
-from .bombs import BombLibrary
-from ..utilities import Entity, FIRE_SPAWN_MAP, WEIGHT_MAP
+from .base_map import BaseMap
+from ..utilities import WEIGHT_MAP
 
 
-class Map:
+class Map(BaseMap):
     """Graph representation of the game map"""
 
-    IMPASSABLE_ENTITIES = [Entity.BOMB, Entity.METAL, Entity.ORE, Entity.WOOD]
-
-    def __init__(self, world, entities):
-        self._width = world["width"]
-        self._height = world["height"]
+    def _init_tiles(self):
         self.graph = nx.grid_2d_graph(self._width, self._height)
-        self.bomb_library = BombLibrary()
         self.block_library = {}
         for node in self.graph.nodes:
             self.graph.nodes[node]["weight"] = WEIGHT_MAP["Default"]
-        for entity in entities:
-            self.add_entity(entity)
+
+    def __contains__(self, coords):
+        return coords in self.graph
+
+    def __iter__(self):
+        return iter(self.graph.nodes)
+
+    def __len__(self):
+        return len(self.graph)
+
+    def neighbours(self, coords):
+        """Returns the passable tiles adjacent to the given coordinates"""
+        return list(self.graph[coords])
+
+    def adjacency(self):
+        """Returns the passable neighbours of every tile, by tile index"""
+        if self._adjacency is None:
+            adjacency = [()] * (self._width * self._height)
+            for node, neighbours in self.graph.adjacency():
+                adjacency[self.index(node)] = tuple(self.index(n) for n in neighbours)
+            self._adjacency = adjacency
+        return self._adjacency
+
+    def get_entity(self, coords):
+        """Returns the entity type on a passable tile, or None"""
+        return self.graph.nodes[coords].get("entity")
+
+    def get_weight(self, coords):
+        """Returns the base weight of a passable tile"""
+        return self.graph.nodes[coords]["weight"]
 
     def _generate_edges(self, coords):
         x, y = coords
@@ -26,38 +49,67 @@ class Map:
             if to in self.graph:
                 yield coords, to
 
-    def update_tick(self, tick):
-        self.bomb_library.update_tick(tick)
-        fire_coord = FIRE_SPAWN_MAP.get(tick + 2)
-        if fire_coord in self.graph:
-            self.graph.nodes[fire_coord]["entity"] = Entity.BLAST
-            self.graph.nodes[fire_coord]["weight"] = WEIGHT_MAP[Entity.BLAST]
+    def _block_tile(self, coords):
+        self.graph.remove_node(coords)
 
-    def add_entity(self, entity):
-        """Adds the given entity to the map"""
-        coords = (entity["x"], entity["y"])
-        entity_type = entity["type"]
-        if entity_type in Map.IMPASSABLE_ENTITIES:
-            if entity_type == Entity.BOMB:
-                self.bomb_library.add_bomb(entity, self)
-            elif entity_type == Entity.ORE:
-                self.block_library[coords] = 3
-            elif entity_type == Entity.WOOD:
-                self.block_library[coords] = 1
-            self.graph.remove_node(coords)
-        else:
-            self.graph.nodes[coords]["entity"] = entity_type
-            self.graph.nodes[coords]["weight"] = WEIGHT_MAP[entity_type]
-
-    def remove_entity(self, coords):
-        """Removes an entity from the map at the given coordinates"""
+    def _unblock_tile(self, coords):
+        self.graph.add_node(coords, weight=WEIGHT_MAP["Default"])
+        self.graph.add_edges_from(self._generate_edges(coords))
+
+    def _set_tile_entity(self, coords, entity_type):
         if coords in self.graph:
-            self.graph.nodes[coords]["weight"] = WEIGHT_MAP["Default"]
-            del self.graph.nodes[coords]["entity"]
-        else:
-            if self.bomb_library.get_bomb_at(coords) is not None:
-                self.bomb_library.remove_bomb(coords, self)
-            elif self.block_library.get(coords) is not None:
-                del self.block_library[coords]
-            self.graph.add_node(coords, weight=WEIGHT_MAP["Default"])
-            self.graph.add_edges_from(self._generate_edges(coords))
+            node = self.graph.nodes[coords]
+            if entity_type is None:
+                node.pop("entity", None)
+                node["weight"] = WEIGHT_MAP["Default"]
+            else:
+                node["entity"] = entity_type
+                node["weight"] = WEIGHT_MAP[entity_type]
+
+    def _record_order(self, coords):
+        """Journals where a tile is in the graph's order before it is removed
+
+        Re-adding a node puts it last in the graph, and in the adjacency of
+        its neighbours, which would change the order tiles are searched in.
+        """
+        if self.journal is not None and coords in self.graph:
+            positions = {
+                n: list(self.graph[n]).index(coords) for n in self.graph[coords]
+            }
+            self.journal.append(
+                (
+                    self._restore_order,
+                    coords,
+                    list(self.graph).index(coords),
+                    list(self.graph[coords]),
+                    positions,
+                )
+            )
+
+    def _restore_order(self, coords, position, neighbours, positions):
+        """Moves a re-added tile back to where it was in the graph's order"""
+        graph = self.graph
+        _move_key(graph._node, coords, position)
+        _move_key(graph._adj, coords, position)
+        adjacent = graph._adj[coords]
+        ordered = [(n, adjacent[n]) for n in neighbours]
+        adjacent.clear()
+        adjacent.update(ordered)
+        for neighbour, neighbour_position in positions.items():
+            _move_key(graph._adj[neighbour], coords, neighbour_position)
+        self._adjacency = None
+
+    def add_entity(self, entity):
+        if entity["type"] in self.IMPASSABLE_ENTITIES:
+            # Undone after the tile is restored, as the journal runs backwards
+            self._record_order((entity["x"], entity["y"]))
+        super().add_entity(entity)
+
+
+def _move_key(mapping, key, position):
+    """Moves the key to the given position in the dict's order, in place"""
+    items = list(mapping.items())
+    index = next(i for i, (k, _) in enumerate(items) if k == key)
+    items.insert(position, items.pop(index))
+    mapping.clear()
+    mapping.update(items)
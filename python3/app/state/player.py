@@ -14,6 +14,7 @@ class Player:
         self.blast_diameter = state["blast_diameter"]
         self.blast_radius = self.blast_diameter // 2
         self.invulnerable_until = state["invulnerability"]
+        self.is_invulnerable = tick < self.invulnerable_until
 
     def update_tick(self, tick):
         self.is_invulnerable = tick < self.invulnerable_until
@@ -0,0 +1,126 @@
+from collections.abc import Mapping
+
+
+class Tunnel:
+    """A dead-end corridor and the junction leading out of it"""
+
+    def __init__(self, cells, exit):
+        self.cells = cells
+        self.exit = exit
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __repr__(self):
+        return f"Tunnel({self.cells}, exit={self.exit})"
+
+
+class TunnelIndex(Mapping):
+    """Maps every tile in a dead-end corridor to the corridor's exit
+
+    A corridor starts at a tile with a single passable neighbour and follows
+    tiles with at most two until it reaches a junction, which is the exit.
+    Corridors closed at both ends have an exit of None. Changes are recorded
+    with mark_changed and only the corridors around them are walked again
+    the next time the index is read.
+    """
+
+    def __init__(self, map):
+        self._map = map
+        self._tunnels = {}
+        self._by_exit = {}
+        self._changed = set()
+        self._stale = True
+
+    def mark_changed(self, coords):
+        """Records that the passability of the tile changed"""
+        if not self._stale:
+            self._changed.add(coords)
+
+    def _walk(self, start):
+        cells = [start]
+        visited = {start}
+        to_visit = self._map.neighbours(start)
+        exit = None
+        while to_visit:
+            current = to_visit.pop()
+            neighbours = self._map.neighbours(current)
+            if len(neighbours) > 2:
+                exit = current
+                break
+            visited.add(current)
+            cells.append(current)
+            to_visit.extend(n for n in neighbours if n not in visited)
+        return Tunnel(tuple(cells), exit)
+
+    def _add_tunnel(self, start):
+        tunnel = self._walk(start)
+        for cell in tunnel.cells:
+            self._tunnels[cell] = tunnel
+        self._by_exit.setdefault(tunnel.exit, set()).add(tunnel)
+
+    def _remove_tunnel(self, tunnel):
+        for cell in tunnel.cells:
+            del self._tunnels[cell]
+        tunnels = self._by_exit[tunnel.exit]
+        tunnels.discard(tunnel)
+        if not tunnels:
+            del self._by_exit[tunnel.exit]
+
+    def _try_add_tunnel(self, coords):
+        if (
+            coords not in self._tunnels
+            and coords in self._map
+            and len(self._map.neighbours(coords)) == 1
+        ):
+            self._add_tunnel(coords)
+
+    def _refresh(self):
+        if self._stale:
+            self._tunnels = {}
+            self._by_exit = {}
+            for node in self._map:
+                self._try_add_tunnel(node)
+            self._stale = False
+            self._changed = set()
+            return
+        if not self._changed:
+            return
+        starts = set()
+        for x, y in self._changed:
+            for cell in (x, y), (x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1):
+                if not self._map.in_bounds(cell):
+                    continue
+                starts.add(cell)
+                affected = list(self._by_exit.get(cell, ()))
+                tunnel = self._tunnels.get(cell)
+                if tunnel is not None:
+                    affected.append(tunnel)
+                for tunnel in affected:
+                    if self._tunnels.get(tunnel.cells[0]) is tunnel:
+                        self._remove_tunnel(tunnel)
+                        starts.update(tunnel.cells)
+        self._changed = set()
+        for cell in starts:
+            self._try_add_tunnel(cell)
+
+    def __getitem__(self, coords):
+        self._refresh()
+        return self._tunnels[coords].exit
+
+    def __iter__(self):
+        self._refresh()
+        return iter(self._tunnels)
+
+    def __len__(self):
+        self._refresh()
+        return len(self._tunnels)
+
+    def __contains__(self, coords):
+        self._refresh()
+        return coords in self._tunnels
+
+    def get_tunnel(self, coords):
+        """Returns the corridor containing the tile, or None"""
+        self._refresh()
+        return self._tunnels.get(coords)
@@ -0,0 +1,58 @@
+import random
+
+ENDGAME_TICK = 1800
+
+
+class ZobristKeys:
+    """Random 64 bit keys for hashable features of the game state
+
+    A state's hash is the XOR of the keys of its features, so adding or
+    removing a feature is a single XOR. Keys are drawn on first use from a
+    seeded generator.
+    """
+
+    def __init__(self, seed=0):
+        self._random = random.Random(seed)
+        self._keys = {}
+
+    def __call__(self, *feature):
+        key = self._keys.get(feature)
+        if key is None:
+            key = self._keys[feature] = self._random.getrandbits(64)
+        return key
+
+
+ZOBRIST = ZobristKeys()
+
+
+def tile_key(coords, entity):
+    """Returns the key for the entity on the tile, 0 for an empty tile"""
+    if entity is None:
+        return 0
+    return ZOBRIST("tile", coords, entity["type"])
+
+
+def bomb_key(bomb, owner):
+    return ZOBRIST("bomb", bomb.position, bomb.radius, owner)
+
+
+def player_key(player):
+    return ZOBRIST(
+        "player",
+        player.id,
+        player.coords,
+        player.hp,
+        player.ammo,
+        player.blast_diameter,
+        player.is_invulnerable,
+    )
+
+
+def us_key(player):
+    """Returns the key for which of the players the agent is"""
+    return ZOBRIST("us", player.id)
+
+
+def tick_key(tick):
+    """Returns the key for the phase of the game, before or after the endgame"""
+    return ZOBRIST("endgame", tick >= ENDGAME_TICK)
@@ -0,0 +1,84 @@
+class TrapAnalysis:
+    """Articulation points of a map's passable tiles
+
+    A depth first search numbers every passable tile in preorder and
+    records the lowest preorder number reachable from its subtree. The
+    tiles cut off by removing one tile are then whole subtrees of the
+    search, so they can be listed without copying or searching the graph.
+    """
+
+    def __init__(self, map):
+        self._map = map
+        adjacency = map.adjacency()
+        size = len(adjacency)
+        self._disc = [None] * size
+        self._low = [0] * size
+        self._size = [0] * size
+        self._root = [-1] * size
+        self._children = [[] for _ in range(size)]
+        self._order = []
+        for node in map:
+            source = map.index(node)
+            if self._disc[source] is None:
+                self._search(adjacency, source)
+
+    def _search(self, adjacency, source):
+        disc, low, order = self._disc, self._low, self._order
+        disc[source] = low[source] = len(order)
+        order.append(source)
+        self._root[source] = source
+        stack = [(source, -1, iter(adjacency[source]))]
+        while stack:
+            v, parent, neighbours = stack[-1]
+            for u in neighbours:
+                if disc[u] is None:
+                    disc[u] = low[u] = len(order)
+                    order.append(u)
+                    self._root[u] = source
+                    self._children[v].append(u)
+                    stack.append((u, v, iter(adjacency[u])))
+                    break
+                elif u != parent and disc[u] < low[v]:
+                    low[v] = disc[u]
+            else:
+                stack.pop()
+                self._size[v] = len(order) - disc[v]
+                if parent != -1 and low[v] < low[parent]:
+                    low[parent] = low[v]
+
+    def _separated(self, cut):
+        """Returns the search children of the cut whose subtrees it cuts off"""
+        if self._root[cut] == cut:
+            return self._children[cut]
+        return [c for c in self._children[cut] if self._low[c] >= self._disc[cut]]
+
+    def _subtree(self, index):
+        start = self._disc[index]
+        return self._order[start : start + self._size[index]]
+
+    def component_without(self, cut, coords):
+        """Returns the tiles connected to the coords once the cut tile is removed
+
+        The coords must be passable and must not be the cut tile itself.
+        """
+        index = self._map.index(coords)
+        if cut not in self._map or (
+            self._root[self._map.index(cut)] != self._root[index]
+        ):
+            indices = self._subtree(self._root[index])
+        else:
+            cut = self._map.index(cut)
+            separated = self._separated(cut)
+            for child in separated:
+                start = self._disc[child]
+                if start <= self._disc[index] < start + self._size[child]:
+                    indices = self._subtree(child)
+                    break
+            else:
+                excluded = {cut}
+                for child in separated:
+                    excluded.update(self._subtree(child))
+                indices = [
+                    i for i in self._subtree(self._root[index]) if i not in excluded
+                ]
+        return [self._map.coords(i) for i in indices]
@@ -1,4 +1,5 @@
 import math
+from collections import OrderedDict
 from enum import Enum
 import heapq
 
@@ -43,6 +44,55 @@ class PriorityQueue:
         return val
 
 
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry, counting hits"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Returns the cached value and marks it as recently used"""
+        value = self._entries.get(key, default)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def clear(self):
+        self._entries.clear()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self):
+        return "{} hits / {} lookups ({:.1f}%)".format(
+            self.hits, self.hits + self.misses, 100 * self.hit_rate
+        )
+
+
 WEIGHT_MAP = {
     Entity.AMMO: 90,
     Entity.POWERUP: 5,
@@ -0,0 +1,65 @@
+import json
+from unittest import TestCase
+
+from app.bot.agent import Agent
+from app.replay_runner import ReplayConnection
+from app.state.game_state import GameState
+
+
+class FakeBudget:
+    def __init__(self, remaining):
+        self.seconds = remaining
+
+    def remaining(self):
+        return self.seconds
+
+
+class TestStageBudget(TestCase):
+    def setUp(self):
+        self.agent = Agent(server=ReplayConnection())
+
+    def test_affordability_fixed_per_decision(self):
+        budget = FakeBudget(1)
+        self.agent._set_budget(budget)
+        self.assertTrue(self.agent._can_afford("trap checks"))
+        budget.seconds = 0
+        self.assertTrue(self.agent._can_afford("trap checks"))
+        self.assertFalse(self.agent._can_afford("prison break"))
+        self.agent._set_budget(FakeBudget(1))
+        self.assertTrue(self.agent._can_afford("prison break"))
+
+    def test_skipped_stage_counted_once(self):
+        self.agent._set_budget(FakeBudget(0))
+        for _ in range(3):
+            self.assertFalse(self.agent._can_afford("trap checks"))
+        self.assertEqual(1, self.agent.skipped_stages)
+        self.agent._set_budget(FakeBudget(0))
+        self.agent._can_afford("trap checks")
+        self.assertEqual(2, self.agent.skipped_stages)
+
+
+class TestAvoidBlasts(TestCase):
+    def setUp(self):
+        with open("tests/data/default_state.json") as f:
+            state = json.load(f)
+        self.game_state = GameState()
+        self.game_state.set_state(state)
+        self.agent = Agent(server=ReplayConnection())
+
+    def plant(self, owner):
+        # Our only way out of (7, 2) is up, into this bomb's blast
+        bomb = {"x": 7, "y": 4, "type": "b", "owner": owner, "expires": 40}
+        bomb.update(hp=1, blast_diameter=3)
+        event = {"type": "entity_spawned", "data": bomb}
+        self.game_state.receive_ticks([{"tick": 1, "events": [event]}])
+        self.agent._set_state(self.game_state)
+
+    def test_own_bomb_far_from_exploding(self):
+        self.plant(owner=0)
+        decision = "IMPROVING  ", ("move", "up")
+        self.assertEqual(decision, self.agent._avoid_blasts(decision))
+
+    def test_enemy_can_detonate_remotely(self):
+        self.plant(owner=1)
+        decision = "IMPROVING  ", ("move", "up")
+        self.assertEqual(("EVADING    ", None), self.agent._avoid_blasts(decision))
@@ -0,0 +1,93 @@
+from unittest import TestCase
+
+from app.benchmark import (
+    STATISTICS,
+    StageTimer,
+    find_regressions,
+    format_summary,
+    percentile,
+    summarise,
+)
+from app.replay_runner import run_replay
+from tests.test_replay_runner import generate_replay
+
+
+class TestBenchmark(TestCase):
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual(50, percentile(samples, 50))
+        self.assertEqual(99, percentile(samples, 99))
+        self.assertEqual(100, percentile(samples, 100))
+        self.assertEqual(7, percentile([7], 95))
+
+    def test_stage_timer_adds_up_calls_per_tick(self):
+        class Stage:
+            def run(self, value):
+                return value
+
+        stage = Stage()
+        timer = StageTimer()
+        timer.wrap("stage", stage, "run")
+        self.assertEqual(3, stage.run(3))
+        stage.run(4)
+        timer.end_tick()
+        timer.end_tick()
+        stage.run(5)
+        timer.end_tick()
+        self.assertEqual(2, len(timer.samples["stage"]))
+
+    def test_summarise(self):
+        summary = summarise({"dijkstra": [0.003, 0.001, 0.002], "unknown": [1]})
+        self.assertEqual(["dijkstra"], list(summary))
+        self.assertEqual(3, summary["dijkstra"]["count"])
+        self.assertAlmostEqual(2, summary["dijkstra"]["p50"])
+        self.assertAlmostEqual(3, summary["dijkstra"]["max"])
+
+    def test_find_regressions(self):
+        baseline = {"weights": {"p50": 1.0, "p95": 2.0, "p99": 0.01, "max": 5.0}}
+        summary = {
+            "weights": {"count": 9, "p50": 1.1, "p95": 3.0, "p99": 0.03, "max": 4.0},
+            "dijkstra": {"count": 9, "p50": 9.0, "p95": 9.0, "p99": 9.0, "max": 9.0},
+        }
+        self.assertEqual(
+            [("weights", "p95", 2.0, 3.0)], find_regressions(summary, baseline, 0.2)
+        )
+        self.assertEqual(
+            [("weights", "p50", 1.0, 1.1), ("weights", "p95", 2.0, 3.0)],
+            find_regressions(summary, baseline, 0.05),
+        )
+        self.assertEqual(
+            [("weights", "p95", 2.0, 3.0), ("weights", "p99", 0.01, 0.03)],
+            find_regressions(summary, baseline, 0.2, 0.01, ("p95", "p99", "max")),
+        )
+
+    def test_find_regressions_max(self):
+        baseline = {"weights": {"p50": 1.0, "p95": 2.0, "p99": 3.0, "max": 5.0}}
+        summary = {
+            "weights": {"count": 9, "p50": 1.0, "p95": 2.0, "p99": 3.0, "max": 9.0}
+        }
+        self.assertEqual([], find_regressions(summary, baseline))
+        summary["weights"]["max"] = 11.0
+        self.assertEqual(
+            [("weights", "max", 5.0, 11.0)], find_regressions(summary, baseline)
+        )
+        self.assertEqual([], find_regressions(summary, baseline, max_min_delta=7.0))
+
+    def test_instrument_replay(self):
+        move = {"type": "agent", "agent_number": 1, "data": {"type": "move"}}
+        move["data"]["move"] = "up"
+        timer = StageTimer()
+        records = run_replay(
+            generate_replay([{"tick": 3, "events": [move]}]),
+            0,
+            speculate=False,
+            instrument=timer.instrument,
+        )
+        self.assertEqual(len(records), len(timer.samples["decision"]))
+        self.assertEqual(len(records), len(timer.samples["receive events"]))
+        self.assertIn("weights", timer.samples)
+        self.assertIn("dijkstra", timer.samples)
+        self.assertIn("trap checks", timer.samples)
+        summary = summarise(timer.samples)
+        for statistic in STATISTICS:
+            self.assertIn(statistic, format_summary(summary, summary))
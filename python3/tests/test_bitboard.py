@@ -0,0 +1,75 @@
+from unittest import TestCase
+
+from app.state.bitboard import Bitboard, BoardMasks
+from app.state.map import Map
+from tests.test_bombs import get_bomb_entity
+
+
+class TestBitboard(TestCase):
+    def setUp(self):
+        self.bb = Bitboard(9, 9)
+
+    def test_coords_round_trip(self):
+        coords = [(0, 0), (8, 0), (3, 4), (8, 8)]
+        self.assertCountEqual(coords, self.bb.to_coords(self.bb.from_coords(coords)))
+
+    def test_bit_out_of_bounds(self):
+        self.assertEqual(0, self.bb.bit((-1, 0)))
+        self.assertEqual(0, self.bb.bit((9, 0)))
+
+    def test_neighbours_no_wrap(self):
+        mask = self.bb.from_coords([(8, 4), (0, 0)])
+        self.assertCountEqual(
+            [(7, 4), (8, 3), (8, 5), (1, 0), (0, 1)],
+            self.bb.to_coords(self.bb.neighbours(mask)),
+        )
+
+    def test_flood_fill_stops_at_walls(self):
+        walls = self.bb.from_coords([(2, y) for y in range(9)])
+        passable = self.bb.full & ~walls
+        filled = self.bb.flood_fill(self.bb.bit((0, 0)), passable)
+        self.assertEqual(18, self.bb.count(filled))
+        self.assertFalse(filled & self.bb.bit((3, 0)))
+
+
+class TestBoardMasks(TestCase):
+    def setUp(self):
+        self.bb = Bitboard(9, 9)
+        self.masks = BoardMasks(self.bb)
+
+    def test_set_entity_impassable(self):
+        self.masks.set_entity((1, 1), "w")
+        self.assertEqual(self.bb.bit((1, 1)), self.masks.blocks)
+        self.assertFalse(self.masks.passable & self.bb.bit((1, 1)))
+
+    def test_set_entity_replaces(self):
+        self.masks.set_entity((1, 1), "a")
+        self.masks.set_entity((1, 1), "x")
+        self.assertEqual(0, self.masks.pickups)
+        self.assertEqual(self.bb.bit((1, 1)), self.masks.blasts)
+
+    def test_set_entity_cleared(self):
+        self.masks.set_entity((1, 1), "b")
+        self.masks.set_entity((1, 1), None)
+        self.assertEqual(0, self.masks.bombs)
+        self.assertEqual(self.bb.full, self.masks.passable)
+
+
+class TestMapBitboards(TestCase):
+    def test_passable_mask_matches_graph(self):
+        map = Map({"width": 9, "height": 9}, [])
+        map.add_entity({"x": 4, "y": 4, "type": "m"})
+        map.add_entity(get_bomb_entity(2, 2))
+        map.remove_entity((2, 2))
+        self.assertCountEqual(list(map), map.bitboard.to_coords(map.masks.passable))
+
+    def test_impact_mask_by_owner(self):
+        map = Map({"width": 9, "height": 9}, [])
+        map.add_entity(get_bomb_entity(0, 0, blast_diameter=5, owner=0))
+        map.add_entity(get_bomb_entity(8, 8, blast_diameter=5, owner=1))
+        map.bomb_library.update(map)
+        us = map.bomb_library.get_impact_mask("0")
+        self.assertTrue(us & map.bitboard.bit((0, 2)))
+        self.assertFalse(us & map.bitboard.bit((8, 6)))
+        both = map.bomb_library.get_impact_mask()
+        self.assertEqual(8, map.bitboard.count(both))
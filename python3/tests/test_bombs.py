@@ -1,8 +1,8 @@
-import json
 from unittest import TestCase
 from unittest.mock import MagicMock, call, patch
 
-from app.state.bombs import Bomb, BombLibrary
+from app.state.bombs import Bomb, BombLibrary, get_blast_rays
+from app.state.map import Map
 
 
 def get_generic_entity():
@@ -13,6 +13,13 @@ def get_generic_bomb():
     return Bomb(get_generic_entity())
 
 
+def get_map_mock():
+    map_mock = MagicMock()
+    map_mock.width = 9
+    map_mock.height = 9
+    return map_mock
+
+
 class TestBomb(TestCase):
     def test_bomb_constructor_position(self):
         bomb = get_generic_bomb()
@@ -39,61 +46,74 @@ class TestBomb(TestCase):
         self.assertIsNone(bomb.impacts)
 
     def test_calculate_impacts_no_nodes_in_graph(self):
-        map_mock = MagicMock()
-        map_mock.graph.__contains__.return_value = False
+        map_mock = get_map_mock()
+        map_mock.blast_blockers.__contains__.return_value = True
         bomb = get_generic_bomb()
         bomb.calculate_impacts(map_mock)
-        map_mock.graph.__contains__.assert_has_calls(
+        map_mock.blast_blockers.__contains__.assert_has_calls(
             [call(i) for i in [(0, 1), (2, 1), (1, 0), (1, 2)]], any_order=True
         )
 
     def test_calculate_impacts_no_nodes_in_graph_radius_3(self):
-        map_mock = MagicMock()
-        map_mock.graph.__contains__.return_value = False
+        map_mock = get_map_mock()
+        map_mock.blast_blockers.__contains__.return_value = True
         bomb = get_generic_bomb()
         bomb.radius = 3
         bomb.calculate_impacts(map_mock)
-        map_mock.graph.__contains__.assert_has_calls(
+        map_mock.blast_blockers.__contains__.assert_has_calls(
             [call(i) for i in [(0, 1), (2, 1), (1, 0), (1, 2)]], any_order=True
         )
         self.assertCountEqual([(0, 1), (2, 1), (1, 0), (1, 2)], bomb.impacts)
 
     def test_calculate_impacts_radius_2(self):
-        map_mock = MagicMock()
-        map_mock.graph.__contains__.return_value = True
-        map_mock.graph.nodes.__getitem__.return_value.get.return_value = None
+        map_mock = get_map_mock()
+        map_mock.blast_blockers.__contains__.return_value = False
         bomb = get_generic_bomb()
         bomb.radius = 2
         bomb.calculate_impacts(map_mock)
         coords = [(0, 1), (2, 1), (1, 0), (1, 2), (-1, 1), (3, 1), (1, -1), (1, 3)]
-        map_mock.graph.__contains__.assert_has_calls(
+        map_mock.blast_blockers.__contains__.assert_has_calls(
             [call(i) for i in coords], any_order=True
         )
         self.assertCountEqual(coords, bomb.impacts)
 
     def test_calculate_impacts_nodes_called(self):
-        map_mock = MagicMock()
-        map_mock.graph.__contains__.return_value = True
-        map_mock.graph.nodes.__getitem__.__getitem__.return_value = False
+        map_mock = get_map_mock()
+        map_mock.blast_blockers.__contains__.return_value = True
         bomb = get_generic_bomb()
         bomb.calculate_impacts(map_mock)
-        map_mock.graph.nodes.__getitem__.assert_has_calls(
+        map_mock.blast_blockers.__contains__.assert_has_calls(
             [call(i) for i in [(0, 1), (2, 1), (1, 0), (1, 2)]], any_order=True
         )
-        map_mock.graph.nodes.__getitem__.return_value.get.assert_has_calls(
-            [call("entity") for _ in range(4)], any_order=True
-        )
         self.assertCountEqual([(0, 1), (2, 1), (1, 0), (1, 2)], bomb.impacts)
 
     def test_calculate_impacts_impacts_added(self):
-        map_mock = MagicMock()
-        map_mock.graph.__contains__.return_value = True
-        node_mock = map_mock.graph.nodes.__getitem__.return_value
-        node_mock.get.return_value = None
+        map_mock = get_map_mock()
+        map_mock.blast_blockers.__contains__.return_value = False
         bomb = get_generic_bomb()
         bomb.calculate_impacts(map_mock)
         self.assertCountEqual([(0, 1), (2, 1), (1, 0), (1, 2)], bomb.impacts)
 
+    def test_calculate_impacts_stops_at_blocker(self):
+        map_mock = get_map_mock()
+        map_mock.blast_blockers = {(3, 1), (1, 2)}
+        bomb = get_generic_bomb()
+        bomb.radius = 3
+        bomb.calculate_impacts(map_mock)
+        self.assertCountEqual(
+            [(2, 1), (3, 1), (1, 2), (0, 1), (-1, 1), (1, 0), (1, -1)], bomb.impacts
+        )
+
+    def test_get_blast_rays_truncated_at_edge(self):
+        rays = get_blast_rays(9, 9, (7, 0), 3)
+        self.assertEqual(((8, 0), (9, 0)), rays[0])
+        self.assertEqual(((7, 1), (7, 2), (7, 3)), rays[1])
+        self.assertEqual(((6, 0), (5, 0), (4, 0)), rays[2])
+        self.assertEqual(((7, -1),), rays[3])
+
+    def test_get_blast_rays_cached(self):
+        self.assertIs(get_blast_rays(9, 9, (4, 4), 2), get_blast_rays(9, 9, (4, 4), 2))
+
     def test_bomb_update_tick_early(self):
         bomb = get_generic_bomb()
         bomb.update_tick(2)
@@ -170,3 +190,188 @@ class TestBombLibrary(TestCase):
 
         self.assertEqual([], bomb.detonates)
         self.assertEqual([], bomb.detonated_by)
+
+
+def get_bomb_entity(x, y, blast_diameter=3, owner=0, expires=40):
+    return {
+        "x": x,
+        "y": y,
+        "type": "b",
+        "blast_diameter": blast_diameter,
+        "expires": expires,
+        "owner": owner,
+    }
+
+
+def get_impacting_positions(bl, coords):
+    return {bomb.position for bomb in bl.get_bombs_impacting(coords)}
+
+
+class TestBombLibraryIncremental(TestCase):
+    def setUp(self):
+        self.map = Map({"width": 9, "height": 9}, [])
+        self.bl = self.map.bomb_library
+
+    def test_repeated_update_no_duplicate_detonations(self):
+        self.map.add_entity(get_bomb_entity(1, 1))
+        self.map.add_entity(get_bomb_entity(2, 1))
+        for _ in range(3):
+            self.map.add_entity({"x": 5, "y": 5, "type": "a"})
+            self.bl.update(self.map)
+        first = self.bl.get_bomb_at((1, 1))
+        second = self.bl.get_bomb_at((2, 1))
+        self.assertEqual([second], first.detonates)
+        self.assertEqual([second], first.detonated_by)
+
+    def test_chain_reaction_extends_impacts(self):
+        self.map.add_entity(get_bomb_entity(1, 1))
+        self.map.add_entity(get_bomb_entity(2, 1))
+        self.bl.update(self.map)
+        self.assertEqual({(1, 1), (2, 1)}, get_impacting_positions(self.bl, (3, 1)))
+        self.assertEqual({(1, 1), (2, 1)}, get_impacting_positions(self.bl, (1, 0)))
+
+    def test_remove_bomb_breaks_chain(self):
+        self.map.add_entity(get_bomb_entity(1, 1))
+        self.map.add_entity(get_bomb_entity(2, 1))
+        self.bl.update(self.map)
+        self.map.remove_entity((1, 1))
+        self.bl.update(self.map)
+        self.assertEqual({(2, 1)}, get_impacting_positions(self.bl, (3, 1)))
+        self.assertEqual(set(), get_impacting_positions(self.bl, (1, 0)))
+        self.assertEqual([], self.bl.get_bomb_at((2, 1)).detonated_by)
+
+    def test_only_bombs_crossing_changed_tiles_recalculated(self):
+        self.map.add_entity(get_bomb_entity(1, 1))
+        self.map.add_entity(get_bomb_entity(7, 7))
+        self.bl.update(self.map)
+        near = self.bl.get_bomb_at((1, 1))
+        far = self.bl.get_bomb_at((7, 7))
+        with patch.object(near, "calculate_impacts") as near_mock, patch.object(
+            far, "calculate_impacts"
+        ) as far_mock:
+            near_mock.side_effect = lambda map: Bomb.calculate_impacts(near, map)
+            self.map.add_entity({"x": 1, "y": 2, "type": "w", "hp": 1})
+            self.bl.update(self.map)
+            near_mock.assert_called_once_with(self.map)
+            far_mock.assert_not_called()
+        self.assertEqual(set(), get_impacting_positions(self.bl, (1, 3)))
+
+    def test_incremental_matches_full_rebuild(self):
+        full = Map({"width": 9, "height": 9}, [])
+        full.bomb_library.incremental = False
+        changes = [
+            ("add", {"x": 3, "y": 1, "type": "w", "hp": 1}),
+            ("add", get_bomb_entity(1, 1, blast_diameter=5)),
+            ("add", get_bomb_entity(1, 3, owner=1)),
+            ("add", get_bomb_entity(5, 1, blast_diameter=5, owner=1)),
+            ("remove", (3, 1)),
+            ("add", {"x": 1, "y": 2, "type": "a"}),
+            ("remove", (1, 1)),
+            ("remove", (1, 2)),
+        ]
+        for action, data in changes:
+            for map in (self.map, full):
+                if action == "add":
+                    map.add_entity(data)
+                else:
+                    map.remove_entity(data)
+                map.bomb_library.update(map)
+            for coords in full:
+                with self.subTest(action=action, coords=coords):
+                    self.assertEqual(
+                        get_impacting_positions(full.bomb_library, coords),
+                        get_impacting_positions(self.bl, coords),
+                    )
+
+
+class TestBombLibraryChainIndex(TestCase):
+    def setUp(self):
+        self.map = Map({"width": 9, "height": 9}, [])
+        self.bl = self.map.bomb_library
+
+    def add_bomb(self, x, y, blast_diameter=3, owner=0, expires=40):
+        self.map.add_entity(get_bomb_entity(x, y, blast_diameter, owner, expires))
+
+    def test_one_way_chain(self):
+        self.add_bomb(1, 1, blast_diameter=5, owner=0, expires=30)
+        self.add_bomb(3, 1, owner=1, expires=50)
+        self.bl.update(self.map)
+        self.assertEqual({(1, 1), (3, 1)}, get_impacting_positions(self.bl, (4, 1)))
+        self.assertEqual({"0", "1"}, self.bl.get_bomb_impact_owners((4, 1)))
+        self.assertEqual({(1, 1)}, get_impacting_positions(self.bl, (0, 1)))
+        self.assertEqual(30, self.bl.get_detonation_tick(self.bl.get_bomb_at((3, 1))))
+        self.assertEqual(30, self.bl.get_detonation_tick(self.bl.get_bomb_at((1, 1))))
+
+    def test_mutual_chain_detonation_tick(self):
+        self.add_bomb(1, 1, expires=45)
+        self.add_bomb(2, 1, expires=35)
+        self.add_bomb(6, 6, expires=20)
+        self.bl.update(self.map)
+        self.assertEqual(35, self.bl.get_detonation_tick(self.bl.get_bomb_at((1, 1))))
+        self.assertEqual(35, self.bl.get_detonation_tick(self.bl.get_bomb_at((2, 1))))
+        self.assertEqual(20, self.bl.get_detonation_tick(self.bl.get_bomb_at((6, 6))))
+
+    def test_impacts_are_read_only(self):
+        self.add_bomb(1, 1, owner=0)
+        self.bl.update(self.map)
+        self.assertIsInstance(self.bl.get_bomb_impact_owners((1, 2)), frozenset)
+        self.assertIsInstance(self.bl.get_bombs_impacting((1, 2)), frozenset)
+        self.assertEqual(frozenset(), self.bl.get_bomb_impact_owners((5, 5)))
+
+    def test_update_tick_refreshes_owners(self):
+        self.add_bomb(1, 1, owner=0, expires=40)
+        self.add_bomb(2, 1, owner=1, expires=60)
+        self.bl.update(self.map)
+        self.assertEqual({"0", "1"}, self.bl.get_bomb_impact_owners((3, 1)))
+        self.bl.update_tick(37)
+        self.assertEqual({None, "1"}, self.bl.get_bomb_impact_owners((3, 1)))
+
+
+class TestBombLibraryEvaluate(TestCase):
+    def setUp(self):
+        self.map = Map({"width": 9, "height": 9}, [])
+        self.bl = self.map.bomb_library
+        self.map.add_entity(get_bomb_entity(3, 1, owner=1))
+        self.map.add_entity(get_bomb_entity(4, 1, owner=1))
+        self.map.add_entity(get_bomb_entity(7, 7, owner=1))
+        self.map.add_entity({"x": 2, "y": 2, "type": "w", "hp": 1})
+        self.bl.update(self.map)
+
+    def test_chain_reaction(self):
+        outcome = self.bl.evaluate_bombs([get_bomb_entity(2, 1)], self.map)[0]
+        self.assertEqual({(3, 1), (4, 1)}, {b.position for b in outcome.detonates})
+        self.assertEqual({(3, 1)}, {b.position for b in outcome.detonated_by})
+        self.assertIn((5, 1), outcome.reach)
+        self.assertIn((2, 2), outcome.reach)
+        self.assertNotIn((2, 3), outcome.reach)
+        self.assertEqual({"0", "1"}, outcome.owners)
+        self.assertTrue(outcome.reach_mask & self.map.bitboard.bit((5, 1)))
+
+    def test_does_not_change_library(self):
+        self.bl.evaluate_bombs([get_bomb_entity(2, 1)], self.map)
+        self.assertIsNone(self.bl.get_bomb_at((2, 1)))
+        self.assertEqual({"1"}, self.bl.get_bomb_impact_owners((5, 1)))
+        self.assertEqual(
+            [(4, 1)], [b.position for b in self.bl.get_bomb_at((3, 1)).detonated_by]
+        )
+
+    def test_matches_adding_bomb(self):
+        candidates = [get_bomb_entity(x, y, 5) for x, y in [(2, 1), (0, 0), (7, 5)]]
+        outcomes = self.bl.evaluate_bombs(candidates, self.map)
+        for entity, outcome in zip(candidates, outcomes):
+            position = (entity["x"], entity["y"])
+            with self.subTest(position=position):
+                self.bl.add_bomb(entity, self.map)
+                self.bl.update(self.map)
+                for x in range(9):
+                    for y in range(9):
+                        self.assertEqual(
+                            "0" in self.bl.get_bomb_impact_owners((x, y)),
+                            (x, y) in outcome.reach,
+                        )
+                self.assertEqual(
+                    self.bl.get_detonation_tick(self.bl.get_bomb_at(position)),
+                    outcome.detonation_tick,
+                )
+                self.bl.remove_bomb(position, self.map)
+                self.bl.update(self.map)
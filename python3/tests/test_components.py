@@ -0,0 +1,63 @@
+import random
+from unittest import TestCase
+
+import networkx as nx
+
+from app.state.components import ComponentIndex
+from app.state.grid_map import GridMap
+from app.state.map import Map
+from tests.test_map import add_metal, generate_empty_map
+
+
+class TestComponentIndex(TestCase):
+    def test_empty_map_single_component(self):
+        map = generate_empty_map()
+        self.assertEqual(81, map.components.size_of((0, 0)))
+        self.assertTrue(map.components.same_component((0, 0), (8, 8)))
+
+    def test_impassable_tile(self):
+        map = generate_empty_map()
+        add_metal(map, (4, 4))
+        self.assertIsNone(map.components.component_of((4, 4)))
+        self.assertEqual(0, map.components.size_of((4, 4)))
+        self.assertEqual(set(), map.components.members((4, 4)))
+        self.assertFalse(map.components.same_component((4, 4), (4, 4)))
+
+    def test_split_and_merge(self):
+        map = generate_empty_map()
+        map.components.size_of((0, 0))
+        for y in range(9):
+            add_metal(map, (2, y))
+        self.assertEqual(18, map.components.size_of((0, 0)))
+        self.assertEqual(54, map.components.size_of((8, 8)))
+        self.assertFalse(map.components.same_component((0, 0), (8, 8)))
+        map.remove_entity((2, 4))
+        self.assertEqual(73, map.components.size_of((0, 0)))
+        self.assertTrue(map.components.same_component((0, 0), (8, 8)))
+        self.assertIn((2, 4), map.components.members((8, 8)))
+
+    def test_incremental_matches_networkx(self):
+        rng = random.Random(7)
+        for map_class in Map, GridMap:
+            map = map_class({"width": 9, "height": 9}, [])
+            for step in range(300):
+                coords = (rng.randrange(9), rng.randrange(9))
+                if coords in map:
+                    add_metal(map, coords)
+                else:
+                    map.remove_entity(coords)
+                if step % 3 == 0:
+                    with self.subTest(map_class=map_class.__name__, step=step):
+                        for node in map:
+                            self.assertEqual(
+                                nx.node_connected_component(map.graph, node),
+                                map.components.members(node),
+                            )
+
+    def test_fresh_index_matches_incremental(self):
+        map = generate_empty_map()
+        for coords in (1, 0), (0, 1), (5, 5), (1, 1), (0, 2):
+            add_metal(map, coords)
+        full = ComponentIndex(map)
+        for node in map:
+            self.assertEqual(full.size_of(node), map.components.size_of(node))
@@ -3,6 +3,7 @@ from unittest import TestCase
 from unittest.mock import call, patch
 
 from app.state.game_state import GameState
+from app.state.grid_map import GridMap
 
 
 def generate_default_state():
@@ -106,3 +107,136 @@ class TestGameState(TestCase):
                     (entity["x"], entity["y"])
                 )
                 self.gs.map.reset_mock()
+
+    def test_receive_ticks_updates_bombs_once(self, player_mock, map_mock):
+        self.gs.set_state(generate_default_state())
+        spawned = {"x": 1, "y": 1, "type": "a", "expires": 40, "hp": 1}
+        self.gs.receive_ticks(
+            [
+                {"tick": 1, "events": [{"type": "entity_spawned", "data": spawned}]},
+                {"tick": 2, "events": [{"type": "entity_expired", "data": [1, 1]}]},
+            ]
+        )
+        self.assertEqual(2, self.gs.tick)
+        self.assertFalse(self.gs.desynced)
+        self.gs.map.add_entity.assert_called_once_with(spawned)
+        self.gs.map.remove_entity.assert_called_once_with((1, 1))
+        self.gs.map.bomb_library.update.assert_called_once_with(self.gs.map)
+
+
+class TestGameStateBombs(TestCase):
+    def test_fire_over_pickup_updates_bombs(self):
+        state = generate_default_state()
+        state["entities"] = []
+        gs = GameState()
+        gs.set_state(state)
+        pickup = {"x": 1, "y": 8, "type": "a", "expires": 1900, "hp": 1}
+        bomb = {"x": 3, "y": 8, "type": "b", "owner": 1, "expires": 1900}
+        bomb.update(hp=1, blast_diameter=7)
+        spawned = [{"type": "entity_spawned", "data": e} for e in (pickup, bomb)]
+        gs.receive_ticks([{"tick": 1, "events": spawned}])
+        self.assertNotIn("1", gs.map.bomb_library.get_bomb_impact_owners((0, 8)))
+        # Fire lands on the pickup at tick 1810 with no events that tick
+        gs.receive_ticks([{"tick": 1808, "events": []}])
+        self.assertEqual("x", gs.map.get_entity((1, 8)))
+        self.assertIn("1", gs.map.bomb_library.get_bomb_impact_owners((0, 8)))
+
+
+def get_tile_snapshot(map):
+    return {
+        (x, y): (
+            (x, y) in map,
+            map.get_entity((x, y)) if (x, y) in map else None,
+            frozenset(map.bomb_library.get_bomb_impact_owners((x, y))),
+        )
+        for x in range(map.width)
+        for y in range(map.height)
+    }
+
+
+class TestGameStateJournal(TestCase):
+    def setUp(self):
+        self.gs = GameState()
+        self.gs.set_state(generate_default_state())
+        self.gs.update_tick(1)
+
+    def get_snapshot(self):
+        return (
+            self.gs.tick,
+            dict(vars(self.gs.us)),
+            dict(vars(self.gs.them)),
+            get_tile_snapshot(self.gs.map),
+            dict(self.gs.map.entities),
+            dict(self.gs.map.block_library),
+        )
+
+    def apply_changes(self):
+        self.gs.update_tick(2)
+        us = self.gs.us
+        x, y = us.coords
+        bomb = {
+            "x": x,
+            "y": y,
+            "type": "b",
+            "owner": int(us.id),
+            "expires": 42,
+            "blast_diameter": 3,
+        }
+        move = {"type": "move", "move": "up"}
+        self.gs.receive_events(
+            [
+                {"type": "agent", "agent_number": int(us.id), "data": move},
+                {"type": "entity_spawned", "data": bomb},
+            ]
+        )
+        block = next(iter(self.gs.map.block_library))
+        self.gs.receive_events([{"type": "entity_expired", "data": list(block)}])
+        self.gs.update_tick(41)
+
+    def test_rollback_restores_state(self):
+        expected = self.get_snapshot()
+        self.gs.checkpoint()
+        self.apply_changes()
+        self.assertNotEqual(expected, self.get_snapshot())
+        self.gs.rollback()
+        self.assertEqual(expected, self.get_snapshot())
+
+    def test_rollback_keeps_tile_order(self):
+        nodes = list(self.gs.map)
+        neighbours = [self.gs.map.neighbours(node) for node in nodes]
+        adjacency = list(self.gs.map.adjacency())
+        self.gs.checkpoint()
+        self.apply_changes()
+        self.gs.rollback()
+        self.assertEqual(nodes, list(self.gs.map))
+        self.assertEqual(neighbours, [self.gs.map.neighbours(n) for n in nodes])
+        self.assertEqual(adjacency, self.gs.map.adjacency())
+
+    def test_nested_checkpoints(self):
+        expected = self.get_snapshot()
+        self.gs.checkpoint()
+        self.gs.update_tick(2)
+        inner = self.get_snapshot()
+        self.gs.checkpoint()
+        self.apply_changes()
+        self.gs.rollback()
+        self.assertEqual(inner, self.get_snapshot())
+        self.gs.rollback()
+        self.assertEqual(expected, self.get_snapshot())
+
+    def test_commit_keeps_changes(self):
+        self.gs.checkpoint()
+        self.apply_changes()
+        expected = self.get_snapshot()
+        self.gs.commit()
+        self.assertIsNone(self.gs.map.journal)
+        self.assertEqual(expected, self.get_snapshot())
+
+    def test_rollback_grid_map(self):
+        self.gs = GameState(GridMap)
+        self.gs.set_state(generate_default_state())
+        expected = self.get_snapshot()
+        self.gs.checkpoint()
+        self.apply_changes()
+        self.gs.rollback()
+        self.assertEqual(expected, self.get_snapshot())
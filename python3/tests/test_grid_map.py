@@ -0,0 +1,106 @@
+import json
+from unittest import TestCase
+
+from app.state.grid_map import GridMap
+from app.state.map import Map
+from app.utilities import WEIGHT_MAP
+from tests.test_bombs import get_bomb_entity
+
+
+def generate_empty_map():
+    return GridMap({"width": 9, "height": 9}, [])
+
+
+class TestGridMap(TestCase):
+    def test_init_empty_map_size(self):
+        map = generate_empty_map()
+        self.assertEqual(9 * 9, len(map))
+
+    def test_init_empty_map_weight(self):
+        map = generate_empty_map()
+        for node in map:
+            self.assertEqual(WEIGHT_MAP["Default"], map.get_weight(node))
+
+    def test_init_default_map_matches_graph_map(self):
+        with open("tests/data/default_state.json") as f:
+            state = json.load(f)
+        grid_map = GridMap(state["world"], state["entities"])
+        graph_map = Map(state["world"], state["entities"])
+        self.assertCountEqual(list(graph_map), list(grid_map))
+        for node in graph_map:
+            with self.subTest(node=node):
+                self.assertCountEqual(
+                    graph_map.neighbours(node), grid_map.neighbours(node)
+                )
+                self.assertEqual(graph_map.get_weight(node), grid_map.get_weight(node))
+                self.assertEqual(graph_map.get_entity(node), grid_map.get_entity(node))
+        self.assertEqual(dict(graph_map.block_library), dict(grid_map.block_library))
+        self.assertEqual(graph_map.blast_blockers, grid_map.blast_blockers)
+
+    def test_contains_out_of_bounds(self):
+        map = generate_empty_map()
+        self.assertNotIn((-1, 0), map)
+        self.assertNotIn((0, 9), map)
+
+    def test_add_entity_ammo(self):
+        map = generate_empty_map()
+        map.add_entity({"x": 0, "y": 0, "type": "a", "expires": 40})
+        self.assertEqual("a", map.get_entity((0, 0)))
+        self.assertEqual(WEIGHT_MAP["a"], map.get_weight((0, 0)))
+
+    def test_add_entity_bomb(self):
+        map = generate_empty_map()
+        map.add_entity(get_bomb_entity(1, 1))
+        map.bomb_library.update(map)
+        self.assertNotIn((1, 1), map)
+        self.assertIsNotNone(map.bomb_library.get_bomb_at((1, 1)))
+        self.assertNotIn((1, 1), map.neighbours((1, 2)))
+
+    def test_add_entity_ore(self):
+        map = generate_empty_map()
+        map.add_entity({"x": 5, "y": 5, "type": "o", "hp": 3})
+        self.assertNotIn((5, 5), map)
+        self.assertEqual(3, map.block_library[(5, 5)])
+
+    def test_add_entity_wood(self):
+        map = generate_empty_map()
+        map.add_entity({"x": 6, "y": 6, "type": "w", "hp": 1})
+        self.assertNotIn((6, 6), map)
+        self.assertEqual(1, map.block_library.get((6, 6)))
+
+    def test_remove_entity_ammo(self):
+        map = generate_empty_map()
+        map.add_entity({"x": 0, "y": 0, "type": "a", "expires": 40})
+        map.remove_entity((0, 0))
+        self.assertIsNone(map.get_entity((0, 0)))
+        self.assertEqual(WEIGHT_MAP["Default"], map.get_weight((0, 0)))
+
+    def test_remove_entity_bomb(self):
+        map = generate_empty_map()
+        map.add_entity(get_bomb_entity(2, 2))
+        map.bomb_library.update(map)
+        map.remove_entity((2, 2))
+        map.bomb_library.update(map)
+        self.assertIn((2, 2), map)
+        self.assertIsNone(map.bomb_library.get_bomb_at((2, 2)))
+        self.assertIn((2, 2), map.neighbours((2, 3)))
+
+    def test_remove_entity_wood(self):
+        map = generate_empty_map()
+        map.add_entity({"x": 6, "y": 6, "type": "w", "hp": 1})
+        map.remove_entity((6, 6))
+        self.assertIn((6, 6), map)
+        self.assertNotIn((6, 6), map.block_library)
+
+    def test_update_tick_spawns_fire(self):
+        map = generate_empty_map()
+        map.update_tick(1798)
+        self.assertEqual("x", map.get_entity((0, 8)))
+        self.assertEqual(WEIGHT_MAP["x"], map.get_weight((0, 8)))
+
+    def test_graph_view_rebuilt_after_change(self):
+        map = generate_empty_map()
+        self.assertIn((4, 4), map.graph)
+        map.add_entity({"x": 4, "y": 4, "type": "m"})
+        self.assertNotIn((4, 4), map.graph)
+        self.assertEqual(9 * 9 - 1, len(map.graph))
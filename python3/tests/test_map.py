@@ -10,6 +10,16 @@ def generate_empty_map():
     return Map({"width": 9, "height": 9}, [])
 
 
+def generate_default_map():
+    with open("tests/data/default_state.json") as f:
+        state = json.load(f)
+    return Map(state["world"], state["entities"])
+
+
+def add_metal(map, coords):
+    map.add_entity({"x": coords[0], "y": coords[1], "type": "m"})
+
+
 class TestMap(TestCase):
     def test_init_empty_map_size(self):
         map = generate_empty_map()
@@ -154,3 +164,17 @@ class TestMap(TestCase):
         map.add_entity({"x": 2, "y": 2, "type": "x", "expires": 10})
         map.remove_entity((2, 2))
         self.assertEqual(WEIGHT_MAP["Default"], map.graph.nodes[(2, 2)]["weight"])
+
+    def test_blast_blockers_pickup_and_block(self):
+        map = generate_empty_map()
+        map.add_entity({"x": 0, "y": 0, "type": "a", "expires": 40})
+        map.add_entity({"x": 6, "y": 6, "type": "w", "hp": 1})
+        self.assertEqual({(0, 0), (6, 6)}, map.blast_blockers)
+        map.remove_entity((0, 0))
+        map.remove_entity((6, 6))
+        self.assertEqual(set(), map.blast_blockers)
+
+    def test_blast_blockers_ignore_blast(self):
+        map = generate_empty_map()
+        map.add_entity({"x": 2, "y": 2, "type": "x", "expires": 10})
+        self.assertNotIn((2, 2), map.blast_blockers)
@@ -0,0 +1,52 @@
+import time
+from unittest import TestCase
+
+from app.bot.mcts import MCTS
+from tests.test_simulator import bomb, generate_state
+
+
+def evaluate(state):
+    us = state.agents["0"]
+    them = state.agents["1"]
+    return min(1.0, max(0.0, 0.5 + 0.15 * (us.hp - them.hp)))
+
+
+class TestMCTS(TestCase):
+    def setUp(self):
+        self.mcts = MCTS(seed=0)
+        self.deadline = time.perf_counter() + 10
+
+    def test_max_iterations(self):
+        self.mcts.search(
+            generate_state(), "0", "1", evaluate, self.deadline, max_iterations=25
+        )
+        self.assertEqual(25, self.mcts.iterations)
+
+    def test_deadline(self):
+        self.mcts.search(generate_state(), "0", "1", evaluate, time.perf_counter())
+        self.assertEqual(0, self.mcts.iterations)
+
+    def test_returns_legal_action(self):
+        state = generate_state()
+        action = self.mcts.search(
+            state, "0", "1", evaluate, self.deadline, max_iterations=50
+        )
+        self.assertIn(action, self.mcts.model.get_actions(state, "0"))
+
+    def test_escapes_blast(self):
+        # The bomb's blast covers (2, 1), the only way out is left
+        state = generate_state(
+            [
+                bomb(3, 1, owner=1, expires=12),
+                {"x": 2, "y": 0, "type": "m"},
+                {"x": 2, "y": 2, "type": "m"},
+                {"x": 1, "y": 0, "type": "m"},
+                {"x": 1, "y": 2, "type": "m"},
+            ]
+        )
+        state.agents["0"].coords = (2, 1)
+        state.agents["0"].ammo = 0
+        action = self.mcts.search(
+            state, "0", "1", evaluate, self.deadline, max_iterations=300
+        )
+        self.assertEqual(("move", "left"), action)
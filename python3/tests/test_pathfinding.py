@@ -0,0 +1,142 @@
+import math
+import random
+from unittest import TestCase
+
+import networkx as nx
+
+from app.pathfinding import ShortestPathTree, grid_bfs, grid_dijkstra
+from app.state.map import Map
+from tests.test_map import generate_default_map
+
+
+def get_path(pred, index):
+    path = [index]
+    while pred[path[-1]] != -1:
+        path.append(pred[path[-1]])
+    return path[::-1]
+
+
+class TestGridDijkstra(TestCase):
+    def setUp(self):
+        self.map = generate_default_map()
+        rng = random.Random(1234)
+        choices = [90, 100, 100, 100, 1100, 5100, 10000, math.inf]
+        self.weights = [rng.choice(choices) for _ in range(9 * 9)]
+
+    def get_node_weight(self, node):
+        return self.weights[self.map.index(node)]
+
+    def test_matches_networkx(self):
+        for source in list(self.map)[::7]:
+            with self.subTest(source=source):
+                expected_dist, expected_paths = nx.single_source_dijkstra(
+                    self.map.graph,
+                    source,
+                    weight=lambda u, v, d: self.get_node_weight(u)
+                    + self.get_node_weight(v),
+                )
+                dist, pred = grid_dijkstra(
+                    self.weights, self.map.adjacency(), self.map.index(source)
+                )
+                for node, d in expected_dist.items():
+                    index = self.map.index(node)
+                    self.assertEqual(d, dist[index])
+                    self.assertEqual(
+                        expected_paths[node],
+                        [self.map.coords(i) for i in get_path(pred, index)],
+                    )
+                self.assertEqual(
+                    len(expected_dist), sum(d is not None for d in dist)
+                )
+
+    def test_unreachable(self):
+        map = Map({"width": 9, "height": 9}, [])
+        map.add_entity({"x": 0, "y": 1, "type": "m"})
+        map.add_entity({"x": 1, "y": 0, "type": "m"})
+        dist, pred = grid_dijkstra(self.weights, map.adjacency(), map.index((0, 0)))
+        self.assertEqual(0, dist[0])
+        self.assertEqual(1, sum(d is not None for d in dist))
+        self.assertEqual([-1] * 81, pred)
+
+    def test_infinite_weight_still_reached(self):
+        weights = [100] * 81
+        weights[self.map.index((4, 4))] = math.inf
+        map = Map({"width": 9, "height": 9}, [])
+        dist, pred = grid_dijkstra(weights, map.adjacency(), map.index((4, 3)))
+        self.assertEqual(math.inf, dist[map.index((4, 4))])
+        self.assertEqual(800, dist[map.index((4, 5))])
+
+
+class TestGridBfs(TestCase):
+    def setUp(self):
+        self.map = generate_default_map()
+
+    def test_matches_networkx(self):
+        for source in list(self.map)[::7]:
+            with self.subTest(source=source):
+                expected = nx.single_source_shortest_path_length(
+                    self.map.graph, source
+                )
+                dist = grid_bfs(self.map.adjacency(), [self.map.index(source)])
+                for node, d in expected.items():
+                    self.assertEqual(d, dist[self.map.index(node)])
+                self.assertEqual(len(expected), sum(d is not None for d in dist))
+
+    def test_multiple_sources(self):
+        map = Map({"width": 9, "height": 9}, [])
+        dist = grid_bfs(map.adjacency(), [map.index((0, 0)), map.index((8, 8))])
+        self.assertEqual(0, dist[map.index((8, 8))])
+        self.assertEqual(8, dist[map.index((4, 4))])
+        self.assertEqual(3, dist[map.index((8, 5))])
+
+
+class TestShortestPathTree(TestCase):
+    def setUp(self):
+        self.map = Map({"width": 9, "height": 9}, [])
+        self.map.add_entity({"x": 1, "y": 0, "type": "m"})
+        self.weights = [100] * 81
+        self.weights[self.map.index((0, 2))] = 5100
+        self.tree = ShortestPathTree.search(self.map, (0, 0), self.weights)
+
+    def test_path(self):
+        self.assertEqual([(0, 0), (0, 1), (1, 1), (2, 1)], self.tree.path((2, 1)))
+        self.assertEqual(4, self.tree.length((2, 1)))
+        self.assertEqual((0, 1), self.tree.first_step((2, 1)))
+        self.assertEqual(600, self.tree.distance((2, 1)))
+
+    def test_source(self):
+        self.assertEqual([(0, 0)], self.tree.path((0, 0)))
+        self.assertEqual(1, self.tree.length((0, 0)))
+        self.assertIsNone(self.tree.first_step((0, 0)))
+
+    def test_unreachable(self):
+        self.assertNotIn((1, 0), self.tree)
+        self.assertNotIn((-1, 0), self.tree)
+        self.assertIsNone(self.tree.path((1, 0)))
+        self.assertIsNone(self.tree.length((1, 0)))
+
+    def test_lengths_match_paths(self):
+        for node in self.map:
+            self.assertEqual(len(self.tree.path(node)), self.tree.length(node))
+
+    def test_max_weight(self):
+        self.assertEqual(100, self.tree.max_weight((2, 1), self.weights))
+        self.weights[0] = 10000
+        self.assertEqual(10000, self.tree.max_weight((2, 1), self.weights))
+        self.assertEqual(
+            100, self.tree.max_weight((2, 1), self.weights, include_source=False)
+        )
+        self.assertEqual(
+            7,
+            self.tree.max_weight(
+                (0, 0), self.weights, include_source=False, default=7
+            ),
+        )
+
+    def test_from_neighbours(self):
+        tree = ShortestPathTree.from_neighbours(self.map, (4, 4), [(4, 5), (3, 4)])
+        self.assertNotIn((4, 4), tree)
+        self.assertEqual([(4, 4), (4, 5)], tree.path((4, 5)))
+        self.assertEqual(2, tree.length((3, 4)))
+        self.assertEqual(1, tree.distance((3, 4)))
+        self.assertNotIn((5, 4), tree)
@@ -28,6 +28,13 @@ class TestPlayer(TestCase):
         player = Player(state)
         mocked.assert_called_once_with(player, state, 0)
 
+    def test_update_state_sets_invulnerability(self):
+        state = dict(get_default_state(), invulnerability=5)
+        player = Player(state)
+        self.assertTrue(player.is_invulnerable)
+        player.update_state(state, 5)
+        self.assertFalse(player.is_invulnerable)
+
     def test_handle_action_non_move(self):
         with open("tests/data/agent_events.json") as f:
             events = json.load(f)
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+from unittest import TestCase, skipUnless
+
+from app.bot.agent import Agent
+from app.replay_runner import (
+    InlineExecutor,
+    ReplayConnection,
+    get_agent_number,
+    get_ticks,
+    load_replay,
+    run_replay,
+)
+from tests.test_simulator import REPLAYS
+
+# python -m tests.test_replay_runner records the decisions after a
+# deliberate change to the agent's behaviour
+DECISIONS_FILE = "tests/data/replay_decisions.json"
+DECISION_REPLAYS = REPLAYS[::30]
+DECISION_TICKS = 800
+
+
+def get_decisions(path):
+    replay = load_replay(path)
+    replay["history"] = [t for t in replay["history"] if t["tick"] <= DECISION_TICKS]
+    records = run_replay(replay, get_agent_number(path), speculate=False)
+    return [[r.tick, r.label.strip(), r.packets] for r in records]
+
+
+def record_decisions():
+    decisions = {
+        os.path.relpath(path, "..").replace(os.sep, "/"): get_decisions(path)
+        for path in DECISION_REPLAYS
+    }
+    with open(DECISIONS_FILE, "w") as f:
+        json.dump(decisions, f, separators=(",", ":"))
+
+
+def generate_replay(history):
+    with open("tests/data/default_state.json") as f:
+        initial_state = json.load(f)
+    del initial_state["connection"]
+    return {"initial_state": initial_state, "history": history}
+
+
+class TestReplayRunner(TestCase):
+    def test_get_ticks_fills_gaps(self):
+        events = [{"type": "agent", "agent_number": 0, "data": {"type": "bomb"}}]
+        replay = generate_replay([{"tick": 3, "events": events}])
+        self.assertEqual(
+            [
+                {"tick": 1, "events": []},
+                {"tick": 2, "events": []},
+                {"tick": 3, "events": events},
+            ],
+            list(get_ticks(replay)),
+        )
+
+    def test_get_agent_number(self):
+        self.assertEqual(0, get_agent_number("Results/game/agent_a/replay.json"))
+        self.assertEqual(1, get_agent_number("Results/game/agent_b/replay.json"))
+
+    def test_inline_executor(self):
+        future = InlineExecutor().submit(divmod, 7, 2)
+        self.assertEqual((3, 1), future.result())
+        self.assertIsInstance(
+            InlineExecutor().submit(divmod, 1, 0).exception(), ZeroDivisionError
+        )
+
+    def test_run_replay(self):
+        move = {"type": "agent", "agent_number": 1, "data": {"type": "move"}}
+        move["data"]["move"] = "up"
+        records = run_replay(generate_replay([{"tick": 2, "events": [move]}]), 0)
+        self.assertEqual([1, 2], [record.tick for record in records])
+        for record in records:
+            self.assertIsNotNone(record.label)
+            self.assertLessEqual(len(record.packets), 1)
+            self.assertGreater(record.seconds, 0)
+
+    def test_new_game_clears_caches(self):
+        server = ReplayConnection()
+        agent = Agent(server=server)
+        agent.decision_cache.put(1, ("IMPROVING  ", None))
+        agent.analysis_cache.put(1, ())
+        game_state = generate_replay([])["initial_state"]
+        game_state["connection"] = {"agent_number": 0}
+        asyncio.run(server._on_data({"type": "game_state", "payload": game_state}))
+        self.assertEqual(0, len(agent.decision_cache))
+        self.assertEqual(0, len(agent.analysis_cache))
+
+    @skipUnless(REPLAYS, "replays not found")
+    def test_decisions_match_recorded(self):
+        with open(DECISIONS_FILE) as f:
+            recorded = json.load(f)
+        for path in DECISION_REPLAYS:
+            name = os.path.relpath(path, "..").replace(os.sep, "/")
+            with self.subTest(replay=name):
+                decisions = json.loads(json.dumps(get_decisions(path)))
+                mismatches = [
+                    (ours, theirs)
+                    for ours, theirs in zip(decisions, recorded[name])
+                    if ours != theirs
+                ]
+                self.assertEqual([], mismatches[:5])
+                self.assertEqual(len(recorded[name]), len(decisions))
+
+    @skipUnless(REPLAYS, "replays not found")
+    def test_speculation_keeps_decisions(self):
+        path = REPLAYS[0]
+        replay = load_replay(path)
+        replay["history"] = [t for t in replay["history"] if t["tick"] <= 300]
+        with_speculation = run_replay(replay, get_agent_number(path))
+        without = run_replay(replay, get_agent_number(path), speculate=False)
+        self.assertEqual(
+            [record.packets for record in without],
+            [record.packets for record in with_speculation],
+        )
+
+
+if __name__ == "__main__":
+    record_decisions()
@@ -0,0 +1,85 @@
+from unittest import TestCase
+
+from app.safety import SafetySearch
+from app.state.grid_map import GridMap
+from app.state.map import Map
+
+
+def bomb(x, y, expires, owner=1, blast_diameter=3):
+    return {
+        "x": x,
+        "y": y,
+        "type": "b",
+        "owner": owner,
+        "expires": expires,
+        "hp": 1,
+        "blast_diameter": blast_diameter,
+    }
+
+
+def generate_map(entities=(), map_class=Map):
+    map = map_class({"width": 9, "height": 9}, list(entities))
+    map.bomb_library.update(map)
+    return map
+
+
+class TestSafetySearch(TestCase):
+    def test_no_danger(self):
+        search = SafetySearch(generate_map(), 10, (4, 4))
+        self.assertEqual({(4, 4), (4, 5), (4, 3), (3, 4), (5, 4)}, search.safe_moves)
+        self.assertEqual([(4, 4)], search.escape_path)
+
+    def test_leaves_blast_radius(self):
+        search = SafetySearch(generate_map([bomb(4, 4, expires=12)]), 10, (4, 5))
+        self.assertEqual({(4, 6), (3, 5), (5, 5)}, search.safe_moves)
+        self.assertEqual(2, len(search.escape_path))
+        self.assertIn(search.escape_path[1], search.safe_moves)
+
+    def test_escape_path_avoids_walls(self):
+        metal = [{"x": x, "y": 5, "type": "m"} for x in (3, 5)]
+        map = generate_map([bomb(4, 4, expires=16, blast_diameter=5)] + metal)
+        search = SafetySearch(map, 10, (4, 5))
+        self.assertEqual({(4, 5), (4, 6)}, search.safe_moves)
+        self.assertEqual([(4, 5), (4, 6), (3, 6)], search.escape_path)
+
+    def test_too_late_to_escape(self):
+        search = SafetySearch(generate_map([bomb(4, 4, expires=11)]), 10, (4, 5))
+        self.assertEqual(set(), search.safe_moves)
+        self.assertIsNone(search.escape_path)
+
+    def test_invulnerable(self):
+        search = SafetySearch(
+            generate_map([bomb(4, 4, expires=11)]), 10, (4, 5), invulnerable_until=25
+        )
+        self.assertIn((4, 5), search.safe_moves)
+        self.assertEqual([(4, 5)], search.escape_path)
+
+    def test_existing_blast(self):
+        blast = {"x": 4, "y": 5, "type": "x", "owner": 1, "expires": 13}
+        search = SafetySearch(generate_map([blast]), 10, (4, 4))
+        self.assertNotIn((4, 5), search.safe_moves)
+        self.assertIn((4, 4), search.safe_moves)
+
+    def test_chain_reaction(self):
+        map = generate_map(
+            [bomb(4, 4, expires=12, blast_diameter=5), bomb(6, 4, expires=40)]
+        )
+        search = SafetySearch(map, 10, (6, 6))
+        self.assertNotIn((6, 5), search.safe_moves)
+        self.assertIn((6, 6), search.safe_moves)
+
+    def test_remote_detonation(self):
+        map = generate_map([bomb(4, 4, expires=40)])
+        self.assertIn((4, 5), SafetySearch(map, 10, (4, 6)).safe_moves)
+        search = SafetySearch(map, 10, (4, 6), remote_owners=("1",))
+        self.assertNotIn((4, 5), search.safe_moves)
+
+    def test_fire(self):
+        search = SafetySearch(generate_map(), 1798, (0, 8))
+        self.assertEqual({(1, 8), (0, 7)}, search.safe_moves)
+        self.assertEqual(set(), SafetySearch(generate_map(), 1799, (0, 8)).safe_moves)
+
+    def test_grid_map(self):
+        map = generate_map([bomb(4, 4, expires=12)], GridMap)
+        search = SafetySearch(map, 10, (4, 5))
+        self.assertEqual({(4, 6), (3, 5), (5, 5)}, search.safe_moves)
@@ -1,10 +1,207 @@
-from unittest import TestCase
+import asyncio
+import json
+import threading
+from unittest import IsolatedAsyncioTestCase, TestCase
 from unittest.mock import patch
 
-from app.server_connection import ServerConnection
+import websockets
+
+from app.server_connection import (
+    CancelToken,
+    DecisionCancelled,
+    ServerConnection,
+    TickBudget,
+)
 
 
 @patch("app.bot.game_state.GameState", autospec=True)
 class TestServerConnection(TestCase):
     def setUp(self):
         self.sc = ServerConnection()
+
+
+def tick_packet(tick):
+    return {"type": "tick", "payload": {"tick": tick, "events": []}}
+
+
+class FakeConnection:
+    """Serves queued frames to recv and records sent packets"""
+
+    def __init__(self):
+        self.frames = asyncio.Queue()
+        self.sent = []
+
+    def push(self, packet):
+        self.frames.put_nowait(json.dumps(packet))
+
+    def close(self):
+        self.frames.put_nowait(None)
+
+    async def recv(self):
+        frame = await self.frames.get()
+        if frame is None:
+            raise websockets.exceptions.ConnectionClosed(1000, "")
+        return frame
+
+    async def send(self, packet):
+        self.sent.append(json.loads(packet))
+
+
+class TestCancelToken(TestCase):
+    def test_check(self):
+        token = CancelToken()
+        token.check()
+        token.cancel()
+        self.assertTrue(token.cancelled)
+        self.assertRaises(DecisionCancelled, token.check)
+
+
+class TestTickBudget(TestCase):
+    def test_deadline(self):
+        budget = TickBudget(100.0, tick_rate=10, margin=0.01)
+        self.assertAlmostEqual(100.09, budget.deadline)
+
+    @patch("app.server_connection.time.perf_counter", return_value=100.05)
+    def test_remaining_and_used(self, perf_counter):
+        budget = TickBudget(100.0, tick_rate=10, margin=0.01)
+        self.assertAlmostEqual(0.04, budget.remaining())
+        self.assertAlmostEqual(0.5, budget.used())
+
+    def test_unlimited(self):
+        self.assertGreater(TickBudget.unlimited().remaining(), 3600)
+
+
+class TestDecisionCallback(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = ServerConnection("")
+        self.connection = self.client.connection = FakeConnection()
+        with open("tests/data/server_packets/game_state.json") as f:
+            self.connection.push(json.load(f))
+
+    async def run_client(self):
+        await asyncio.wait_for(self.client.handle_messages(self.connection), 5)
+
+    async def test_sends_decision(self):
+        budgets = []
+
+        def decide(tick, state, token, budget):
+            budgets.append(budget)
+            return ("move", "up")
+
+        self.client.set_decision_callback(decide)
+        self.connection.push(tick_packet(1))
+        self.connection.close()
+        await self.run_client()
+        self.assertEqual([{"type": "move", "move": "up"}], self.connection.sent)
+        self.assertGreater(budgets[0].remaining(), 0)
+        self.assertLessEqual(budgets[0].remaining(), 0.1)
+
+    async def test_malformed_frame_raises(self):
+        self.client.set_decision_callback(lambda *args: None)
+        self.connection.frames.put_nowait("{not json")
+        with self.assertRaises(json.JSONDecodeError):
+            await self.run_client()
+
+    async def test_stale_decision_cancelled(self):
+        started = threading.Event()
+
+        def decide(tick, state, token, budget):
+            if tick == 1:
+                started.set()
+                while True:
+                    token.check()
+            return ("bomb",)
+
+        def fallback(tick, state):
+            return ("move", "down")
+
+        async def send_next_tick():
+            await asyncio.get_running_loop().run_in_executor(None, started.wait)
+            self.connection.push(tick_packet(2))
+            self.connection.close()
+
+        self.client.set_decision_callback(decide, fallback)
+        self.connection.push(tick_packet(1))
+        sender = asyncio.ensure_future(send_next_tick())
+        await self.run_client()
+        await sender
+        self.assertEqual(
+            [{"type": "move", "move": "down"}, {"type": "bomb"}], self.connection.sent
+        )
+        self.assertEqual(1, self.client.tick_stats.cancelled)
+
+    async def test_catches_up_on_queued_ticks(self):
+        ticks = []
+
+        def decide(tick, state, token, budget):
+            ticks.append((tick, state.tick))
+            return None
+
+        self.client.set_decision_callback(decide)
+        for tick in (1, 2, 3):
+            self.connection.push(tick_packet(tick))
+        self.connection.close()
+        await self.run_client()
+        self.assertEqual([(3, 3)], ticks)
+        self.assertFalse(self.client._state.desynced)
+        self.assertEqual(2, self.client.tick_stats.skipped)
+        self.assertEqual(2, self.client.tick_stats.max_backlog)
+
+    async def test_speculation_stops_before_next_tick(self):
+        events = []
+        started = threading.Event()
+
+        def decide(tick, state, token, budget):
+            events.append(("decide", tick))
+            return ("move", "up") if tick == 1 else None
+
+        def speculate(tick, state, action, token):
+            events.append(("speculate", tick, action))
+            if tick == 1:
+                started.set()
+                while not token.cancelled:
+                    pass
+                events.append(("stopped", state.tick))
+                token.check()
+
+        async def send_next_tick():
+            await asyncio.get_running_loop().run_in_executor(None, started.wait)
+            self.connection.push(tick_packet(2))
+            self.connection.close()
+
+        self.client.set_decision_callback(decide, speculation_callback=speculate)
+        self.connection.push(tick_packet(1))
+        sender = asyncio.ensure_future(send_next_tick())
+        await self.run_client()
+        await sender
+        self.assertEqual(
+            [
+                ("decide", 1),
+                ("speculate", 1, ("move", "up")),
+                ("stopped", 1),
+                ("decide", 2),
+                ("speculate", 2, None),
+            ],
+            events,
+        )
+
+    async def test_legacy_tick_callback(self):
+        ticks = []
+
+        async def on_tick(tick, state):
+            ticks.append(tick)
+            await self.client.send_bomb()
+
+        self.client.set_game_tick_callback(on_tick)
+        self.connection.push(tick_packet(1))
+        self.connection.close()
+        await self.run_client()
+        self.assertEqual([1], ticks)
+        self.assertEqual([{"type": "bomb"}], self.connection.sent)
+
+    async def test_send_action(self):
+        await self.client.send_action(None)
+        await self.client.send_action(("detonate", 3, 4))
+        self.assertEqual(
+            [{"type": "detonate", "coordinates": [3, 4]}], self.connection.sent
+        )
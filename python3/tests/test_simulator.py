@@ -0,0 +1,196 @@
+import glob
+import json
+import os
+from unittest import TestCase, skipUnless
+
+from app.simulator import (
+    ForwardModel,
+    SimAgent,
+    SimState,
+    compare_states,
+    to_packet,
+    validate_replay,
+)
+from app.state.game_state import GameState
+from app.utilities import Entity
+
+REPLAYS = sorted(glob.glob("../Results/**/replay.json", recursive=True))
+
+
+def generate_state(entities=(), tick=10):
+    agents = {
+        "0": SimAgent("0", (1, 1), 3, 3, 3, 0),
+        "1": SimAgent("1", (7, 7), 3, 3, 3, 0),
+    }
+    entities = {(e["x"], e["y"]): e for e in entities}
+    return SimState(tick, 9, 9, agents, entities)
+
+
+def bomb(x, y, owner=0, expires=50, blast_diameter=3):
+    return {
+        "x": x,
+        "y": y,
+        "type": Entity.BOMB,
+        "owner": owner,
+        "expires": expires,
+        "hp": 1,
+        "blast_diameter": blast_diameter,
+    }
+
+
+class TestForwardModel(TestCase):
+    def setUp(self):
+        self.model = ForwardModel()
+
+    def test_move(self):
+        state = generate_state()
+        self.model.step(state, [("0", {"type": "move", "move": "up"})])
+        self.assertEqual((1, 2), state.agents["0"].coords)
+        self.assertEqual(11, state.tick)
+
+    def test_move_blocked(self):
+        state = generate_state([{"x": 1, "y": 2, "type": Entity.WOOD, "hp": 1}])
+        self.model.step(state, [("0", {"type": "move", "move": "up"})])
+        self.assertEqual((1, 1), state.agents["0"].coords)
+
+    def test_move_out_of_bounds(self):
+        state = generate_state()
+        self.model.step(state, [("1", {"type": "move", "move": "right"})])
+        self.model.step(state, [("1", {"type": "move", "move": "right"})])
+        self.assertEqual((8, 7), state.agents["1"].coords)
+
+    def test_plant(self):
+        state = self.model.step(generate_state(), [("0", {"type": "bomb"})])
+        self.assertEqual(bomb(1, 1, expires=51), state.entities[(1, 1)])
+        self.assertEqual(2, state.agents["0"].ammo)
+
+    def test_plant_without_ammo(self):
+        state = generate_state()
+        state.agents["0"].ammo = 0
+        self.model.step(state, [("0", {"type": "bomb"})])
+        self.assertNotIn((1, 1), state.entities)
+
+    def test_detonate(self):
+        state = generate_state([bomb(3, 3)])
+        self.model.step(state, [("0", {"type": "detonate", "coordinates": [3, 3]})])
+        blasts = {c for c, e in state.entities.items() if e["type"] == Entity.BLAST}
+        self.assertEqual({(3, 3), (3, 4), (3, 2), (2, 3), (4, 3)}, blasts)
+        self.assertEqual(21, state.entities[(3, 3)]["expires"])
+
+    def test_detonate_enemy_bomb(self):
+        state = generate_state([bomb(3, 3, owner=1)])
+        self.model.step(state, [("0", {"type": "detonate", "coordinates": [3, 3]})])
+        self.assertEqual(Entity.BOMB, state.entities[(3, 3)]["type"])
+
+    def test_bomb_expires(self):
+        state = generate_state([bomb(3, 3, expires=11)])
+        self.model.step(state)
+        self.assertEqual(Entity.BLAST, state.entities[(3, 3)]["type"])
+
+    def test_chain_reaction(self):
+        state = generate_state([bomb(3, 3, expires=11), bomb(4, 3, owner=1)])
+        self.model.step(state)
+        self.assertEqual(Entity.BLAST, state.entities[(4, 3)]["type"])
+        self.assertEqual(Entity.BLAST, state.entities[(5, 3)]["type"])
+
+    def test_blocks_stop_blast(self):
+        state = generate_state(
+            [
+                bomb(3, 3, expires=11, blast_diameter=5),
+                {"x": 3, "y": 4, "type": Entity.ORE, "hp": 3},
+                {"x": 3, "y": 2, "type": Entity.WOOD, "hp": 1},
+                {"x": 2, "y": 3, "type": Entity.METAL},
+            ]
+        )
+        self.model.step(state)
+        self.assertEqual(2, state.entities[(3, 4)]["hp"])
+        self.assertNotIn((3, 2), state.entities)
+        self.assertNotIn((3, 1), state.entities)
+        self.assertEqual(Entity.METAL, state.entities[(2, 3)]["type"])
+        self.assertNotIn((1, 3), state.entities)
+
+    def test_blast_damage_and_invulnerability(self):
+        state = generate_state([bomb(1, 2, expires=11)])
+        self.model.step(state)
+        self.assertEqual(2, state.agents["0"].hp)
+        self.assertEqual(16, state.agents["0"].invulnerability)
+        for _ in range(5):
+            self.model.step(state)
+        self.assertEqual(2, state.agents["0"].hp)
+        self.model.step(state)
+        self.assertEqual(1, state.agents["0"].hp)
+
+    def test_pickups(self):
+        state = generate_state(
+            [
+                {"x": 1, "y": 2, "type": Entity.AMMO, "expires": 50, "hp": 1},
+                {"x": 7, "y": 6, "type": Entity.POWERUP, "expires": 50, "hp": 1},
+            ]
+        )
+        self.model.step(
+            state,
+            [
+                ("0", {"type": "move", "move": "up"}),
+                ("1", {"type": "move", "move": "down"}),
+            ],
+        )
+        self.model.step(state)
+        self.assertEqual(4, state.agents["0"].ammo)
+        self.assertEqual(5, state.agents["1"].blast_diameter)
+        self.assertEqual({}, state.entities)
+
+    def test_fire(self):
+        state = generate_state(tick=1799)
+        self.model.step(state)
+        self.assertEqual({"x": 0, "y": 8, "type": Entity.BLAST}, state.entities[(0, 8)])
+
+    def test_get_actions(self):
+        state = generate_state(
+            [bomb(3, 3), bomb(4, 4, owner=1), {"x": 1, "y": 2, "type": Entity.WOOD}]
+        )
+        self.assertEqual(
+            [
+                None,
+                ("move", "down"),
+                ("move", "left"),
+                ("move", "right"),
+                ("bomb",),
+                ("detonate", 3, 3),
+            ],
+            self.model.get_actions(state, "0"),
+        )
+
+    def test_to_packet(self):
+        self.assertEqual({"type": "move", "move": "up"}, to_packet(("move", "up")))
+        self.assertEqual({"type": "bomb"}, to_packet(("bomb",)))
+        self.assertEqual(
+            {"type": "detonate", "coordinates": [3, 4]}, to_packet(("detonate", 3, 4))
+        )
+
+    def test_copy(self):
+        state = generate_state()
+        copy = state.copy()
+        self.model.step(copy, [("0", {"type": "bomb"})])
+        self.assertEqual(3, state.agents["0"].ammo)
+        self.assertEqual({}, state.entities)
+
+
+@skipUnless(REPLAYS, "replays not found")
+class TestValidateReplay(TestCase):
+    def test_replays_match(self):
+        for path in REPLAYS[:3]:
+            with open(path) as f:
+                mismatches, ticks = validate_replay(json.load(f))
+            self.assertGreater(ticks, 0)
+            self.assertEqual([], mismatches, os.path.basename(os.path.dirname(path)))
+
+
+class TestSimState(TestCase):
+    def test_from_game_state(self):
+        with open("tests/data/default_state.json") as f:
+            state = json.load(f)
+        game_state = GameState()
+        game_state.set_state(state)
+        sim_state = SimState.from_game_state(game_state)
+        expected = SimState.from_json(state)
+        self.assertEqual([], compare_states(expected, sim_state))
@@ -0,0 +1,46 @@
+import random
+from unittest import TestCase
+
+import networkx as nx
+
+from app.state.map import Map
+from app.trap_analysis import TrapAnalysis
+from tests.test_map import add_metal, generate_default_map
+
+
+def get_component_without(map, cut, coords):
+    graph = map.graph.copy()
+    if cut in graph:
+        graph.remove_node(cut)
+    return nx.node_connected_component(graph, coords)
+
+
+class TestTrapAnalysis(TestCase):
+    def test_corridor_cut(self):
+        map = Map({"width": 9, "height": 9}, [])
+        for y in range(9):
+            if y != 4:
+                add_metal(map, (2, y))
+        analysis = TrapAnalysis(map)
+        self.assertEqual(18, len(analysis.component_without((2, 4), (0, 0))))
+        self.assertEqual(54, len(analysis.component_without((2, 4), (8, 8))))
+        self.assertEqual(72, len(analysis.component_without((5, 5), (0, 0))))
+        self.assertEqual(73, len(analysis.component_without((2, 0), (0, 0))))
+
+    def test_component_without_matches_graph_copy(self):
+        rng = random.Random(3)
+        map = generate_default_map()
+        for _ in range(10):
+            add_metal(map, rng.choice(list(map)))
+        analysis = TrapAnalysis(map)
+        nodes = list(map)
+        for _ in range(200):
+            cut = rng.choice(nodes + [(0, -1)])
+            coords = rng.choice(nodes)
+            if cut == coords:
+                continue
+            with self.subTest(cut=cut, coords=coords):
+                self.assertCountEqual(
+                    get_component_without(map, cut, coords),
+                    analysis.component_without(cut, coords),
+                )
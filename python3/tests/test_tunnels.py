@@ -0,0 +1,71 @@
+import json
+import random
+from unittest import TestCase
+
+from app.state.grid_map import GridMap
+from app.state.map import Map
+from app.state.tunnels import TunnelIndex
+from tests.test_map import add_metal, generate_empty_map
+
+
+def get_full_index(map):
+    return dict(TunnelIndex(map))
+
+
+class TestTunnelIndex(TestCase):
+    def test_empty_map_has_no_tunnels(self):
+        map = generate_empty_map()
+        self.assertEqual(0, len(map.tunnels))
+
+    def test_corridor_with_exit(self):
+        map = generate_empty_map()
+        for coords in (0, 1), (1, 1):
+            add_metal(map, coords)
+        self.assertEqual((2, 0), map.tunnels[(0, 0)])
+        self.assertEqual(2, len(map.tunnels.get_tunnel((1, 0))))
+        self.assertIn((1, 0), map.tunnels)
+        self.assertNotIn((2, 0), map.tunnels)
+        self.assertIsNone(map.tunnels.get_tunnel((4, 4)))
+
+    def test_closed_corridor(self):
+        map = generate_empty_map()
+        for coords in (2, 0), (0, 1), (1, 1):
+            add_metal(map, coords)
+        self.assertIn((0, 0), map.tunnels)
+        self.assertIsNone(map.tunnels[(0, 0)])
+        self.assertEqual(2, len(map.tunnels.get_tunnel((1, 0))))
+
+    def test_tunnel_extends_when_exit_narrows(self):
+        map = generate_empty_map()
+        for coords in (0, 1), (1, 1):
+            add_metal(map, coords)
+        self.assertEqual((2, 0), map.tunnels[(0, 0)])
+        add_metal(map, (2, 1))
+        self.assertEqual((3, 0), map.tunnels[(0, 0)])
+        self.assertEqual(3, len(map.tunnels.get_tunnel((2, 0))))
+        map.remove_entity((2, 1))
+        self.assertEqual((2, 0), map.tunnels[(0, 0)])
+        self.assertNotIn((2, 0), map.tunnels)
+
+    def test_default_map_matches_full_scan(self):
+        with open("tests/data/default_state.json") as f:
+            state = json.load(f)
+        for map_class in Map, GridMap:
+            with self.subTest(map_class=map_class.__name__):
+                map = map_class(state["world"], state["entities"])
+                self.assertEqual(get_full_index(map), dict(map.tunnels))
+
+    def test_incremental_matches_full_scan(self):
+        rng = random.Random(42)
+        for map_class in Map, GridMap:
+            map = map_class({"width": 9, "height": 9}, [])
+            dict(map.tunnels)
+            for step in range(300):
+                coords = (rng.randrange(9), rng.randrange(9))
+                if coords in map:
+                    add_metal(map, coords)
+                else:
+                    map.remove_entity(coords)
+                if step % 3 == 0:
+                    with self.subTest(map_class=map_class.__name__, step=step):
+                        self.assertEqual(get_full_index(map), dict(map.tunnels))
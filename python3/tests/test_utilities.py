@@ -0,0 +1,45 @@
+from unittest import TestCase
+
+from app.utilities import LRUCache
+
+
+class TestLRUCache(TestCase):
+    def test_get_missing(self):
+        cache = LRUCache(2)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(1, cache.misses)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertEqual(2, len(cache))
+        self.assertEqual(1, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+
+    def test_hit_rate(self):
+        cache = LRUCache(2)
+        self.assertEqual(0.0, cache.hit_rate)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("b")
+        self.assertEqual(0.5, cache.hit_rate)
+        cache.reset_stats()
+        self.assertEqual(0, cache.hits + cache.misses)
+        self.assertEqual(1, len(cache))
+
+    def test_contains_does_not_count(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(0, cache.hits + cache.misses)
+
+    def test_clear(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.clear()
+        self.assertNotIn("a", cache)
+        self.assertEqual(0, len(cache))
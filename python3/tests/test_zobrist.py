@@ -0,0 +1,100 @@
+import json
+from unittest import TestCase
+
+from app.state.game_state import GameState
+from app.state.grid_map import GridMap
+from app.state.map import Map
+from app.state.zobrist import ZobristKeys
+from tests.test_bombs import get_bomb_entity
+
+
+def generate_default_state():
+    with open("tests/data/default_state.json") as f:
+        return json.load(f)
+
+
+class TestZobristKeys(TestCase):
+    def test_keys_stable(self):
+        keys = ZobristKeys()
+        self.assertEqual(keys("tile", (1, 1), "a"), keys("tile", (1, 1), "a"))
+        self.assertNotEqual(keys("tile", (1, 1), "a"), keys("tile", (1, 2), "a"))
+
+
+class TestMapZobrist(TestCase):
+    def test_add_remove_restores_hash(self):
+        for map_class in Map, GridMap:
+            with self.subTest(map_class=map_class.__name__):
+                map = map_class({"width": 9, "height": 9}, [])
+                self.assertEqual(0, map.zobrist)
+                map.add_entity({"x": 1, "y": 1, "type": "a"})
+                map.add_entity(get_bomb_entity(2, 2))
+                self.assertNotEqual(0, map.zobrist)
+                map.remove_entity((1, 1))
+                map.remove_entity((2, 2))
+                self.assertEqual(0, map.zobrist)
+
+    def test_order_independent(self):
+        entities = [
+            {"x": 1, "y": 1, "type": "a"},
+            {"x": 3, "y": 1, "type": "w"},
+            {"x": 5, "y": 5, "type": "m"},
+        ]
+        first = Map({"width": 9, "height": 9}, entities)
+        second = GridMap({"width": 9, "height": 9}, entities[::-1])
+        self.assertEqual(first.zobrist, second.zobrist)
+
+    def test_bomb_owner_change(self):
+        map = Map({"width": 9, "height": 9}, [get_bomb_entity(2, 2, expires=40)])
+        before = map.bomb_library.zobrist
+        map.bomb_library.update_tick(20)
+        self.assertEqual(before, map.bomb_library.zobrist)
+        map.bomb_library.update_tick(39)
+        self.assertNotEqual(before, map.bomb_library.zobrist)
+        map.bomb_library.update_tick(20)
+        self.assertEqual(before, map.bomb_library.zobrist)
+
+
+class TestGameStateZobrist(TestCase):
+    def setUp(self):
+        self.gs = GameState()
+        self.gs.set_state(generate_default_state())
+        self.gs.update_tick(1)
+
+    def test_player_move_changes_hash(self):
+        before = self.gs.zobrist
+        move = {"type": "move", "move": "up"}
+        agent_number = int(self.gs.us.id)
+        self.gs.receive_events(
+            [{"type": "agent", "agent_number": agent_number, "data": move}]
+        )
+        self.assertNotEqual(before, self.gs.zobrist)
+
+    def test_hash_before_first_tick(self):
+        game_state = GameState()
+        game_state.set_state(generate_default_state())
+        self.assertIsInstance(game_state.zobrist, int)
+
+    def test_seat_changes_hash(self):
+        state = generate_default_state()
+        state["connection"]["agent_number"] = 1 - state["connection"]["agent_number"]
+        other_seat = GameState()
+        other_seat.set_state(state)
+        other_seat.update_tick(1)
+        self.assertNotEqual(self.gs.zobrist, other_seat.zobrist)
+
+    def test_quiet_tick_keeps_hash(self):
+        before = self.gs.zobrist
+        self.gs.update_tick(2)
+        self.gs.receive_events([])
+        self.assertEqual(before, self.gs.zobrist)
+
+    def test_rollback_restores_hash(self):
+        before = self.gs.zobrist
+        self.gs.checkpoint()
+        self.gs.receive_events(
+            [{"type": "entity_spawned", "data": get_bomb_entity(4, 4)}]
+        )
+        self.gs.update_tick(1800)
+        self.assertNotEqual(before, self.gs.zobrist)
+        self.gs.rollback()
+        self.assertEqual(before, self.gs.zobrist)